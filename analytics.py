@@ -0,0 +1,94 @@
+import logging
+import numpy as np
+from database import MAX_SGPA
+from query import StudentQuery
+
+# CGPA distribution buckets: 0-1, 1-2, ..., 9-10
+DISTRIBUTION_BUCKETS = int(MAX_SGPA)
+
+class GradeAnalytics:
+    """Vectorized CGPA, ranking and group statistics over every student"""
+    def __init__(self, db):
+        self.db = db
+        self.cgpa = np.empty(0)
+        # Genders and categories are interned as integer codes into these label lists
+        self.gender_labels, self.gender_codes = [], np.empty(0, dtype=np.int64)
+        self.category_labels, self.category_codes = [], np.empty(0, dtype=np.int64)
+        # CGPAs of the graded students, ascending, for ranks and percentiles
+        self.graded_cgpa = np.empty(0)
+
+    def load(self):
+        """Read every student's CGPA (NaN when ungraded), category and gender into NumPy arrays"""
+        genders, categories = {}, {}
+        cgpas, gender_codes, category_codes = [], [], []
+        # The database computes CGPAs and groups students, so only their CGPAs are converted here
+        for category, gender, values in self.db.get_cgpa_groups():
+            cgpas.append(np.array(values, dtype=float))
+            gender_codes.append(genders.setdefault(gender, len(genders)))
+            category_codes.append(categories.setdefault(category, len(categories)))
+        sizes = [len(values) for values in cgpas]
+        self.cgpa = np.concatenate(cgpas) if cgpas else np.empty(0)
+        self.gender_codes = np.repeat(np.array(gender_codes, dtype=np.int64), sizes)
+        self.category_codes = np.repeat(np.array(category_codes, dtype=np.int64), sizes)
+        self.gender_labels = list(genders)
+        self.category_labels = list(categories)
+        logging.info(f"Loaded grades for {len(self.cgpa)} students")
+        return len(self.cgpa)
+
+    def compute(self):
+        """Compute overall/category/gender summaries, and the ranking used by top_students()"""
+        graded = ~np.isnan(self.cgpa)
+        self.graded_cgpa = np.sort(self.cgpa[graded])
+        everyone = np.zeros(len(self.cgpa), dtype=np.int64)
+        return {
+            'overall': self._group_stats(['All'], everyone, graded)['All'],
+            'by_category': self._group_stats(self.category_labels, self.category_codes, graded),
+            'by_gender': self._group_stats(self.gender_labels, self.gender_codes, graded),
+        }
+
+    def rank(self, cgpa):
+        """Competition rank of a CGPA: equal CGPAs share a rank"""
+        return len(self.graded_cgpa) - int(np.searchsorted(self.graded_cgpa, cgpa, 'right')) + 1
+
+    def percentile(self, cgpa):
+        """Share of graded students with a strictly lower CGPA, in percent"""
+        return 100.0 * int(np.searchsorted(self.graded_cgpa, cgpa, 'left')) / len(self.graded_cgpa)
+
+    def _group_stats(self, labels, codes, graded):
+        """Count, mean, std and CGPA distribution for every label, using integer group codes"""
+        groups = len(labels)
+        graded_codes = codes[graded]
+        values = self.cgpa[graded]
+
+        students = np.bincount(codes, minlength=groups)
+        counts = np.bincount(graded_codes, minlength=groups)
+        sums = np.bincount(graded_codes, weights=values, minlength=groups)
+        squares = np.bincount(graded_codes, weights=values * values, minlength=groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+            stds = np.sqrt(np.maximum(squares / counts - means * means, 0.0))
+        buckets = np.clip(values.astype(np.int64), 0, DISTRIBUTION_BUCKETS - 1)
+        distribution = np.bincount(graded_codes * DISTRIBUTION_BUCKETS + buckets,
+                                   minlength=groups * DISTRIBUTION_BUCKETS).reshape(groups, DISTRIBUTION_BUCKETS)
+
+        stats = {}
+        for i, label in enumerate(labels):
+            stats[label] = {
+                'students': int(students[i]),
+                'graded': int(counts[i]),
+                'mean': float(means[i]),
+                'std': float(stds[i]),
+                'distribution': distribution[i].tolist(),
+            }
+        return stats
+
+    def top_students(self, limit=10):
+        """Return (rank, rollno, cgpa, percentile) for the best-ranked students, after compute().
+
+        Ties are listed in rollno order. Raises sqlite3.Error or OSError.
+        """
+        if not len(self.graded_cgpa):
+            return []
+        query = StudentQuery().where('cgpa', '>=', 0).order_by('cgpa', descending=True).page(limit)
+        return [(self.rank(cgpa), rollno, cgpa, self.percentile(cgpa))
+                for cgpa, rollno in self.db.query_sorted(query, ('rollno',))]
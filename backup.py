@@ -0,0 +1,300 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from photo_store import PHOTO_DIR
+
+BACKUP_DIR = 'backups'
+# Database pages copied per backup step, and the pause between steps that leaves
+# the disk and the GIL to the application
+BACKUP_STEP_PAGES = 1024
+BACKUP_STEP_PAUSE = 0.005
+# Snapshots kept by prune(): the newest few, then the newest of each recent day and week
+KEEP_LAST, KEEP_DAILY, KEEP_WEEKLY = 3, 7, 4
+# Seconds between scheduled snapshots, and between checks whether one is due
+BACKUP_INTERVAL = 6 * 3600
+SCHEDULE_CHECK_INTERVAL = 60.0
+
+SNAPSHOT_FORMAT = '%Y%m%d-%H%M%S'
+PARTIAL_SUFFIX = '.partial'
+PHOTO_MANIFEST = 'photos.json'
+OBJECT_DIR = 'objects'
+
+class BackupCancelled(Exception):
+    """Raised from a backup step to abandon the snapshot"""
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _copy_file(source, dest):
+    """Copy a file so that dest never exists half-written"""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    temp_path = dest + '.tmp'
+    shutil.copyfile(source, temp_path)
+    os.replace(temp_path, dest)
+
+class BackupManager:
+    """Point-in-time snapshots of the student databases and the photo directory.
+
+    Each snapshot is a directory named after its time holding a copy of every
+    database and a manifest of the photo files. Photo contents are stored once,
+    under their SHA-256, in a shared objects/ directory, so a snapshot only
+    copies photos that changed since the previous one; unchanged files (same
+    size and mtime) are not even re-hashed. databases is a database file or a
+    directory whose .db files (shards) are all backed up.
+    """
+    def __init__(self, databases, photo_root=PHOTO_DIR, backup_dir=BACKUP_DIR):
+        self.databases = databases
+        self.photo_root = photo_root
+        self.backup_dir = backup_dir
+
+    @classmethod
+    def for_database(cls, db, backup_dir=BACKUP_DIR):
+        """Manager for a local or sharded database, None for one served by another machine"""
+        if hasattr(db, 'directory'):
+            return cls(db.directory, db.photo_store.root, backup_dir)
+        if hasattr(db, 'db_name'):
+            return cls(db.db_name, db.photo_store.root, backup_dir)
+        return None
+
+    def database_paths(self):
+        if os.path.isdir(self.databases):
+            return sorted(os.path.join(self.databases, name) for name in os.listdir(self.databases)
+                          if name.endswith('.db'))
+        return [self.databases]
+
+    def snapshots(self):
+        """Names of the complete snapshots, oldest first"""
+        try:
+            names = os.listdir(self.backup_dir)
+        except FileNotFoundError:
+            return []
+        # Snapshots in progress are named <time>.partial until they are complete
+        return sorted(name for name in names if not name.endswith(PARTIAL_SUFFIX) and
+                      os.path.exists(os.path.join(self.backup_dir, name, PHOTO_MANIFEST)))
+
+    def backup(self, progress=None, cancelled=None):
+        """Take a snapshot, returning its name, or None if it failed or was cancelled.
+
+        progress(copied, total) reports database pages; cancelled() is checked
+        between steps. The snapshot only appears in snapshots() once complete.
+        """
+        name = datetime.now().strftime(SNAPSHOT_FORMAT)
+        snapshot_dir = os.path.join(self.backup_dir, name)
+        temp_dir = snapshot_dir + PARTIAL_SUFFIX
+        started = time.perf_counter()
+        try:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            os.makedirs(temp_dir)
+            for path in self.database_paths():
+                self._backup_database(path, os.path.join(temp_dir, os.path.basename(path)), progress, cancelled)
+            copied = self._snapshot_photos(temp_dir)
+            os.rename(temp_dir, snapshot_dir)
+            logging.info(f"Backup {name} complete in {time.perf_counter() - started:.1f}s "
+                         f"({copied} new photo files)")
+            return name
+        except BackupCancelled:
+            logging.info(f"Backup {name} cancelled")
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Error creating backup {name}: {e}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return None
+
+    def _backup_database(self, source_path, target_path, progress=None, cancelled=None):
+        """Copy a live database with the SQLite backup API in small steps and check the copy"""
+        source = sqlite3.connect(source_path, isolation_level=None)
+        target = sqlite3.connect(target_path)
+        try:
+            source.execute('PRAGMA busy_timeout = 5000')
+            # A read transaction pins a WAL snapshot: writers carry on unblocked and,
+            # unlike a plain backup, the copy isn't restarted by every commit
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+
+            def step(status, remaining, total):
+                if cancelled is not None and cancelled():
+                    raise BackupCancelled()
+                if progress:
+                    progress(total - remaining, total)
+                time.sleep(BACKUP_STEP_PAUSE)
+            source.backup(target, pages=BACKUP_STEP_PAGES, progress=step)
+            source.execute('COMMIT')
+            # Checked now so that restoring can trust every complete snapshot
+            result = target.execute('PRAGMA quick_check').fetchone()[0]
+            if result != 'ok':
+                raise sqlite3.DatabaseError(f"backup of {source_path} failed its integrity check: {result}")
+        finally:
+            target.close()
+            source.close()
+
+    def _snapshot_photos(self, snapshot_dir):
+        """Write the photo manifest of a snapshot, storing new photo contents; returns how many were new"""
+        snapshots = self.snapshots()
+        previous = self.photo_manifest(snapshots[-1]) if snapshots else {}
+        manifest, copied = {}, 0
+        for dirpath, _, files in os.walk(self.photo_root):
+            for file_name in files:
+                if file_name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, file_name)
+                relative = os.path.relpath(path, self.photo_root)
+                stat = os.stat(path)
+                known = previous.get(relative)
+                if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+                    digest = known[2]
+                else:
+                    digest = _hash_file(path)
+                object_path = self.object_path(digest)
+                if not os.path.exists(object_path):
+                    _copy_file(path, object_path)
+                    copied += 1
+                manifest[relative] = [stat.st_size, stat.st_mtime_ns, digest]
+        with open(os.path.join(snapshot_dir, PHOTO_MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+        return copied
+
+    def object_path(self, digest):
+        return os.path.join(self.backup_dir, OBJECT_DIR, digest[:2], digest)
+
+    def photo_manifest(self, name):
+        """{relative photo path: [size, mtime_ns, sha256]} of a snapshot"""
+        with open(os.path.join(self.backup_dir, name, PHOTO_MANIFEST)) as f:
+            return json.load(f)
+
+    def prune(self, keep_last=KEEP_LAST, keep_daily=KEEP_DAILY, keep_weekly=KEEP_WEEKLY):
+        """Delete old snapshots and the photo contents only they used, returning the names deleted.
+
+        Kept are the newest keep_last snapshots, the newest one of each of the last
+        keep_daily days that have one, and likewise of the last keep_weekly weeks.
+        """
+        names = self.snapshots()[::-1]
+        keep = set(names[:keep_last])
+        for count, period in ((keep_daily, lambda at: at.date()), (keep_weekly, lambda at: at.isocalendar()[:2])):
+            seen = []
+            for name in names:
+                key = period(datetime.strptime(name, SNAPSHOT_FORMAT))
+                if key not in seen:
+                    seen.append(key)
+                    if len(seen) > count:
+                        break
+                    keep.add(name)
+        deleted = [name for name in names if name not in keep]
+        try:
+            for name in deleted:
+                shutil.rmtree(os.path.join(self.backup_dir, name))
+            used = set()
+            for name in keep:
+                used.update(entry[2] for entry in self.photo_manifest(name).values())
+            object_dir = os.path.join(self.backup_dir, OBJECT_DIR)
+            for dirpath, _, files in os.walk(object_dir):
+                for file_name in files:
+                    if file_name not in used:
+                        os.remove(os.path.join(dirpath, file_name))
+        except OSError as e:
+            logging.error(f"Error pruning backups: {e}")
+        if deleted:
+            logging.info(f"Pruned {len(deleted)} backups")
+        return deleted
+
+    def restore(self, name):
+        """Restore the databases and photos of a snapshot.
+
+        Each database is overwritten through the backup API, which keeps its WAL
+        consistent; the app should not be running. Shards created after the
+        snapshot are moved aside, so the restored directory holds exactly the
+        snapshot's shards. Photos that are missing or differ are copied back;
+        newer photos are left alone. Returns the paths the shards were moved to,
+        or None if the restore failed.
+        """
+        snapshot_dir = os.path.join(self.backup_dir, name)
+        try:
+            manifest = self.photo_manifest(name)
+            set_aside = self._set_aside_new_shards(snapshot_dir)
+            for file_name in sorted(os.listdir(snapshot_dir)):
+                if not file_name.endswith('.db'):
+                    continue
+                live_path = self.databases
+                if os.path.isdir(self.databases):
+                    live_path = os.path.join(self.databases, file_name)
+                source = sqlite3.connect(os.path.join(snapshot_dir, file_name))
+                target = sqlite3.connect(live_path)
+                try:
+                    target.execute('PRAGMA busy_timeout = 5000')
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+
+            restored = 0
+            for relative, (size, mtime_ns, digest) in manifest.items():
+                path = os.path.join(self.photo_root, relative)
+                if os.path.exists(path) and os.path.getsize(path) == size and os.stat(path).st_mtime_ns == mtime_ns:
+                    continue
+                _copy_file(self.object_path(digest), path)
+                # Keep the recorded mtime so the next snapshot doesn't hash it again
+                os.utime(path, ns=(mtime_ns, mtime_ns))
+                restored += 1
+            logging.info(f"Restored backup {name} ({restored} photo files)")
+            return set_aside
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logging.error(f"Error restoring backup {name}: {e}")
+            return None
+
+    def _set_aside_new_shards(self, snapshot_dir):
+        """Move the shards that aren't in a snapshot to a set-aside-<time> directory, returning their new paths"""
+        if not os.path.isdir(self.databases):
+            return []
+        in_snapshot = set(os.listdir(snapshot_dir))
+        aside_dir = os.path.join(self.databases, 'set-aside-' + datetime.now().strftime(SNAPSHOT_FORMAT))
+        moved = []
+        for path in self.database_paths():
+            file_name = os.path.basename(path)
+            if file_name in in_snapshot:
+                continue
+            os.makedirs(aside_dir, exist_ok=True)
+            # Committed rows may still be in the WAL, so it moves along with the database
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.replace(path + suffix, os.path.join(aside_dir, file_name + suffix))
+            logging.warning(f"Shard {file_name} is not in the backup; moved it to {aside_dir}")
+            moved.append(os.path.join(aside_dir, file_name))
+        return moved
+
+class BackupScheduler:
+    """Takes a snapshot in a background thread whenever the newest is older than interval, then prunes"""
+    def __init__(self, manager, interval=BACKUP_INTERVAL):
+        self.manager = manager
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='backup-scheduler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(SCHEDULE_CHECK_INTERVAL):
+            if self.due():
+                if self.manager.backup(cancelled=self._stop.is_set):
+                    self.manager.prune()
+
+    def due(self):
+        snapshots = self.manager.snapshots()
+        if not snapshots:
+            return True
+        newest = datetime.strptime(snapshots[-1], SNAPSHOT_FORMAT)
+        return (datetime.now() - newest).total_seconds() >= self.interval
+
+    def stop(self):
+        """Stop the background thread, abandoning a snapshot in progress"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
@@ -0,0 +1,62 @@
+import os
+import random
+import tempfile
+from database import SEMESTER_COLUMNS
+
+FIRST_NAMES = ('Aarav', 'Aditi', 'Amit', 'Ananya', 'Arjun', 'Bina', 'Debasish', 'Diya', 'Farhan',
+               'Gaurav', 'Ishita', 'Kabir', 'Kavya', 'Manish', 'Meera', 'Nikhil', 'Pooja', 'Priya',
+               'Rahul', 'Riya', 'Rohan', 'Sagar', 'Sneha', 'Subha', 'Tanvi', 'Vikram', 'Zoya')
+LAST_NAMES = ('Banerjee', 'Bose', 'Chatterjee', 'Das', 'Dutta', 'Ghosh', 'Gupta', 'Hazra', 'Iyer',
+              'Khan', 'Kumar', 'Mehta', 'Mondal', 'Mukherjee', 'Nair', 'Patel', 'Reddy', 'Roy',
+              'Saha', 'Sen', 'Sharma', 'Singh')
+DEPARTMENTS = ('CSE', 'ECE', 'EE', 'ME', 'CE', 'IT')
+# (category, weight) roughly following reservation shares
+CATEGORIES = (('GEN', 40), ('OBC', 27), ('SC', 15), ('ST', 8), ('EWS', 10))
+GENDERS = (('M', 52), ('F', 46), ('O', 2))
+
+def make_photo_pool(photo_store, count, seed=0):
+    """Store count distinct synthetic portraits and return their stored paths"""
+    from PIL import Image, ImageDraw
+    rng = random.Random(seed)
+    paths = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(count):
+            img = Image.new('RGB', (400, 400), tuple(rng.randrange(256) for _ in range(3)))
+            draw = ImageDraw.Draw(img)
+            draw.ellipse((120, 60, 280, 220), fill=tuple(rng.randrange(256) for _ in range(3)))
+            draw.rectangle((90, 240, 310, 400), fill=tuple(rng.randrange(256) for _ in range(3)))
+            source = os.path.join(tmp, f'photo_{i}.jpg')
+            img.save(source)
+            paths.append(photo_store.import_photo(source))
+    return paths
+
+def rollno_for(index):
+    """Roll number of the index-th generated student"""
+    return f'{DEPARTMENTS[index % len(DEPARTMENTS)]}{2019 + index % 6}{index:07d}'
+
+def generate_students(count, seed=0, photo_paths=(), start=0):
+    """Yield count reproducible student tuples in add_student order.
+
+    Each student has an underlying ability that drives their SGPAs, and
+    students of later admission years have fewer graded semesters.
+    """
+    rng = random.Random(f'{seed}:{start}')
+    categories, category_weights = zip(*CATEGORIES)
+    genders, gender_weights = zip(*GENDERS)
+    for i in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        year = 2019 + i % 6
+        graded = max(0, min(len(SEMESTER_COLUMNS), (2025 - year) * 2))
+        ability = rng.gauss(7.2, 1.0)
+        sgpas = [round(min(10.0, max(4.0, rng.gauss(ability, 0.5))), 2) if sem < graded else ''
+                 for sem in range(len(SEMESTER_COLUMNS))]
+        yield (
+            f'{first} {last}',
+            f'{rng.choice(FIRST_NAMES)} {last}',
+            rollno_for(i),
+            rng.choices(genders, gender_weights)[0],
+            rng.choices(categories, category_weights)[0],
+            f'9{rng.randrange(10 ** 9):09d}',
+            *sgpas,
+            rng.choice(photo_paths) if photo_paths and rng.random() < 0.7 else '',
+        )
@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+from itertools import islice
+
+# Render without a display; must be set before PyQt5 is imported
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import StudentDatabase, STUDENT_COLUMNS
+from benchmarks.generator import generate_students, make_photo_pool, rollno_for, FIRST_NAMES, LAST_NAMES
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+POPULATE_BATCH = 10000
+PHOTO_POOL_SIZE = 50
+
+def summarize(samples_ns):
+    """Latency summary in milliseconds for a list of nanosecond samples"""
+    ordered = sorted(samples_ns)
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] / 1e6
+    return {
+        'count': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) / 1e6,
+        'min_ms': ordered[0] / 1e6,
+        'p50_ms': percentile(50),
+        'p90_ms': percentile(90),
+        'p99_ms': percentile(99),
+        'max_ms': ordered[-1] / 1e6,
+    }
+
+def timed(function, *args):
+    start = time.perf_counter_ns()
+    function(*args)
+    return time.perf_counter_ns() - start
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class SizeBenchmark:
+    """Populates a database of one size and times the StudentDatabase/GUI operations on it"""
+    def __init__(self, size, samples, seed, workdir):
+        self.size = size
+        self.samples = samples
+        self.seed = seed
+        self.workdir = os.path.join(workdir, f'students_{size}')
+        self.rng = random.Random(seed)
+
+    def populate(self, db):
+        """Fill the database with size generated students, reusing a previous run's file"""
+        if db.count_students() == self.size:
+            return 0.0
+        start = time.perf_counter()
+        photos = make_photo_pool(db.photo_store, PHOTO_POOL_SIZE, self.seed)
+        students = generate_students(self.size, self.seed, photos)
+        while True:
+            batch = list(islice(students, POPULATE_BATCH))
+            if not batch:
+                break
+            committed, failures = db.add_students(batch)
+            if not committed:
+                raise RuntimeError(f'Populating failed: {failures[:5]}')
+        return time.perf_counter() - start
+
+    def search_terms(self):
+        terms = []
+        for _ in range(self.samples):
+            kind = self.rng.randrange(4)
+            if kind == 0:
+                terms.append(self.rng.choice(FIRST_NAMES)[:3])
+            elif kind == 1:
+                terms.append(self.rng.choice(LAST_NAMES))
+            elif kind == 2:
+                terms.append(rollno_for(self.rng.randrange(self.size)))
+            else:
+                terms.append(self.rng.choice(('GEN', 'OBC', 'SC', 'ST', 'EWS')))
+        return terms
+
+    def run(self):
+        os.makedirs(os.path.join(self.workdir, 'logs'), exist_ok=True)
+        # The app keeps logs and photos relative to the working directory
+        os.chdir(self.workdir)
+        results = {}
+        with StudentDatabase(os.path.join(self.workdir, 'students.db')) as db:
+            populate_seconds = self.populate(db)
+
+            extra = list(generate_students(self.samples, self.seed, start=self.size))
+            results['add_student'] = summarize([timed(db.add_student, student) for student in extra])
+
+            results['search_student'] = summarize([timed(db.search_student, term)
+                                                   for term in self.search_terms()])
+
+            updates = []
+            for _ in range(self.samples):
+                student = db.get_student_by_rollno(rollno_for(self.rng.randrange(self.size)))
+                updated = list(student[:len(STUDENT_COLUMNS)])
+                updated[10] = round(self.rng.uniform(4, 10), 2)  # Sem5
+                updates.append((student[2], tuple(updated)))
+            results['update_student'] = summarize([timed(db.update_student, rollno, data)
+                                                   for rollno, data in updates])
+
+            results['delete_student'] = summarize([timed(db.delete_student, student[2])
+                                                   for student in extra])
+
+            repeats = max(3, self.samples // 50)
+            results['get_all_students'] = summarize([timed(db.get_all_students) for _ in range(repeats)])
+            results['load_students'] = summarize(self.time_load_students(db, repeats))
+        return {'populate_seconds': populate_seconds, 'operations': results}
+
+    @staticmethod
+    def time_load_students(db, repeats):
+        """Time load_students until its first page is in the model, on the offscreen platform"""
+        import tempfile
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtCore import QEventLoop, QSettings
+        from gui import StudentManagementApp
+        app = QApplication.instance() or QApplication(sys.argv[:1])
+        with tempfile.TemporaryDirectory() as settings_dir:
+            # Keep the user's saved search, sort and filters out of the measurement
+            for settings_format in (QSettings.NativeFormat, QSettings.IniFormat):
+                QSettings.setPath(settings_format, QSettings.UserScope, settings_dir)
+            window = StudentManagementApp(db)
+            window.show()
+
+            def wait_for_pages():
+                while window.page_tasks:
+                    app.processEvents(QEventLoop.WaitForMoreEvents)
+
+            wait_for_pages()  # the initial load
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter_ns()
+                window.load_students()
+                # Loads are asynchronous: wait until this generation's first page is shown
+                wait_for_pages()
+                window.student_table.viewport().repaint()
+                samples.append(time.perf_counter_ns() - start)
+            # close() (unlike hide) waits for background loads before the window goes
+            window.close()
+            window.deleteLater()
+            app.processEvents()
+        return samples
+
+def print_summary(results, baseline=None):
+    for size, result in results.items():
+        print(f'\n{size} students (populated in {result["populate_seconds"]:.1f}s)')
+        print(f'  {"operation":<18}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}')
+        for operation, stats in result['operations'].items():
+            line = f'  {operation:<18}{stats["p50_ms"]:>10.3f}{stats["p90_ms"]:>10.3f}{stats["p99_ms"]:>10.3f}'
+            previous = (baseline or {}).get(size, {}).get('operations', {}).get(operation)
+            if previous and previous['p50_ms']:
+                line += f'   p50 x{stats["p50_ms"] / previous["p50_ms"]:.2f} vs baseline'
+            print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark StudentDatabase and the student table')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--samples', type=int, default=200, help='timed calls per operation')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', default=os.path.join(ROOT, 'benchmark_data'),
+                        help='where generated databases are kept and reused between runs')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare p50 latencies against')
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = SizeBenchmark(size, args.samples, args.seed, os.path.abspath(args.workdir)).run()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'samples': args.samples,
+        },
+        'results': results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_summary(results, baseline)
+    print(f'\nResults written to {output}')
+
+if __name__ == '__main__':
+    main()
@@ -1,72 +1,888 @@
 import sqlite3
-import os
+import csv
 import logging
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from photo_store import PhotoStore
+from instrumentation import Metrics, configure_logging, instrumented
+
+# Column order of the student tuples passed to add_student/update_student
+STUDENT_COLUMNS = ('name', 'parents', 'rollno', 'gender', 'category', 'contact',
+                   'Sem1', 'Sem2', 'Sem3', 'Sem4', 'Sem5', 'Sem6', 'Sem7', 'Sem8',
+                   'photo_path')
+
+# Every column of the students table, in SELECT * order
+ALL_COLUMNS = STUDENT_COLUMNS + ('created_at',)
+
+# Semester grade columns, stored as REAL SGPAs (NULL when not yet graded)
+SEMESTER_COLUMNS = tuple(f'Sem{i}' for i in range(1, 9))
+# Labels of the fields a student's details show, in STUDENT_COLUMNS order
+DETAIL_LABELS = ('Name', 'Son/Daughter Of', 'Roll Number', 'Gender', 'Category', 'Contact',
+                 '1st Sem SGPA', '2nd Sem SGPA', '3rd Sem SGPA', '4th Sem SGPA',
+                 '5th Sem SGPA', '6th Sem SGPA', '7th Sem SGPA', '8th Sem SGPA')
+MAX_SGPA = 10.0
+
+# CGPA (mean of the graded semesters, NULL before the first grade) as a SQL expression.
+# Queries must use this exact text for SQLite to match it to the expression indexes.
+CGPA_SQL = '(({}) / NULLIF({}, 0))'.format(
+    ' + '.join(f'COALESCE({column}, 0)' for column in SEMESTER_COLUMNS),
+    ' + '.join(f'({column} IS NOT NULL)' for column in SEMESTER_COLUMNS))
+
+# Bumped whenever migrate() learns a new upgrade step (stored in PRAGMA user_version)
+SCHEMA_VERSION = 2
+
+# Indexes behind StudentQuery filters and sorts, created by schema version 2
+QUERY_INDEXES = (
+    ('idx_students_category_gender_cgpa', f'category, gender, {CGPA_SQL}'),
+    ('idx_students_gender_cgpa', f'gender, {CGPA_SQL}'),
+    ('idx_students_cgpa', CGPA_SQL),
+    ('idx_students_name', 'name'),
+)
+
+CREATE_STUDENTS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        name TEXT NOT NULL,
+        parents TEXT,
+        rollno TEXT PRIMARY KEY,
+        gender TEXT,
+        category TEXT,
+        contact TEXT,
+        Sem1 REAL,
+        Sem2 REAL,
+        Sem3 REAL,
+        Sem4 REAL,
+        Sem5 REAL,
+        Sem6 REAL,
+        Sem7 REAL,
+        Sem8 REAL,
+        photo_path TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Original text of grades the numeric migration could not convert (they are stored as NULL)
+CREATE_UNCONVERTED_GRADES_TABLE = '''
+    CREATE TABLE IF NOT EXISTS unconverted_grades (
+        rollno TEXT NOT NULL,
+        semester TEXT NOT NULL,
+        value TEXT,
+        migrated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Fields that must be non-empty, as (column, label) pairs
+REQUIRED_FIELDS = (('name', 'Name'), ('rollno', 'Roll Number'), ('gender', 'Gender'))
+
+INSERT_STUDENT_QUERY = '''
+    INSERT INTO students 
+    (name, parents, rollno, gender, category, contact, Sem1, Sem2, Sem3, Sem4, Sem5, Sem6, Sem7, Sem8, photo_path) 
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+UPDATE_STUDENT_QUERY = '''
+    UPDATE students 
+    SET name=?, parents=?, rollno=?, gender=?, category=?, 
+        contact=?, Sem1=?, Sem2=?, Sem3=?, Sem4=?, Sem5=?,
+        Sem6=?, Sem7=?, Sem8=?, photo_path=? 
+    WHERE rollno=?
+'''
+
+# Rows written per transaction during bulk import and per fetch during export
+IMPORT_BATCH_SIZE = 5000
+EXPORT_BATCH_SIZE = 5000
+
+# Student records kept by the read-through cache in get_student_by_rollno
+RECORD_CACHE_SIZE = 1024
+
+# Row changes kept in the student_changes journal for watchers to replay
+CHANGE_JOURNAL_SIZE = 10000
+# Watchers reload instead of replaying more changes than this at once
+CHANGE_BATCH_LIMIT = 1000
+
+# Applied to every connection; WAL lets readers run alongside a writer
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),   # durable with WAL, fsyncs only at checkpoints
+    ('busy_timeout', 5000),      # ms to wait for a competing writer
+    ('cache_size', -65536),      # 64 MiB page cache (negative means KiB)
+    ('mmap_size', 268435456),    # 256 MiB memory-mapped reads
+    ('temp_store', 'MEMORY'),
+)
+
+def parse_sgpa(value):
+    """Convert a grade entry to a float, or None when it is blank or not numeric"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+def format_sgpa(value):
+    """Render a stored SGPA for display, blank when not graded"""
+    return '' if value is None else f'{value:g}'
+
+def _stored_sgpa(column, value):
+    """A grade entry as stored: a float, or None when blank; raises ValueError if not numeric"""
+    sgpa = parse_sgpa(value)
+    if sgpa is None and value is not None and str(value).strip() != '':
+        raise ValueError(f'{column} SGPA must be a number, not {value!r}')
+    return sgpa
+
+def normalize_student(student_data):
+    """Return a student tuple with its semester grades converted for storage.
+    
+    Raises ValueError for a grade that is neither blank nor a number, rather
+    than storing it as ungraded.
+    """
+    return tuple(_stored_sgpa(column, value) if column in SEMESTER_COLUMNS else value
+                 for column, value in zip(STUDENT_COLUMNS, student_data))
+
+class Student:
+    """One student record with named fields.
+
+    Behaves like the tuple rows it is built from (indexing, unpacking, len)
+    so it can be passed anywhere a SELECT * row is accepted.
+    """
+    __slots__ = ALL_COLUMNS
+
+    def __init__(self, *values):
+        for column, value in zip(ALL_COLUMNS, values):
+            setattr(self, column, value)
+        for column in ALL_COLUMNS[len(values):]:
+            setattr(self, column, None)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+    def astuple(self):
+        return tuple(getattr(self, column) for column in ALL_COLUMNS)
+
+    @property
+    def grades(self):
+        """SGPAs of Sem1..Sem8, None where not graded"""
+        return tuple(getattr(self, column) for column in SEMESTER_COLUMNS)
+
+    @property
+    def cgpa(self):
+        """Mean of the graded semesters, or None before the first grade"""
+        graded = [grade for grade in self.grades if grade is not None]
+        return sum(graded) / len(graded) if graded else None
+
+    def __getitem__(self, index):
+        return self.astuple()[index]
+
+    def __iter__(self):
+        return iter(self.astuple())
+
+    def __len__(self):
+        return len(ALL_COLUMNS)
+
+    def __eq__(self, other):
+        if isinstance(other, (Student, tuple)):
+            return self.astuple() == tuple(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f'Student(rollno={self.rollno!r}, name={self.name!r})'
+
+class ConnectionManager:
+    """Hands out one tuned SQLite connection (and cursor) per thread"""
+    def __init__(self, db_name, trace_callback=None):
+        self.db_name = db_name
+        self.trace_callback = trace_callback
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._closed = False
+
+    def connect(self):
+        """Open a new tuned connection that the caller owns"""
+        # Per-thread connections are closed from whichever thread calls close()
+        conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        for pragma, value in SQLITE_PRAGMAS:
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        if self.trace_callback:
+            conn.set_trace_callback(self.trace_callback)
+        return conn
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError('Cannot operate on a closed database.')
+                conn = self.connect()
+                self._connections.append(conn)
+            self._local.conn = conn
+            self._local.cursor = conn.cursor()
+        return conn
+
+    def cursor(self):
+        """Return the calling thread's shared cursor"""
+        self.connection()
+        return self._local.cursor
+
+    def close(self):
+        """Close every connection handed out so far"""
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+class RecordCache:
+    """Bounded, thread-safe LRU of student records keyed by rollno"""
+    def __init__(self, capacity=RECORD_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a read that raced a write is not cached
+        self._version = 0
+
+    def get(self, rollno):
+        """Return (record or None, version); pass the version back to put() after a miss"""
+        with self._lock:
+            record = self._records.get(rollno)
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._records.move_to_end(rollno)
+            return record, self._version
+
+    def put(self, rollno, record, version):
+        """Cache a record read from disk, unless something was invalidated since the read began"""
+        with self._lock:
+            if version != self._version:
+                return
+            self._records[rollno] = record
+            self._records.move_to_end(rollno)
+            if len(self._records) > self.capacity:
+                self._records.popitem(last=False)
+
+    def invalidate(self, rollnos):
+        with self._lock:
+            for rollno in rollnos:
+                self._records.pop(rollno, None)
+            self._version += 1
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._version += 1
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._records), 'capacity': self.capacity}
+
+def _batch_rows(result, records):
+    """Row count of a bulk add/update/delete call for the metrics"""
+    committed, _ = result
+    return len(records) if committed and isinstance(records, (list, tuple)) else 0
+
+class ChangeWatcher:
+    """Reports student rows changed by any connection or process since the last poll.
+
+    Polling first checks PRAGMA data_version on a private connection, which
+    only changes when another connection commits, so an idle poll costs one
+    pragma. Changes come from the student_changes journal, and the changed
+    students are dropped from the database's record cache.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.conn = db.connect()
+        self.data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        self.last_seq = db.latest_change(self.conn)
+
+    def poll(self):
+        """Return new (seq, rollno, old_rollno) changes, or None if too many to replay"""
+        try:
+            data_version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self.data_version:
+                return []
+            self.data_version = data_version
+            changes, self.last_seq = self.db.changes_since(self.last_seq, conn=self.conn)
+            # Records cached before another connection's commit are stale now
+            if changes is None:
+                self.db.record_cache.clear()
+            else:
+                self.db.record_cache.invalidate({rollno for _, new, old in changes for rollno in (new, old)
+                                                 if rollno is not None})
+            return changes
+        except sqlite3.Error as e:
+            logging.error(f"Error polling for changes: {e}")
+            return []
+
+    def close(self):
+        self.conn.close()
+
+class _RollbackBatch(Exception):
+    """Raised inside transaction() to roll back a bulk operation with failed records"""
 
 class StudentDatabase:
-    def __init__(self, db_name='students.db'):
-        # Setup logging
-        logging.basicConfig(filename='logs/database.log', level=logging.INFO, 
-                            format='%(asctime)s - %(levelname)s - %(message)s')
-        
-        # Database connection
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
+    def __init__(self, db_name='students.db', photo_store=None):
+        # Setup logging (written by a background thread)
+        configure_logging()
+        
+        # Per-operation latency/row metrics, fed with the SQL each call runs
+        self.metrics = Metrics()
+        
+        # Database connections, one per thread
+        self.db_name = db_name
+        self.connections = ConnectionManager(db_name, trace_callback=self.metrics.tracer)
+        self._transactions = threading.local()
+        self.record_cache = RecordCache()
+        self.metrics.register_gauge('record_cache_hits', lambda: self.record_cache.hits)
+        self.metrics.register_gauge('record_cache_misses', lambda: self.record_cache.misses)
+        self.photo_store = photo_store or PhotoStore()
         self.create_table()
     
+    @property
+    def conn(self):
+        """The calling thread's connection"""
+        return self.connections.connection()
+    
+    @property
+    def cursor(self):
+        """The calling thread's cursor"""
+        return self.connections.cursor()
+    
+    def close(self):
+        """Close all database connections"""
+        self.connections.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def _transaction_depth(self):
+        return getattr(self._transactions, 'depth', 0)
+    
+    @contextmanager
+    def _single_write(self):
+        """Scope of one add/update/delete: committed on success, undone on failure.
+        
+        Inside a transaction() the write runs in its own savepoint, so a failure
+        undoes only this write and leaves the enclosing transaction usable.
+        Outside one, a failure rolls back so the write lock is not kept.
+        """
+        conn = self.conn
+        depth = self._transaction_depth()
+        if depth:
+            conn.execute('SAVEPOINT single_write')
+        try:
+            yield
+        except BaseException:
+            if depth:
+                conn.execute('ROLLBACK TO single_write')
+                conn.execute('RELEASE single_write')
+            else:
+                conn.rollback()
+            raise
+        if depth:
+            conn.execute('RELEASE single_write')
+        else:
+            conn.commit()
+    
+    @contextmanager
+    def transaction(self):
+        """Group several writes into one atomic commit.
+        
+        Inside the block add/update/delete do not commit on their own. Nested
+        blocks become savepoints of the outer one. Photo files of deleted
+        students are only removed once the outermost commit succeeds.
+        """
+        conn = self.conn
+        depth = self._transaction_depth()
+        savepoint = f'unit_of_work_{depth}'
+        if depth:
+            conn.execute(f'SAVEPOINT {savepoint}')
+        else:
+            # Take the write lock up front so the commit can't hit a busy upgrade
+            conn.execute('BEGIN IMMEDIATE')
+            self._transactions.pending_photos = []
+            self._transactions.pending_rollnos = set()
+        self._transactions.depth = depth + 1
+        try:
+            try:
+                yield self
+            except BaseException:
+                self._transactions.depth = depth
+                if depth:
+                    conn.execute(f'ROLLBACK TO {savepoint}')
+                    conn.execute(f'RELEASE {savepoint}')
+                else:
+                    conn.rollback()
+                raise
+            self._transactions.depth = depth
+            if depth:
+                conn.execute(f'RELEASE {savepoint}')
+                return
+            try:
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            self._remove_unreferenced_photos(self._transactions.pending_photos)
+        finally:
+            if not depth:
+                # Other threads may have cached the old records before the commit
+                self.record_cache.invalidate(self._transactions.pending_rollnos)
+                self._transactions.pending_rollnos = set()
+                self._transactions.pending_photos = []
+    
+    def _invalidate(self, *rollnos):
+        """Drop records from the cache, and again when the enclosing transaction ends"""
+        self.record_cache.invalidate(rollnos)
+        if self._transaction_depth():
+            self._transactions.pending_rollnos.update(rollnos)
+    
+    def cache_stats(self):
+        """Return hit/miss counters and the size of the record cache"""
+        return self.record_cache.stats()
+    
+    def _run_batch(self, operation, records, key):
+        """Apply operation to every record in one transaction, rolling back if any fail.
+        
+        Returns (True, []) once committed, or (False, failures) after the
+        rollback, where failures lists (key, error) for every failed record.
+        """
+        failures = []
+        try:
+            with self.transaction():
+                for record in records:
+                    try:
+                        operation(record)
+                    except (sqlite3.Error, LookupError, ValueError) as e:
+                        failures.append((key(record), str(e)))
+                if failures:
+                    raise _RollbackBatch()
+            return True, []
+        except _RollbackBatch:
+            logging.error(f"Rolled back batch: {len(failures)} records failed")
+            return False, failures
+        except sqlite3.Error as e:
+            logging.error(f"Error committing batch: {e}")
+            return False, failures + [(None, str(e))]
+    
     def create_table(self):
         """Create students table if not exists"""
         try:
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS students (
-                    name TEXT NOT NULL,
-                    parents TEXT,
-                    rollno TEXT PRIMARY KEY,
-                    gender TEXT,
-                    category TEXT,
-                    contact TEXT,
-                    Sem1 TEXT,
-                    Sem2 TEXT,
-                    Sem3 TEXT,
-                    Sem4 TEXT,
-                    Sem5 TEXT,
-                    Sem6 TEXT,
-                    Sem7 TEXT,
-                    Sem8 TEXT,
-                    photo_path TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            self.cursor.execute(CREATE_STUDENTS_TABLE.format(table='students'))
             self.conn.commit()
             logging.info("Database table created successfully")
         except sqlite3.Error as e:
             logging.error(f"Error creating table: {e}")
+        self.migrate()
+        self.create_indexes()
+        self.create_search_index()
+        self.create_change_journal()
+    
+    def create_indexes(self):
+        """Create secondary indexes (after migrate, which may rebuild the table)"""
+        try:
+            # Lets delete_student check cheaply whether a shared photo is still used
+            self.cursor.execute('CREATE INDEX IF NOT EXISTS idx_students_photo_path ON students(photo_path)')
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"Error creating indexes: {e}")
+        if not self._has_statistics():
+            self.analyze()
+    
+    def _has_statistics(self):
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_stat1 WHERE tbl = 'students' LIMIT 1")
+            return self.cursor.fetchone() is not None
+        except sqlite3.Error:
+            return False  # ANALYZE has never run, so sqlite_stat1 doesn't exist
+    
+    @instrumented()
+    def analyze(self):
+        """Refresh the statistics SQLite uses to choose between the query indexes"""
+        try:
+            self.cursor.execute('ANALYZE students')
+            self.conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error analyzing database: {e}")
+            return False
+    
+    def migrate(self):
+        """Upgrade database files created by older versions to the current schema"""
+        try:
+            self.cursor.execute('PRAGMA user_version')
+            version = self.cursor.fetchone()[0]
+            if version < 1:
+                self._migrate_numeric_grades()
+            if version < 2:
+                self._create_query_indexes()
+            self.cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            logging.error(f"Error migrating database: {e}")
+    
+    def _migrate_numeric_grades(self):
+        """Rebuild the students table so Sem1-Sem8 are stored as REAL instead of TEXT.
+        
+        Grades that aren't numbers can't be kept as REAL; their original text is
+        copied to the unconverted_grades table first, in the same transaction.
+        """
+        self.cursor.execute('PRAGMA table_info(students)')
+        column_types = {row[1]: row[2].upper() for row in self.cursor.fetchall()}
+        if all(column_types.get(column) == 'REAL' for column in SEMESTER_COLUMNS):
+            return
+        
+        self.conn.create_function('parse_sgpa', 1, parse_sgpa, deterministic=True)
+        columns = STUDENT_COLUMNS + ('created_at',)
+        converted = [f'parse_sgpa({column})' if column in SEMESTER_COLUMNS else column
+                     for column in columns]
+        self.cursor.execute('BEGIN')
+        self.cursor.execute(CREATE_UNCONVERTED_GRADES_TABLE)
+        self.cursor.execute('INSERT INTO unconverted_grades (rollno, semester, value) ' + ' UNION ALL '.join(
+            f"SELECT rollno, '{column}', {column} FROM students "
+            f"WHERE TRIM({column}) != '' AND parse_sgpa({column}) IS NULL" for column in SEMESTER_COLUMNS))
+        kept = self.cursor.rowcount
+        # Keep rowids so the external-content search index stays valid
+        self.cursor.execute(CREATE_STUDENTS_TABLE.format(table='students_new'))
+        self.cursor.execute(f'''
+            INSERT INTO students_new (rowid, {', '.join(columns)})
+            SELECT rowid, {', '.join(converted)} FROM students
+        ''')
+        self.cursor.execute('DROP TABLE students')
+        self.cursor.execute('ALTER TABLE students_new RENAME TO students')
+        self.conn.commit()
+        logging.info("Migrated semester grades to numeric storage")
+        if kept:
+            logging.warning(f"{kept} non-numeric grades could not be converted; their original text "
+                            f"is kept in the unconverted_grades table")
+    
+    def _create_query_indexes(self):
+        """Index the columns StudentQuery filters and sorts on most"""
+        for name, columns in QUERY_INDEXES:
+            self.cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON students({columns})')
+        logging.info("Created query indexes")
+    
+    def create_search_index(self):
+        """Create the FTS5 search index and its sync triggers, indexing existing rows once"""
+        try:
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='students_fts'")
+            exists = self.cursor.fetchone() is not None
+            self.cursor.executescript('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+                    name, rollno, gender, category,
+                    content='students', content_rowid='rowid', prefix='2 3'
+                );
+                CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+                    INSERT INTO students_fts(rowid, name, rollno, gender, category)
+                    VALUES (new.rowid, new.name, new.rollno, new.gender, new.category);
+                END;
+                CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+                    INSERT INTO students_fts(students_fts, rowid, name, rollno, gender, category)
+                    VALUES ('delete', old.rowid, old.name, old.rollno, old.gender, old.category);
+                END;
+                CREATE TRIGGER IF NOT EXISTS students_fts_update AFTER UPDATE ON students BEGIN
+                    INSERT INTO students_fts(students_fts, rowid, name, rollno, gender, category)
+                    VALUES ('delete', old.rowid, old.name, old.rollno, old.gender, old.category);
+                    INSERT INTO students_fts(rowid, name, rollno, gender, category)
+                    VALUES (new.rowid, new.name, new.rollno, new.gender, new.category);
+                END;
+            ''')
+            if not exists:
+                # Existing databases: index the rows that predate the FTS table
+                self.rebuild_search_index()
+            self.fts_enabled = True
+        except sqlite3.Error as e:
+            # SQLite builds without FTS5 fall back to LIKE scans
+            self.fts_enabled = False
+            logging.error(f"Error creating search index, falling back to LIKE search: {e}")
+    
+    @instrumented()
+    def rebuild_search_index(self):
+        """Re-index every student row in the FTS5 table"""
+        try:
+            self.cursor.execute("INSERT INTO students_fts(students_fts) VALUES('rebuild')")
+            self.conn.commit()
+            logging.info("Search index rebuilt")
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Error rebuilding search index: {e}")
+            return False
+    
+    def create_change_journal(self):
+        """Create the student_changes journal and the triggers that fill it"""
+        try:
+            # Inserts have no old_rollno, deletes no rollno; updates may rename
+            self.cursor.executescript('''
+                CREATE TABLE IF NOT EXISTS student_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    rollno TEXT,
+                    old_rollno TEXT
+                );
+                CREATE TRIGGER IF NOT EXISTS student_changes_insert AFTER INSERT ON students BEGIN
+                    INSERT INTO student_changes(rollno, old_rollno) VALUES (new.rollno, NULL);
+                END;
+                CREATE TRIGGER IF NOT EXISTS student_changes_delete AFTER DELETE ON students BEGIN
+                    INSERT INTO student_changes(rollno, old_rollno) VALUES (NULL, old.rollno);
+                END;
+                CREATE TRIGGER IF NOT EXISTS student_changes_update AFTER UPDATE ON students BEGIN
+                    INSERT INTO student_changes(rollno, old_rollno) VALUES (new.rollno, old.rollno);
+                END;
+            ''')
+            self.prune_change_journal()
+        except sqlite3.Error as e:
+            logging.error(f"Error creating change journal: {e}")
+    
+    def prune_change_journal(self, keep=CHANGE_JOURNAL_SIZE):
+        """Drop all but the newest journal entries"""
+        try:
+            with self._single_write():
+                self.cursor.execute('''
+                    DELETE FROM student_changes
+                    WHERE seq <= (SELECT MAX(seq) FROM student_changes) - ?
+                ''', (keep,))
+        except sqlite3.Error as e:
+            logging.error(f"Error pruning change journal: {e}")
+    
+    def latest_change(self, conn=None):
+        """Sequence number of the newest journaled change (0 if none)"""
+        conn = self.conn if conn is None else conn
+        return conn.execute('SELECT IFNULL(MAX(seq), 0) FROM student_changes').fetchone()[0]
+    
+    @instrumented(rows=lambda result, *args, **kwargs: len(result[0] or ()))
+    def changes_since(self, after_seq, limit=CHANGE_BATCH_LIMIT, conn=None):
+        """Return (changes, last_seq) for the journal entries after after_seq.
+        
+        changes lists (seq, rollno, old_rollno) in commit order. It is None
+        when there are more than limit changes or older ones were pruned;
+        the caller should then reload everything. Pass last_seq next time.
+        """
+        conn = self.conn if conn is None else conn
+        cursor = conn.execute('''
+            SELECT seq, rollno, old_rollno FROM student_changes
+            WHERE seq > ? ORDER BY seq LIMIT ?
+        ''', (after_seq, limit + 1))
+        changes = cursor.fetchall()
+        if not changes:
+            return [], after_seq
+        # Sequence numbers have no gaps, except where old entries were pruned
+        if len(changes) > limit or changes[0][0] != after_seq + 1:
+            return None, self.latest_change(conn)
+        return changes, changes[-1][0]
+    
+    def change_watcher(self):
+        """Return a ChangeWatcher that starts from the current state"""
+        return ChangeWatcher(self)
     
+    @instrumented()
     def add_student(self, student_data):
         """Add new student to database"""
         try:
-            query = '''
-                INSERT INTO students 
-                (name, parents, rollno, gender, category, contact, Sem1, Sem2, Sem3, Sem4, Sem5, Sem6, Sem7, Sem8, photo_path) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            '''
-            self.cursor.execute(query, student_data)
-            self.conn.commit()
+            student_data = normalize_student(student_data)
+            with self._single_write():
+                self.cursor.execute(INSERT_STUDENT_QUERY, student_data)
+            self._invalidate(student_data[2])
             logging.info(f"Added student: {student_data[0]}")
             return student_data[2]  # Return rollno as ID
-        except sqlite3.Error as e:
+        except (sqlite3.Error, ValueError) as e:
             logging.error(f"Error adding student: {e}")
             return None
 
+    @staticmethod
+    def validate_student(student_data):
+        """Return the first validation error for a student tuple, or None"""
+        for column, label in REQUIRED_FIELDS:
+            value = student_data[STUDENT_COLUMNS.index(column)]
+            if value is None or not str(value).strip():
+                return f'{label} cannot be empty'
+        for column in SEMESTER_COLUMNS:
+            value = student_data[STUDENT_COLUMNS.index(column)]
+            if value is None or str(value).strip() == '':
+                continue  # semester not graded yet
+            sgpa = parse_sgpa(value)
+            if sgpa is None or not 0 <= sgpa <= MAX_SGPA:
+                return f'{column} SGPA must be a number between 0 and {MAX_SGPA:g}'
+        return None
+    
+    @staticmethod
+    def _iter_file_rows(path):
+        """Yield raw rows, header first, from a CSV or XLSX file"""
+        if path.lower().endswith('.xlsx'):
+            from openpyxl import load_workbook
+            workbook = load_workbook(path, read_only=True, data_only=True)
+            try:
+                yield from workbook.active.iter_rows(values_only=True)
+            finally:
+                workbook.close()
+        else:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                yield from csv.reader(f)
+    
+    @staticmethod
+    def _iter_import_records(path):
+        """Yield (line number, student tuple) pairs from an import file"""
+        rows = StudentDatabase._iter_file_rows(path)
+        header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+        missing = [label for column, label in REQUIRED_FIELDS if column.lower() not in header]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        positions = [header.index(column.lower()) if column.lower() in header else None
+                     for column in STUDENT_COLUMNS]
+        
+        for line_no, row in enumerate(rows, start=2):
+            if not any(cell not in (None, '') for cell in row):
+                continue  # skip blank lines
+            yield line_no, tuple(
+                '' if pos is None or pos >= len(row) or row[pos] is None else str(row[pos]).strip()
+                for pos in positions
+            )
+    
+    def _insert_batch(self, batch, errors):
+        """Insert (line number, student tuple) pairs in one transaction, isolating failing rows.
+        
+        Inside a caller's transaction() the batch is a savepoint of it, and
+        the caller's commit makes it permanent.
+        """
+        rollnos = [student_data[2] for _, student_data in batch]
+        try:
+            with self.transaction():
+                self.cursor.executemany(INSERT_STUDENT_QUERY, [student_data for _, student_data in batch])
+                self._invalidate(*rollnos)
+            return len(batch)
+        except sqlite3.Error:
+            pass  # rolled back by transaction()
+        
+        # Retry row by row so one duplicate doesn't sink the whole batch
+        inserted = 0
+        with self.transaction():
+            for line_no, student_data in batch:
+                try:
+                    self.cursor.execute(INSERT_STUDENT_QUERY, student_data)
+                    inserted += 1
+                except sqlite3.Error as e:
+                    errors.append((line_no, str(e)))
+            self._invalidate(*rollnos)
+        return inserted
+    
+    @instrumented(rows=lambda result, *args, **kwargs: result[0])
+    def import_students(self, path, progress=None):
+        """Bulk import students from a CSV or XLSX file.
+        
+        Rows are streamed, validated like the add dialog and inserted in batched
+        transactions. Returns (imported count, errors) where errors is a list of
+        (line number, message) pairs for the rows that were skipped. The optional
+        progress callback receives the number of rows processed so far.
+        """
+        imported, processed = 0, 0
+        errors, batch = [], []
+        try:
+            for line_no, student_data in self._iter_import_records(path):
+                processed += 1
+                error = self.validate_student(student_data)
+                if error:
+                    errors.append((line_no, error))
+                else:
+                    batch.append((line_no, normalize_student(student_data)))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    imported += self._insert_batch(batch, errors)
+                    batch = []
+                    if progress:
+                        progress(processed)
+            if batch:
+                imported += self._insert_batch(batch, errors)
+            if progress:
+                progress(processed)
+        except (OSError, ValueError, ImportError, sqlite3.Error) as e:
+            logging.error(f"Error importing students from {path}: {e}")
+            errors.append((0, str(e)))
+        if imported >= IMPORT_BATCH_SIZE and not self._transaction_depth():
+            # Large imports change the data distribution the query planner relies on
+            # (analyze() commits, so inside a transaction() it's left to the caller)
+            self.analyze()
+        errors.sort()
+        logging.info(f"Imported {imported} students from {path} ({len(errors)} errors)")
+        return imported, errors
+    
+    @instrumented(rows=lambda result, *args, **kwargs: result)
+    def export_students(self, path, progress=None):
+        """Stream all students to a CSV or XLSX file, returning the row count or None on failure"""
+        exported = 0
+        try:
+            pages = self.iter_student_pages(columns=STUDENT_COLUMNS, page_size=EXPORT_BATCH_SIZE)
+            if path.lower().endswith('.xlsx'):
+                from openpyxl import Workbook
+                workbook = Workbook(write_only=True)
+                sheet = workbook.create_sheet('Students')
+                sheet.append(STUDENT_COLUMNS)
+                for rows in pages:
+                    for row in rows:
+                        sheet.append(row)
+                    exported += len(rows)
+                    if progress:
+                        progress(exported)
+                workbook.save(path)
+            else:
+                with open(path, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(STUDENT_COLUMNS)
+                    for rows in pages:
+                        writer.writerows(rows)
+                        exported += len(rows)
+                        if progress:
+                            progress(exported)
+            logging.info(f"Exported {exported} students to {path}")
+            return exported
+        except (OSError, ImportError, sqlite3.Error) as e:
+            logging.error(f"Error exporting students to {path}: {e}")
+            return None
+    
+    @staticmethod
+    def _fts_query(search_term):
+        """Turn free text into an FTS5 query that prefix-matches every word"""
+        words = search_term.split()
+        return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+    
+    def _search_query(self, search_term, columns='students.*', rollnos=None):
+        """Build the SQL and parameters used to search for a non-empty term, optionally among given rollnos"""
+        among, among_params = '', ()
+        if rollnos is not None:
+            among = f"students.rollno IN ({','.join('?' * len(rollnos))}) AND "
+            among_params = tuple(rollnos)
+        if self.fts_enabled:
+            # Ranking a restricted search would make SQLite score every match first
+            order = '' if rollnos is not None else 'ORDER BY students_fts.rank'
+            query = f'''
+                SELECT {columns} FROM students_fts
+                JOIN students ON students.rowid = students_fts.rowid
+                WHERE {among}students_fts MATCH ?
+                {order}
+            '''
+            return query, among_params + (self._fts_query(search_term),)
+        query = f'''
+            SELECT {columns} FROM students 
+            WHERE {among}(name LIKE ? OR rollno LIKE ? OR gender LIKE ? OR category LIKE ?)
+        '''
+        search_pattern = f'%{search_term}%'
+        return query, among_params + (search_pattern, search_pattern, search_pattern, search_pattern)
+    
+    @instrumented()
     def search_student(self, search_term):
         """Search students by various attributes"""
+        if not search_term.strip():
+            return self.get_all_students()
         try:
-            query = '''
-                SELECT * FROM students 
-                WHERE name LIKE ? OR rollno LIKE ? OR gender LIKE ? OR category LIKE ?
-            '''
-            search_pattern = f'%{search_term}%'
-            self.cursor.execute(query, (search_pattern, search_pattern, search_pattern, search_pattern))
+            self.cursor.execute(*self._search_query(search_term))
             results = self.cursor.fetchall()
             logging.info(f"Search for '{search_term}' returned {len(results)} results")
             return results
@@ -74,48 +890,246 @@ class StudentDatabase:
             logging.error(f"Error searching students: {e}")
             return []
     
+    def connect(self):
+        """Open an additional tuned connection to the same database file"""
+        return self.connections.connect()
+    
+    @contextmanager
+    def interruptible(self, cancelled):
+        """Abort queries this thread runs inside the block once cancelled() returns True"""
+        conn = self.conn
+        # SQLite polls the handler while stepping and aborts once it returns True
+        conn.set_progress_handler(cancelled, 1000)
+        try:
+            yield
+        finally:
+            conn.set_progress_handler(None, 0)
+    
+    @instrumented()
+    def search_ranked(self, search_term, columns='students.rollno', conn=None):
+        """Return (rank, *columns) rows for a search, best match first.
+        
+        rank is the FTS5 bm25 score (lower is better), or 0 without FTS5, so
+        ranked results from several databases can be merged. Raises sqlite3.Error.
+        """
+        conn = self.conn if conn is None else conn
+        rank = 'students_fts.rank' if self.fts_enabled else '0'
+        return conn.execute(*self._search_query(search_term, f'{rank}, {columns}')).fetchall()
+    
+    @instrumented()
+    def search_rollnos(self, search_term, conn=None):
+        """Return matching roll numbers, using the given connection or this thread's.
+        
+        Raises sqlite3.Error so callers can tell an interrupted query apart
+        from an empty result.
+        """
+        conn = self.conn if conn is None else conn
+        cursor = conn.execute(*self._search_query(search_term, 'students.rollno'))
+        return [row[0] for row in cursor]
+    
+    def _search_condition(self, search_term):
+        """WHERE condition and params restricting students to a search term's matches"""
+        if self.fts_enabled:
+            return ('rowid IN (SELECT rowid FROM students_fts WHERE students_fts MATCH ?)',
+                    (self._fts_query(search_term),))
+        search_pattern = f'%{search_term}%'
+        return ('(name LIKE ? OR rollno LIKE ? OR gender LIKE ? OR category LIKE ?)',
+                (search_pattern,) * 4)
+
+    @instrumented(rows=lambda result, *args, **kwargs: len(result))
+    def query_sorted(self, query, columns=None, conn=None):
+        """Return (sort value, *columns) rows selected by a StudentQuery.
+
+        The leading sort value lets results from several databases be merged.
+        Raises sqlite3.Error (or ValueError for unknown columns).
+        """
+        conn = self.conn if conn is None else conn
+        search = None if query.term is None else self._search_condition(query.term)
+        return conn.execute(*query.compile(self._projection(columns), search)).fetchall()
+
+    def query_students(self, query, columns=None):
+        """Return the students (projected to columns) selected by a StudentQuery"""
+        try:
+            return [row[1:] for row in self.query_sorted(query, columns)]
+        except (sqlite3.Error, OSError) as e:
+            logging.error(f"Error querying students: {e}")
+            return []
+
+    def iter_query(self, query, columns=None, page_size=500, after=None):
+        """Yield the students selected by a StudentQuery (ignoring its own page) in keyset pages.
+
+        after is the (sort value, rollno) of the last row already shown, if any.
+        """
+        columns = ('rollno',) + tuple(columns or ALL_COLUMNS)
+        while True:
+            page = query.page(page_size)
+            if after is not None:
+                page = page.after(*after)
+            try:
+                rows = self.query_sorted(page, columns)
+            except (sqlite3.Error, OSError) as e:
+                logging.error(f"Error querying students: {e}")
+                return
+            for row in rows:
+                yield row[2:]
+            if len(rows) < page_size:
+                return
+            after = rows[-1][:2]
+
+    def column_values(self, column):
+        """Distinct non-empty values of a column, sorted (for filter choices)"""
+        if column not in ALL_COLUMNS:
+            raise ValueError(f"Unknown student column: {column}")
+        try:
+            self.cursor.execute(f"SELECT DISTINCT {column} FROM students WHERE {column} != '' ORDER BY {column}")
+            return [row[0] for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            logging.error(f"Error reading {column} values: {e}")
+            return []
+
+    @instrumented()
+    def match_rollnos(self, search_term, rollnos):
+        """Return the set of the given roll numbers whose students match a search term"""
+        rollnos = list(rollnos)
+        matched = set()
+        try:
+            for start in range(0, len(rollnos), 500):
+                chunk = rollnos[start:start + 500]
+                cursor = self.conn.execute(*self._search_query(search_term, 'students.rollno', chunk))
+                matched.update(row[0] for row in cursor)
+        except sqlite3.Error as e:
+            logging.error(f"Error matching students against '{search_term}': {e}")
+        return matched
+    
+    @instrumented()
+    def iter_students_by_rollnos(self, rollnos, chunk_size=500, columns=None):
+        """Yield records (projected to columns) for the given roll numbers, preserving their order"""
+        column_sql = ', '.join(self._projection(columns))
+        try:
+            for start in range(0, len(rollnos), chunk_size):
+                chunk = rollnos[start:start + chunk_size]
+                placeholders = ','.join('?' * len(chunk))
+                cursor = self.conn.execute(
+                    f'SELECT rollno, {column_sql} FROM students WHERE rollno IN ({placeholders})', chunk)
+                by_rollno = {row[0]: row[1:] for row in cursor}
+                for rollno in chunk:
+                    if rollno in by_rollno:
+                        yield by_rollno[rollno]
+        except sqlite3.Error as e:
+            logging.error(f"Error retrieving students by rollno: {e}")
+    
+    @instrumented()
     def update_student(self, rollno, updated_data):
         """Update existing student record"""
         try:
-            query = '''
-                UPDATE students 
-                SET name=?, parents=?, rollno=?, gender=?, category=?, 
-                    contact=?, Sem1=?, Sem2=?, Sem3=?, Sem4=?, Sem5=?,
-                    Sem6=?, Sem7=?, Sem8=?, photo_path=? 
-                WHERE rollno=?
-            '''
             # The last parameter should be the original rollno (before any changes)
-            full_update_data = updated_data + (rollno,)
-            self.cursor.execute(query, full_update_data)
-            self.conn.commit()
+            full_update_data = normalize_student(updated_data) + (rollno,)
+            with self._single_write():
+                self.cursor.execute(UPDATE_STUDENT_QUERY, full_update_data)
+            # A changed rollno moves the record, so drop both keys
+            self._invalidate(rollno, updated_data[2])
             logging.info(f"Updated student with rollno: {rollno}")
             return True
-        except sqlite3.Error as e:
+        except (sqlite3.Error, ValueError) as e:
             logging.error(f"Error updating student: {e}")
             return False
     
+    def _delete_student_row(self, rollno):
+        """Delete one record, returning its photo path; raises LookupError if absent"""
+        self.cursor.execute('SELECT photo_path FROM students WHERE rollno=?', (rollno,))
+        result = self.cursor.fetchone()
+        if result is None:
+            raise LookupError(f'Student with rollno {rollno} not found')
+        self.cursor.execute('DELETE FROM students WHERE rollno=?', (rollno,))
+        return result[0]
+    
+    def _release_photo(self, photo_path):
+        """Remove a photo once no student references it, deferring inside transactions"""
+        if not photo_path:
+            return
+        if self._transaction_depth():
+            self._transactions.pending_photos.append(photo_path)
+        else:
+            self._remove_unreferenced_photos([photo_path])
+    
+    def photo_in_use(self, photo_path):
+        """True if any student record points at the photo"""
+        self.cursor.execute('SELECT 1 FROM students WHERE photo_path=? LIMIT 1', (photo_path,))
+        return self.cursor.fetchone() is not None
+    
+    def _remove_unreferenced_photos(self, photo_paths):
+        """Delete photo files no record points at (photos are shared by content)"""
+        for photo_path in set(photo_paths):
+            try:
+                if not self.photo_in_use(photo_path):
+                    self.photo_store.remove(photo_path)
+            except sqlite3.Error as e:
+                logging.error(f"Error checking photo references for {photo_path}: {e}")
+    
+    @instrumented()
     def delete_student(self, rollno):
         """Delete student record"""
         try:
-            # First, get the photo path to delete the file
-            self.cursor.execute('SELECT photo_path FROM students WHERE rollno=?', (rollno,))
-            result = self.cursor.fetchone()
-            photo_path = result[0] if result else None
-            
-            # Delete student record
-            self.cursor.execute('DELETE FROM students WHERE rollno=?', (rollno,))
-            self.conn.commit()
-            
-            # Remove photo file if it exists
-            if photo_path and os.path.exists(photo_path):
-                os.remove(photo_path)
-            
+            with self._single_write():
+                photo_path = self._delete_student_row(rollno)
+            self._invalidate(rollno)
+            self._release_photo(photo_path)
             logging.info(f"Deleted student with rollno: {rollno}")
             return True
+        except LookupError:
+            # Deleting a missing record has always counted as success
+            logging.info(f"No student to delete with rollno: {rollno}")
+            return True
         except sqlite3.Error as e:
             logging.error(f"Error deleting student: {e}")
             return False
     
+    @instrumented(rows=_batch_rows)
+    def add_students(self, students):
+        """Add many students in one atomic commit, returning (committed, failures)"""
+        students = list(students)
+        def add(student_data):
+            error = self.validate_student(student_data)
+            if error:
+                raise ValueError(error)
+            self.cursor.execute(INSERT_STUDENT_QUERY, normalize_student(student_data))
+            self._invalidate(student_data[2])
+        committed, failures = self._run_batch(add, students, key=lambda student_data: student_data[2])
+        if committed:
+            logging.info(f"Added {len(students)} students in one transaction")
+        return committed, failures
+    
+    @instrumented(rows=_batch_rows)
+    def update_students(self, updates):
+        """Apply (rollno, updated_data) pairs in one atomic commit, returning (committed, failures)"""
+        updates = list(updates)
+        def update(item):
+            rollno, updated_data = item
+            error = self.validate_student(updated_data)
+            if error:
+                raise ValueError(error)
+            self.cursor.execute(UPDATE_STUDENT_QUERY, normalize_student(updated_data) + (rollno,))
+            if self.cursor.rowcount == 0:
+                raise LookupError(f'Student with rollno {rollno} not found')
+            self._invalidate(rollno, updated_data[2])
+        committed, failures = self._run_batch(update, updates, key=lambda item: item[0])
+        if committed:
+            logging.info(f"Updated {len(updates)} students in one transaction")
+        return committed, failures
+    
+    @instrumented(rows=_batch_rows)
+    def delete_students(self, rollnos):
+        """Delete many students in one atomic commit, returning (committed, failures)"""
+        rollnos = list(rollnos)
+        def delete(rollno):
+            self._release_photo(self._delete_student_row(rollno))
+            self._invalidate(rollno)
+        committed, failures = self._run_batch(delete, rollnos, key=lambda rollno: rollno)
+        if committed:
+            logging.info(f"Deleted {len(rollnos)} students in one transaction")
+        return committed, failures
+    
+    @instrumented()
     def get_all_students(self):
         """Retrieve all student records"""
         try:
@@ -125,15 +1139,109 @@ class StudentDatabase:
             logging.error(f"Error retrieving all students: {e}")
             return []
     
+    @staticmethod
+    def _projection(columns):
+        """Validate a column projection, defaulting to every column"""
+        if columns is None:
+            return ALL_COLUMNS
+        unknown = [column for column in columns if column not in ALL_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown student columns: {', '.join(unknown)}")
+        return tuple(columns)
+    
+    @instrumented(rows=lambda result, *args, **kwargs: len(result[0]))
+    def get_students_page(self, after_rollno=None, limit=100, columns=None):
+        """Return one page of students ordered by rollno, using keyset pagination.
+        
+        Returns (rows, last_rollno); pass last_rollno as after_rollno to get the
+        next page. last_rollno is None once there are no more rows. Each query
+        is a short index range scan, so deep pages cost the same as the first.
+        """
+        column_sql = ', '.join(self._projection(columns))
+        try:
+            if after_rollno is None:
+                self.cursor.execute(f'SELECT rollno, {column_sql} FROM students ORDER BY rollno LIMIT ?',
+                                    (limit,))
+            else:
+                self.cursor.execute(f'''
+                    SELECT rollno, {column_sql} FROM students
+                    WHERE rollno > ? ORDER BY rollno LIMIT ?
+                ''', (after_rollno, limit))
+            rows = self.cursor.fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Error retrieving students after rollno {after_rollno}: {e}")
+            return [], None
+        last_rollno = rows[-1][0] if len(rows) == limit else None
+        return [row[1:] for row in rows], last_rollno
+    
+    def iter_student_pages(self, columns=None, page_size=500, after_rollno=None):
+        """Yield every student (after after_rollno), page by page, without holding a read open between pages"""
+        while True:
+            rows, after_rollno = self.get_students_page(after_rollno, page_size, columns)
+            if rows:
+                yield rows
+            if after_rollno is None:
+                return
+    
+    def iter_students(self, columns=None, page_size=500, after_rollno=None):
+        """Yield every student (projected to columns) in rollno order, in constant memory"""
+        for rows in self.iter_student_pages(columns, page_size, after_rollno):
+            yield from rows
+    
+    @instrumented()
+    def count_students(self):
+        """Return the number of student records"""
+        try:
+            self.cursor.execute('SELECT COUNT(*) FROM students')
+            return self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            logging.error(f"Error counting students: {e}")
+            return 0
+    
+    @instrumented(rows=lambda result, *args, **kwargs: sum(len(cgpas) for _, _, cgpas in result))
+    def get_cgpa_groups(self):
+        """Return (category, gender, CGPAs) for every category/gender pair present.
+        
+        A CGPA is None for a student not yet graded. They are read from the
+        category/gender/CGPA index in one snapshot, so only one number per
+        student crosses into Python.
+        """
+        conn = self.connect()
+        try:
+            # One read transaction, so the group counts and the CGPAs agree
+            conn.execute('BEGIN')
+            counts = conn.execute('''
+                SELECT IFNULL(category, ''), IFNULL(gender, ''), COUNT(*) FROM students
+                GROUP BY category, gender ORDER BY category, gender
+            ''').fetchall()
+            cgpas = [cgpa for (cgpa,) in conn.execute(
+                f'SELECT {CGPA_SQL} FROM students ORDER BY category, gender, {CGPA_SQL}')]
+        except sqlite3.Error as e:
+            logging.error(f"Error reading CGPAs: {e}")
+            return []
+        finally:
+            conn.close()
+        groups, start = [], 0
+        for category, gender, count in counts:
+            groups.append((category, gender, cgpas[start:start + count]))
+            start += count
+        return groups
+    
+    @instrumented()
     def get_student_by_rollno(self, rollno):
         """Retrieve a specific student by rollno"""
+        # Inside a transaction this thread may see uncommitted rows, so bypass the cache
+        in_transaction = self._transaction_depth() > 0
+        if not in_transaction:
+            student, version = self.record_cache.get(rollno)
+            if student is not None:
+                return student
         try:
             self.cursor.execute('SELECT * FROM students WHERE rollno=?', (rollno,))
-            return self.cursor.fetchone()
+            student = self.cursor.fetchone()
+            if student is not None and not in_transaction:
+                self.record_cache.put(rollno, student, version)
+            return student
         except sqlite3.Error as e:
             logging.error(f"Error retrieving student with rollno {rollno}: {e}")
             return None
-    
-    def __del__(self):
-        """Close database connection"""
-        self.conn.close()
\ No newline at end of file
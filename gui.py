@@ -1,25 +1,363 @@
 import os
 import sys
+import sqlite3
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import islice, chain
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QLabel, QLineEdit, QPushButton, QTableWidget, 
-                             QTableWidgetItem, QFileDialog, QMessageBox, 
-                             QDialog, QFormLayout)
-from PyQt5.QtGui import QPixmap, QImage, QFont, QPalette, QColor
-from PyQt5.QtCore import Qt
-from PIL import Image
-from database import StudentDatabase
+                             QLabel, QLineEdit, QPushButton, QTableView, 
+                             QHeaderView, QFileDialog, QMessageBox, 
+                             QDialog, QFormLayout, QStyledItemDelegate,
+                             QStyleOptionButton, QStyle, QApplication,
+                             QProgressDialog, QTableWidget, QTableWidgetItem,
+                             QComboBox, QDoubleSpinBox, QInputDialog)
+from PyQt5.QtGui import QPixmap, QPixmapCache, QImage, QFont, QPalette, QColor
+from PyQt5.QtCore import (Qt, QAbstractTableModel, QModelIndex, QEvent, QRect,
+                          QObject, QRunnable, QThreadPool, QTimer, QSettings, pyqtSignal)
+from database import StudentDatabase, Student, STUDENT_COLUMNS, DETAIL_LABELS, MAX_SGPA, format_sgpa
+from query import StudentQuery
+
+class StudentTableModel(QAbstractTableModel):
+    """Table model that pulls student rows lazily in fixed-size chunks"""
+    HEADERS = ['Name', 'Son/Daughter Of', 'Roll Number', 'Gender',
+               'Category', 'Contact', 'Actions']
+    # Only the displayed columns are fetched; View loads the full record
+    COLUMNS = STUDENT_COLUMNS[:6]
+    ACTIONS_COLUMN = 6
+    ROLLNO_COLUMN = COLUMNS.index('rollno')
+    CHUNK_SIZE = 256
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._students = []
+        self._source = iter(())
+        self._exhausted = True
+        # rollno -> row of the loaded students, rebuilt on the next lookup after rows move
+        self._rows = {}
+        self._rows_stale = False
+
+    def set_source(self, students):
+        """Replace the model contents with a new iterable of student rows"""
+        self.beginResetModel()
+        self._students = []
+        self._rows, self._rows_stale = {}, False
+        self._source = iter(students)
+        self._exhausted = False
+        self.endResetModel()
+
+    def student_at(self, row):
+        """Return the (displayed columns of the) student shown at the given row"""
+        return self._students[row]
+
+    def loaded_rollnos(self):
+        """Roll numbers of the rows fetched so far, in display order"""
+        return [student[self.ROLLNO_COLUMN] for student in self._students]
+
+    def row_of(self, rollno):
+        """Return the row showing the given student, or None if it isn't loaded"""
+        if self._rows_stale:
+            self._rows = {student[self.ROLLNO_COLUMN]: row for row, student in enumerate(self._students)}
+            self._rows_stale = False
+        return self._rows.get(rollno)
+
+    def replace_row(self, row, student):
+        """Show new values for the student at a row (with the same rollno)"""
+        self._students[row] = student
+        self.dataChanged.emit(self.index(row, 0), self.index(row, self.ACTIONS_COLUMN - 1))
+
+    def insert_row(self, row, student):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._students.insert(row, student)
+        self._rows_stale = True
+        self.endInsertRows()
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._students[row]
+        self._rows_stale = True
+        self.endRemoveRows()
+
+    def exhausted(self):
+        """True once every row of the source has been fetched"""
+        return self._exhausted
+
+    def set_tail(self, students):
+        """Replace the rows that have not been fetched yet, keeping the loaded ones"""
+        self._source = iter(students)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._students)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.column() == self.ACTIONS_COLUMN:
+            return None
+        if role == Qt.DisplayRole:
+            return str(self._students[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        chunk = list(islice(self._source, self.CHUNK_SIZE))
+        if len(chunk) < self.CHUNK_SIZE:
+            self._exhausted = True
+        if not chunk:
+            return
+        first = len(self._students)
+        self.beginInsertRows(QModelIndex(), first, first + len(chunk) - 1)
+        self._students.extend(chunk)
+        if not self._rows_stale:
+            self._rows.update((student[self.ROLLNO_COLUMN], row) for row, student in enumerate(chunk, first))
+        self.endInsertRows()
+
+class ActionButtonDelegate(QStyledItemDelegate):
+    """Paints the Edit/Delete/View buttons of a row without per-row widgets"""
+    LABELS = ('Edit', 'Delete', 'View')
+    clicked = pyqtSignal(str, int)  # button label, table row
+
+    def _button_rects(self, rect):
+        width = rect.width() // len(self.LABELS)
+        return [QRect(rect.left() + i * width, rect.top(), width, rect.height()).adjusted(2, 2, -2, -2)
+                for i in range(len(self.LABELS))]
+
+    def paint(self, painter, option, index):
+        style = option.widget.style() if option.widget else QApplication.style()
+        for label, rect in zip(self.LABELS, self._button_rects(option.rect)):
+            button = QStyleOptionButton()
+            button.rect = rect
+            button.text = label
+            button.state = QStyle.State_Enabled | QStyle.State_Raised
+            style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            for label, rect in zip(self.LABELS, self._button_rects(option.rect)):
+                if rect.contains(event.pos()):
+                    self.clicked.emit(label, index.row())
+                    return True
+        return super().editorEvent(event, model, option, index)
+
+class SearchSignals(QObject):
+    finished = pyqtSignal(int, str, object)  # generation, search term, rollnos (None if not completed)
+
+class SearchTask(QRunnable):
+    """Runs one search on a worker thread, aborting if a newer search supersedes it"""
+
+    def __init__(self, db, generation, search_term):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db = db
+        self.generation = generation
+        self.search_term = search_term
+        self.cancelled = threading.Event()
+        self.signals = SearchSignals()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        # Always reports back, so the window can release the task
+        rollnos = None
+        if not self.cancelled.is_set():
+            try:
+                # Runs on this worker thread's own connection
+                with self.db.interruptible(self.cancelled.is_set):
+                    rollnos = self.db.search_rollnos(self.search_term)
+            except (sqlite3.Error, OSError):
+                pass  # interrupted by a newer search, or the server is unreachable
+        self.signals.finished.emit(self.generation, self.search_term, rollnos)
+
+class PageSignals(QObject):
+    loaded = pyqtSignal(int, object, object)  # generation, rows, rollno to continue after
+
+class FirstPageTask(QRunnable):
+    """Fetches the first page of the table (every student, or a StudentQuery's) off the GUI thread"""
+    def __init__(self, db, generation, limit, query=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db = db
+        self.generation = generation
+        self.limit = limit
+        self.query = query
+        self.signals = PageSignals()
+
+    def run(self):
+        if self.query is None:
+            rows, last_rollno = self.db.get_students_page(None, self.limit, StudentTableModel.COLUMNS)
+            self.signals.loaded.emit(self.generation, rows, last_rollno)
+            return
+        try:
+            rows = self.db.query_sorted(self.query.page(self.limit), ('rollno',) + StudentTableModel.COLUMNS)
+        except (sqlite3.Error, OSError):
+            rows = []  # logged by the database; show an empty table
+        # Later pages continue after the last row's (sort value, rollno)
+        after = rows[-1][:2] if len(rows) == self.limit else None
+        self.signals.loaded.emit(self.generation, [row[2:] for row in rows], after)
+
+class FilterComboBox(QComboBox):
+    """Choice of 'Any' or one value of a column, listed when the popup first opens"""
+    ANY = 'Any'
+
+    def __init__(self, load_values, parent=None):
+        super().__init__(parent)
+        self.load_values = load_values
+        self.loaded = False
+        self.addItem(self.ANY)
+
+    def value(self):
+        """The selected value, or None for Any"""
+        return None if self.currentIndex() <= 0 else self.currentText()
+
+    def showPopup(self):
+        if not self.loaded:
+            self.loaded = True
+            self.addItems([value for value in self.load_values() if value != self.currentText()])
+        super().showPopup()
+
+class RosterSignals(QObject):
+    loaded = pyqtSignal(object)  # (Roster, change watcher started before loading)
+
+class RosterLoadTask(QRunnable):
+    """Reads the columnar roster snapshot used for sorting off the GUI thread"""
+    def __init__(self, db):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db = db
+        self.signals = RosterSignals()
+
+    def run(self):
+        # NumPy is only imported once a column is sorted
+        from roster import Roster
+        # Changes made while loading are replayed afterwards from this watcher
+        watcher = self.db.change_watcher()
+        self.signals.loaded.emit((Roster.load(self.db), watcher))
+
+class StatisticsSignals(QObject):
+    finished = pyqtSignal(object)  # (stats, top students), or None if they couldn't be read
+
+class StatisticsTask(QRunnable):
+    """Loads and computes grade analytics off the GUI thread"""
+    def __init__(self, db):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.db = db
+        self.signals = StatisticsSignals()
+
+    def run(self):
+        # NumPy is only imported once statistics are first requested
+        from analytics import GradeAnalytics
+        analytics = GradeAnalytics(self.db)
+        try:
+            analytics.load()
+            result = (analytics.compute(), analytics.top_students())
+        except (sqlite3.Error, OSError):
+            result = None  # logged by the database
+        self.signals.finished.emit(result)
+
+class PhotoSignals(QObject):
+    loaded = pyqtSignal(str, QImage, bool)  # cache key, decoded image (null on failure), whether the file exists
+
+class PhotoLoadTask(QRunnable):
+    """Decodes and scales a student photo off the GUI thread"""
+    def __init__(self, photo_store, photo_path, size, key):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.photo_store = photo_store
+        self.photo_path = photo_path
+        self.size = size
+        self.key = key
+        self.signals = PhotoSignals()
+
+    def run(self):
+        # A remote store downloads the file here, returning '' if the server has none
+        path = self.photo_store.best_path(self.photo_path, self.size)
+        if not path or not os.path.exists(path):
+            self.signals.loaded.emit(self.key, QImage(), False)
+            return
+        # QImage (unlike QPixmap) may be used outside the GUI thread
+        image = QImage(path)
+        if not image.isNull() and (image.width() > self.size or image.height() > self.size):
+            image = image.scaled(self.size, self.size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.signals.loaded.emit(self.key, image, True)
 
 class StudentManagementApp(QMainWindow):
-    def __init__(self):
+    PHOTO_CACHE_KB = 20 * 1024
+    SEARCH_DEBOUNCE_MS = 250
+    SEARCH_CACHE_SIZE = 64
+    CHANGE_POLL_MS = 500
+
+    def __init__(self, db=None):
         super().__init__()
-        self.db = StudentDatabase()
+        self.db = db or StudentDatabase()
         self.selected_photo_path = None
+        
+        # Live search state
+        self.search_pool = QThreadPool(self)
+        self.search_pool.setMaxThreadCount(1)
+        self.search_pool.setExpiryTimeout(-1)  # keep the worker, and its connection, alive
+        # Searches queued or running, by generation, kept alive until they report back
+        self.search_tasks = {}
+        self.search_generation = 0
+        self.search_cache = OrderedDict()  # search term -> matching rollnos
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.search_students)
+        
+        # First-page loads in flight, by generation, kept alive until they report back
+        self.page_tasks = {}
+        
+        # What the table shows: every student (view_term None) or the matches of
+        # view_term, in view_rollnos order. Changes to it are applied in place.
+        self.view_term = None
+        self.view_rollnos = []
+        # Filtered or sorted views are re-run on changes instead
+        self.view_filtered = False
+        self.change_watcher = self.db.change_watcher()
+        self.change_timer = QTimer(self)
+        self.change_timer.setInterval(self.CHANGE_POLL_MS)
+        self.change_timer.timeout.connect(self.poll_changes)
+        self.change_timer.start()
+        
+        # Clicking a header sorts by that column in memory, on a columnar snapshot
+        # of every student that is loaded on first use and kept up to date
+        self.sort_key = None  # (column, descending)
+        self.roster = None
+        self.roster_task = None
+        
+        # Statistics are computed on the search pool too; kept alive until it reports back
+        self.statistics_task = None
+        
+        # Photos decode on a worker pool into a bounded pixmap cache
+        QPixmapCache.setCacheLimit(self.PHOTO_CACHE_KB)
+        self.photo_pool = QThreadPool(self)
+        self.photo_tasks = set()
+        
         self.initUI()
     
     def initUI(self):
         """Initialize the main user interface"""
         self.setWindowTitle('Student Management System')
         self.setGeometry(100, 100, 1200, 800)
+        self.settings = QSettings('StudentManagement', 'StudentManagementSystem')
+        geometry = self.settings.value('window/geometry')
+        if geometry is not None:
+            self.restoreGeometry(geometry)
         
         # Set a modern, dark color scheme
         self.setStyleSheet("""
@@ -45,7 +383,7 @@ class StudentManagementApp(QMainWindow):
             QPushButton:hover {
                 background-color: #2980B9;
             }
-            QTableWidget {
+            QTableView {
                 background-color: #34495E;
                 color: #ECF0F1;
                 alternate-background-color: #2C3E50;
@@ -64,16 +402,48 @@ class StudentManagementApp(QMainWindow):
         self.search_input.setPlaceholderText('Search by Name, Roll Number, Gender or Category')
         search_button = QPushButton('Search')
         search_button.clicked.connect(self.search_students)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.search_input.returnPressed.connect(self.search_students)
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(search_button)
         main_layout.addLayout(search_layout)
         
-        # Student table
-        self.student_table = QTableWidget()
-        self.student_table.setColumnCount(7)
-        self.student_table.setHorizontalHeaderLabels(['Name','Son/Daughter Of','Roll Number','Gender',
-                                                      'Category','Contact','Actions'])
+        # Filter bar: structured filters, run in SQL (or on the roster once loaded)
+        filter_layout = QHBoxLayout()
+        self.category_filter = FilterComboBox(lambda: self.db.column_values('category'))
+        self.gender_filter = FilterComboBox(lambda: self.db.column_values('gender'))
+        self.cgpa_filter = QDoubleSpinBox()
+        self.cgpa_filter.setRange(0.0, MAX_SGPA)
+        self.cgpa_filter.setSingleStep(0.5)
+        self.cgpa_filter.setDecimals(1)
+        self.cgpa_filter.setSpecialValueText(FilterComboBox.ANY)  # shown at 0, meaning no filter
+        self.category_filter.currentIndexChanged.connect(self.search_students)
+        self.gender_filter.currentIndexChanged.connect(self.search_students)
+        self.cgpa_filter.valueChanged.connect(lambda: self.search_timer.start())
+        clear_filters_button = QPushButton('Clear Filters')
+        clear_filters_button.clicked.connect(self.clear_filters)
+        for label, widget in (('Category:', self.category_filter), ('Gender:', self.gender_filter),
+                              ('Min CGPA:', self.cgpa_filter)):
+            filter_layout.addWidget(QLabel(label))
+            filter_layout.addWidget(widget)
+        filter_layout.addStretch()
+        filter_layout.addWidget(clear_filters_button)
+        main_layout.addLayout(filter_layout)
+        
+        # Student table (rows are fetched lazily as the view scrolls)
+        self.student_model = StudentTableModel(self)
+        self.student_table = QTableView()
+        self.student_table.setModel(self.student_model)
         self.student_table.horizontalHeader().setStretchLastSection(True)
+        self.student_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        header = self.student_table.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        self.action_delegate = ActionButtonDelegate(self.student_table)
+        self.action_delegate.clicked.connect(self.on_action_clicked)
+        self.student_table.setItemDelegateForColumn(StudentTableModel.ACTIONS_COLUMN,
+                                                    self.action_delegate)
         main_layout.addWidget(self.student_table)
         
         # Action buttons
@@ -81,55 +451,445 @@ class StudentManagementApp(QMainWindow):
         add_button = QPushButton('Add Student')
         add_button.clicked.connect(self.open_add_student_dialog)
         action_layout.addWidget(add_button)
+        import_button = QPushButton('Import')
+        import_button.clicked.connect(self.import_students)
+        action_layout.addWidget(import_button)
+        export_button = QPushButton('Export')
+        export_button.clicked.connect(self.export_students)
+        action_layout.addWidget(export_button)
+        marksheets_button = QPushButton('Marksheets')
+        marksheets_button.clicked.connect(self.generate_marksheets)
+        action_layout.addWidget(marksheets_button)
+        statistics_button = QPushButton('Statistics')
+        statistics_button.clicked.connect(self.show_statistics)
+        action_layout.addWidget(statistics_button)
         main_layout.addLayout(action_layout)
         
-        # Load initial data
-        self.load_students()
+        # Restore column widths and the last search
+        header_state = self.settings.value('table/header')
+        if header_state is not None:
+            header.restoreState(header_state)
+        header.sortIndicatorChanged.connect(self.sort_students)
+        self._set_sort_key(header.sortIndicatorSection(), header.sortIndicatorOrder())
+        self.search_input.blockSignals(True)
+        self.search_input.setText(self.settings.value('search/text', '', type=str))
+        self.search_input.blockSignals(False)
+        
+        # Load initial data in the background so the window shows immediately
+        self.search_students()
     
     def load_students(self, students=None):
         """Load students into the table"""
         if students is None:
-            students = self.db.get_all_students()
-        
-        self.student_table.setRowCount(len(students))
-        for row, student in enumerate(students):
-            # Display only first 6 columns (name, parents, rollno, gender, category, contact)
-            for col in range(6):
-                item = QTableWidgetItem(str(student[col]))
-                item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-                self.student_table.setItem(row, col, item)
-            
-            # Add action buttons
-            edit_btn = QPushButton('Edit')
-            delete_btn = QPushButton('Delete')
-            view_btn = QPushButton('View')
-            
-            # Use rollno (index 2) as the unique identifier
-            rollno = student[2]
-            edit_btn.clicked.connect(lambda _, r=rollno: self.edit_student(r))
-            delete_btn.clicked.connect(lambda _, r=rollno: self.delete_student(r))
-            view_btn.clicked.connect(lambda _, s=student: self.view_student(s))
-            
-            action_widget = QWidget()
-            action_layout = QHBoxLayout(action_widget)
-            action_layout.addWidget(edit_btn)
-            action_layout.addWidget(delete_btn)
-            action_layout.addWidget(view_btn)
-            action_layout.setContentsMargins(0, 0, 0, 0)
-            
-            self.student_table.setCellWidget(row, 6, action_widget)
+            # Data may have changed, so cached search results are stale
+            self.search_cache.clear()
+            self.show_all_students()
+            return
+        
+        # The model only pulls the rows the view needs to display
+        self.student_model.set_source(students)
+    
+    def _supersede_pending(self):
+        """Make any in-flight search or page load stale, returning the new generation"""
+        self.search_generation += 1
+        for task in self.search_tasks.values():
+            task.cancel()
+        return self.search_generation
+    
+    def show_all_students(self):
+        """Show every student in rollno order, fetching the first page on the worker thread"""
+        self.start_first_page(None)
+    
+    def start_first_page(self, query):
+        """Load the first page of every student (query None) or of a StudentQuery in the background"""
+        generation = self._supersede_pending()
+        task = self.page_tasks[generation] = FirstPageTask(self.db, generation, StudentTableModel.CHUNK_SIZE,
+                                                           query)
+        task.signals.loaded.connect(self.on_first_page_loaded)
+        self.search_pool.start(task)
+    
+    def on_first_page_loaded(self, generation, rows, after):
+        """Show the first page at once; later pages stream in as the view scrolls"""
+        task = self.page_tasks.pop(generation, None)
+        if generation != self.search_generation:
+            return  # a newer search or reload has started since
+        if task.query is None:
+            rest = () if after is None else self.db.iter_students(
+                columns=StudentTableModel.COLUMNS, after_rollno=after)
+            self.view_term, self.view_filtered = None, False
+        else:
+            rest = () if after is None else self.db.iter_query(
+                task.query, StudentTableModel.COLUMNS, after=after)
+            self.view_term, self.view_filtered = task.query.term, True
+        self.view_rollnos = []
+        self.student_model.set_source(chain(rows, rest))
+        self.statusBar().clearMessage()
+    
+    def on_action_clicked(self, action, row):
+        """Dispatch a click on one of the painted row buttons"""
+        student = self.student_model.student_at(row)
+        # Use rollno (index 2) as the unique identifier
+        rollno = student[2]
+        if action == 'Edit':
+            self.edit_student(rollno)
+        elif action == 'Delete':
+            self.delete_student(rollno)
+        elif action == 'View':
+            student = self.db.get_student_by_rollno(rollno)
+            if student:
+                self.view_student(Student.from_row(student))
     
     def search_students(self):
-        """Search and filter students"""
-        search_term = self.search_input.text()
-        results = self.db.search_student(search_term)
-        self.load_students(results)
+        """Show the students matching the search box and filter bar without blocking the GUI thread"""
+        self.search_timer.stop()
+        search_term = self.search_input.text().strip()
+        query = self.view_query()
+        
+        if query.is_plain() and not search_term:
+            self.show_all_students()
+            return
+        if not query.is_plain() and self.roster is None:
+            # Filters and sorting are pushed down to SQL, paged as the view scrolls
+            self.start_first_page(query.matching(search_term))
+            if query.order is not None:
+                # Re-sorting is instant once the roster is loaded (queued after the page)
+                self.load_roster()
+            return
+        
+        # A newer search always supersedes any query still in flight
+        self._supersede_pending()
+        if not search_term:
+            self.show_roster_view(None, None)
+            return
+        if search_term in self.search_cache:
+            self.search_cache.move_to_end(search_term)
+            self.show_search_results(search_term, self.search_cache[search_term])
+            return
+        
+        task = self.search_tasks[self.search_generation] = SearchTask(self.db, self.search_generation, search_term)
+        task.signals.finished.connect(self.on_search_finished)
+        self.search_pool.start(task)
+    
+    def on_search_finished(self, generation, search_term, rollnos):
+        """Receive results from the search worker"""
+        self.search_tasks.pop(generation, None)
+        if generation != self.search_generation or rollnos is None:
+            return  # a newer search has started since, or this one failed
+        self.search_cache[search_term] = rollnos
+        if len(self.search_cache) > self.SEARCH_CACHE_SIZE:
+            self.search_cache.popitem(last=False)
+        self.show_search_results(search_term, rollnos)
+    
+    def show_search_results(self, search_term, rollnos):
+        """Display the students matching a search"""
+        if not self.view_query().is_plain():
+            self.show_roster_view(search_term, rollnos)
+            return
+        self.view_term, self.view_rollnos, self.view_filtered = search_term, list(rollnos), False
+        self.student_model.set_source(
+            self.db.iter_students_by_rollnos(rollnos, columns=StudentTableModel.COLUMNS))
+        self.statusBar().clearMessage()
+    
+    def view_query(self):
+        """StudentQuery for the filter bar and the sorted column (without the search term)"""
+        query = StudentQuery()
+        for column, combo in (('category', self.category_filter), ('gender', self.gender_filter)):
+            if combo.value() is not None:
+                query.where(column, '=', combo.value())
+        if self.cgpa_filter.value() > 0:
+            query.where('cgpa', '>=', self.cgpa_filter.value())
+        if self.sort_key is not None:
+            query.order_by(*self.sort_key)
+        return query
+    
+    def clear_filters(self):
+        """Reset the filter bar and show the unfiltered view once"""
+        for widget in (self.category_filter, self.gender_filter, self.cgpa_filter):
+            widget.blockSignals(True)
+        self.category_filter.setCurrentIndex(0)
+        self.gender_filter.setCurrentIndex(0)
+        self.cgpa_filter.setValue(0.0)
+        for widget in (self.category_filter, self.gender_filter, self.cgpa_filter):
+            widget.blockSignals(False)
+        self.search_students()
+    
+    def _set_sort_key(self, section, order):
+        """Sort by a header section (-1, or the Actions column, means rollno order)"""
+        if 0 <= section < StudentTableModel.ACTIONS_COLUMN:
+            self.sort_key = (StudentTableModel.COLUMNS[section], order == Qt.DescendingOrder)
+        else:
+            self.sort_key = None
+    
+    def sort_students(self, section, order):
+        """Re-show the current view sorted by the clicked column"""
+        if section == StudentTableModel.ACTIONS_COLUMN:
+            # Not sortable: clicking it goes back to rollno order
+            self.student_table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+            return
+        self._set_sort_key(section, order)
+        self.search_students()
+    
+    def load_roster(self):
+        """Start loading the roster snapshot in the background, unless already loading"""
+        if self.roster_task is not None:
+            return
+        self.roster_task = RosterLoadTask(self.db)
+        self.roster_task.signals.loaded.connect(self.on_roster_loaded)
+        self.search_pool.start(self.roster_task)
+        self.statusBar().showMessage('Loading students for sorting...')
+    
+    def on_roster_loaded(self, loaded):
+        """Catch the roster up with changes made while it loaded, then re-show the view from it"""
+        self.roster_task = None
+        roster, watcher = loaded
+        changes = watcher.poll()
+        watcher.close()
+        if changes is None:
+            # Too much changed meanwhile; read it again
+            self.load_roster()
+            return
+        self.roster = roster
+        self.update_roster(changes)
+        if not self.view_query().is_plain():
+            self.search_students()
+        else:
+            self.statusBar().clearMessage()
+    
+    def update_roster(self, changes):
+        """Apply journaled (seq, rollno, old_rollno) changes to the roster"""
+        touched = list(dict.fromkeys(rollno for _, new, old in changes for rollno in (new, old)
+                                     if rollno is not None))
+        if touched:
+            self.roster.apply(touched, self.db.iter_students_by_rollnos(touched))
+    
+    def show_roster_view(self, search_term, rollnos):
+        """Filter and sort every student (rollnos None) or a search's matches in memory"""
+        roster = self.roster
+        indices = None if rollnos is None else roster.find(rollnos)
+        selected = roster.select(self.view_query(), indices)
+        self.view_term, self.view_filtered = search_term, True
+        self.view_rollnos = [] if rollnos is None else list(rollnos)
+        self.student_model.set_source(roster.iter_rows(selected, StudentTableModel.COLUMNS))
+        summary = roster.summary(selected)
+        mean = summary['mean_cgpa']
+        self.statusBar().showMessage(
+            f"{summary['students']} students" +
+            ('' if mean is None else f" · mean CGPA {mean:.2f}") +
+            ''.join(f" · {label}: {count}" for label, count in summary['by_gender'].items()))
+    
+    def refresh_view(self):
+        """Re-run the current view (all students or the current search) from scratch"""
+        self.search_cache.clear()
+        self.search_students()
+    
+    def poll_changes(self):
+        """Show rows changed by this window or any other connection since the last poll"""
+        changes = self.change_watcher.poll()
+        if changes == []:
+            return
+        # Cached results of other searches may no longer be accurate
+        self.search_cache.clear()
+        if self.roster is not None:
+            if changes is None:
+                self.roster = None
+                self.load_roster()
+            else:
+                self.update_roster(changes)
+        if changes is None or self.view_filtered or self.page_tasks or self.search_generation in self.search_tasks:
+            # Too many changes to replay, a filtered or sorted view (which is re-run from
+            # SQL or the updated roster), or the view is being reloaded anyway
+            self.refresh_view()
+        else:
+            self.apply_changes(changes)
+    
+    def apply_changes(self, changes):
+        """Apply journaled (seq, rollno, old_rollno) changes to the loaded rows in place"""
+        model = self.student_model
+        touched = list(dict.fromkeys(rollno for _, new, old in changes for rollno in (new, old)
+                                     if rollno is not None))
+        current = {student[StudentTableModel.ROLLNO_COLUMN]: student for student in
+                   self.db.iter_students_by_rollnos(touched, columns=StudentTableModel.COLUMNS)}
+        visible = set(current) if self.view_term is None else self.db.match_rollnos(self.view_term, list(current))
+        # Looked up once per batch: a bulk edit elsewhere can change a thousand rows at once
+        shown = set(self.view_rollnos)
+        
+        removed, added = [], []
+        for rollno in touched:
+            row = model.row_of(rollno)
+            if rollno not in visible:
+                # Deleted, renamed away or no longer matching the search
+                if row is not None:
+                    removed.append(row)
+            elif row is not None:
+                model.replace_row(row, current[rollno])
+            elif self.view_term is None or rollno not in shown:
+                added.append(rollno)
+        # Bottom up, so the rows still to remove keep their positions
+        for row in sorted(removed, reverse=True):
+            model.remove_row(row)
+        
+        if self.view_term is None:
+            # Every-student view is ordered by rollno; rows past the loaded ones come with the tail
+            loaded = model.loaded_rollnos()
+            for inserted, rollno in enumerate(sorted(added)):
+                position = bisect_left(loaded, rollno) + inserted
+                if position >= model.rowCount() and not model.exhausted():
+                    break
+                model.insert_row(position, current[rollno])
+        else:
+            gone = shown - visible
+            if gone:
+                self.view_rollnos = [rollno for rollno in self.view_rollnos if rollno not in gone]
+            # New search matches are shown first
+            for rollno in added:
+                model.insert_row(0, current[rollno])
+            self.view_rollnos[:0] = reversed(added)
+        
+        if not model.exhausted():
+            # Re-read the rows not fetched yet so they reflect the changes too
+            loaded = model.loaded_rollnos()
+            if self.view_term is None:
+                model.set_tail(self.db.iter_students(columns=StudentTableModel.COLUMNS,
+                                                     after_rollno=loaded[-1] if loaded else None))
+            else:
+                loaded = set(loaded)
+                model.set_tail(self.db.iter_students_by_rollnos(
+                    [rollno for rollno in self.view_rollnos if rollno not in loaded],
+                    columns=StudentTableModel.COLUMNS))
     
     def open_add_student_dialog(self):
         """Open dialog to add new student"""
         dialog = StudentDialog(self)
         dialog.exec_()
-        self.load_students()  # Refresh table
+        self.poll_changes()  # Show the new student
+    
+    def _progress_dialog(self, title):
+        """Create a busy progress dialog and a callback that updates it"""
+        progress = QProgressDialog(title, None, 0, 0, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        
+        def report(processed):
+            progress.setLabelText(f'{title} ({processed} rows)')
+            QApplication.processEvents()
+        return progress, report
+    
+    def import_students(self):
+        """Bulk import students from a CSV or XLSX file"""
+        path, _ = QFileDialog.getOpenFileName(self, 'Import Students', '',
+                                              'Student Files (*.csv *.xlsx)')
+        if not path:
+            return
+        progress, report = self._progress_dialog('Importing students...')
+        imported, errors = self.db.import_students(path, report)
+        progress.close()
+        self.poll_changes()
+        
+        message = f'Imported {imported} students.'
+        if errors:
+            details = '\n'.join(f'Line {line}: {error}' for line, error in errors[:20])
+            message += f'\n\n{len(errors)} rows were skipped:\n{details}'
+            if len(errors) > 20:
+                message += '\n...'
+        QMessageBox.information(self, 'Import Complete', message)
+    
+    def export_students(self):
+        """Export all students to a CSV or XLSX file"""
+        path, _ = QFileDialog.getSaveFileName(self, 'Export Students', 'students.csv',
+                                              'CSV Files (*.csv);;Excel Files (*.xlsx)')
+        if not path:
+            return
+        progress, report = self._progress_dialog('Exporting students...')
+        exported = self.db.export_students(path, report)
+        progress.close()
+        if exported is None:
+            QMessageBox.warning(self, 'Error', 'Failed to export students.')
+        else:
+            QMessageBox.information(self, 'Export Complete', f'Exported {exported} students.')
+    
+    def generate_marksheets(self):
+        """Render marksheets of the students in the current view, as one document or a file each"""
+        choice = QMessageBox(QMessageBox.Question, 'Marksheets',
+                             'Generate marksheets for the students shown as one document or one file per student?',
+                             QMessageBox.Cancel, self)
+        combined_button = choice.addButton('One Document', QMessageBox.AcceptRole)
+        separate_button = choice.addButton('One File per Student', QMessageBox.AcceptRole)
+        choice.exec_()
+        if choice.clickedButton() is combined_button:
+            path, _ = QFileDialog.getSaveFileName(self, 'Save Marksheets', 'marksheets.pdf',
+                                                  'PDF Files (*.pdf);;HTML Files (*.html)')
+            fmt = 'html' if path.lower().endswith(('.html', '.htm')) else 'pdf'
+        elif choice.clickedButton() is separate_button:
+            path = QFileDialog.getExistingDirectory(self, 'Marksheet Folder')
+            fmt, chosen = QInputDialog.getItem(self, 'Marksheets', 'Format:', ['PDF', 'HTML'], 0, False)
+            if not chosen:
+                return
+            fmt = fmt.lower()
+        else:
+            return
+        if not path:
+            return
+        
+        query = self.view_query().matching(self.search_input.text())
+        total = self.db.count_students() if query.is_plain() and query.term is None else 0
+        progress = QProgressDialog('Generating marksheets...', 'Cancel', 0, total, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        
+        def report(rendered):
+            progress.setLabelText(f'Generating marksheets... ({rendered} done)')
+            if total:
+                progress.setValue(min(rendered, total))
+            QApplication.processEvents()
+        # Only needed here; keeps the process pool machinery out of startup
+        from marksheets import generate_marksheets
+        rendered, errors = generate_marksheets(self.db, path, fmt, combined=choice.clickedButton() is combined_button,
+                                               query=query, progress=report, cancelled=progress.wasCanceled)
+        cancelled = progress.wasCanceled()
+        progress.close()
+        if rendered is None:
+            QMessageBox.warning(self, 'Error', 'Failed to write marksheets.')
+            return
+        
+        message = f'Generated {rendered} marksheets.'
+        if cancelled:
+            message = f'Cancelled after {rendered} marksheets.'
+        if errors:
+            details = '\n'.join(f'{rollno}: {error}' for rollno, error in errors[:20])
+            message += f'\n\n{len(errors)} could not be written:\n{details}'
+        QMessageBox.information(self, 'Marksheets', message)
+    
+    def closeEvent(self, event):
+        """Save the view state, stop background work and close the database"""
+        self.settings.setValue('window/geometry', self.saveGeometry())
+        self.settings.setValue('table/header', self.student_table.horizontalHeader().saveState())
+        self.settings.setValue('search/text', self.search_input.text())
+        self._supersede_pending()
+        self.change_timer.stop()
+        self.search_pool.waitForDone()
+        self.photo_pool.waitForDone()
+        self.change_watcher.close()
+        self.db.close()
+        super().closeEvent(event)
+    
+    def show_statistics(self):
+        """Compute grade analytics in the background, then show them in the Statistics view"""
+        if self.statistics_task is not None:
+            return
+        self.statistics_task = StatisticsTask(self.db)
+        self.statistics_task.signals.finished.connect(self.on_statistics_ready)
+        self.search_pool.start(self.statistics_task)
+        self.statusBar().showMessage('Computing statistics...')
+    
+    def on_statistics_ready(self, result):
+        self.statistics_task = None
+        self.statusBar().clearMessage()
+        if result is None:
+            QMessageBox.warning(self, "Error", "Failed to read the grades.")
+            return
+        stats, top_students = result
+        dialog = StatisticsDialog(self, stats, top_students)
+        dialog.exec_()
     
     def edit_student(self, rollno):
         """Open dialog to edit existing student"""
@@ -137,7 +897,7 @@ class StudentManagementApp(QMainWindow):
         if student:
             dialog = StudentDialog(self, rollno)
             dialog.exec_()
-            self.load_students()
+            self.poll_changes()
         else:
             QMessageBox.warning(self, "Error", f"Student with Roll No {rollno} not found.")
     
@@ -148,8 +908,8 @@ class StudentManagementApp(QMainWindow):
                                      QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
             if self.db.delete_student(rollno):
+                self.poll_changes()
                 QMessageBox.information(self, "Success", "Student deleted successfully.")
-                self.load_students()
             else:
                 QMessageBox.warning(self, "Error", "Failed to delete student.")
     
@@ -161,27 +921,99 @@ class StudentManagementApp(QMainWindow):
         
         # Display student photo
         photo_label = QLabel()
-        photo_path = student_data[14]  # photo_path is at index 14
-        if photo_path and os.path.exists(photo_path):
-            try:
-                pixmap = QPixmap(photo_path)
-                photo_label.setPixmap(pixmap.scaled(200, 200, Qt.KeepAspectRatio))
-            except Exception as e:
-                print(f"Error loading photo: {e}")
-                photo_label.setText("Error loading photo")
+        photo_path = student_data.photo_path
+        # The photo store finds the file (downloading it from a server) or reports it missing
+        if photo_path:
+            self.load_photo(photo_label, photo_path, 200)
         else:
             photo_label.setText("No Photo Available")
         
         # Add details to layout
-        details = ['Name','Son/Daughter Of','Roll Number','Gender','Category','Contact','1st Sem SGPA',
-                   '2nd Sem SGPA','3rd Sem SGPA','4th Sem SGPA','5th Sem SGPA','6th Sem SGPA','7th Sem SGPA','8th Sem SGPA']
-        for i, detail in enumerate(details):
-            layout.addRow(f'{detail}:', QLabel(str(student_data[i])))
+        for i, detail in enumerate(DETAIL_LABELS):
+            value = student_data[i]
+            text = format_sgpa(value) if i >= 6 else str(value)
+            layout.addRow(f'{detail}:', QLabel(text))
         
         layout.addRow('Photo:', photo_label)
         dialog.setLayout(layout)
         dialog.exec_()
 
+    def load_photo(self, label, photo_path, size):
+        """Show a photo in a label, decoding it in the background unless cached"""
+        key = f'{photo_path}@{size}'
+        pixmap = QPixmapCache.find(key)
+        if pixmap is not None and not pixmap.isNull():
+            label.setPixmap(pixmap)
+            return
+        
+        label.setText("Loading photo...")
+        task = PhotoLoadTask(self.db.photo_store, photo_path, size, key)
+        task.signals.loaded.connect(lambda key, image, found: self.on_photo_loaded(task, label, key, image, found))
+        self.photo_tasks.add(task)
+        self.photo_pool.start(task)
+    
+    def on_photo_loaded(self, task, label, key, image, found):
+        """Receive a decoded photo from the worker pool"""
+        self.photo_tasks.discard(task)
+        try:
+            if not found:
+                label.setText("No Photo Available")
+                return
+            if image.isNull():
+                label.setText("Error loading photo")
+                return
+            pixmap = QPixmap.fromImage(image)
+            QPixmapCache.insert(key, pixmap)
+            label.setPixmap(pixmap)
+        except RuntimeError:
+            pass  # the dialog was closed before the photo arrived
+
+class StatisticsDialog(QDialog):
+    """Shows CGPA rankings and per-category/per-gender grade statistics"""
+    def __init__(self, parent, stats, top_students):
+        super().__init__(parent)
+        self.setWindowTitle('Statistics')
+        self.resize(900, 600)
+        self.stats = stats
+        layout = QVBoxLayout()
+        
+        overall = stats['overall']
+        layout.addWidget(QLabel(f"Students: {overall['students']}    Graded: {overall['graded']}    "
+                                f"Mean CGPA: {self._format(overall['mean'])}    "
+                                f"Std Dev: {self._format(overall['std'])}"))
+        layout.addWidget(QLabel('By Category'))
+        layout.addWidget(self._group_table(stats['by_category']))
+        layout.addWidget(QLabel('By Gender'))
+        layout.addWidget(self._group_table(stats['by_gender']))
+        layout.addWidget(QLabel('Top Students'))
+        layout.addWidget(self._table(['Rank', 'Roll Number', 'CGPA', 'Percentile'],
+                                     [(rank, rollno, self._format(cgpa), f'{percentile:.2f}')
+                                      for rank, rollno, cgpa, percentile in top_students]))
+        self.setLayout(layout)
+    
+    @staticmethod
+    def _format(value):
+        return '-' if value != value else f'{value:.2f}'  # NaN when nobody is graded
+    
+    def _group_table(self, groups):
+        headers = ['Group', 'Students', 'Graded', 'Mean CGPA', 'Std Dev']
+        buckets = len(self.stats['overall']['distribution'])
+        headers += [f'{i}-{i + 1}' for i in range(buckets)]
+        rows = [(label or '(blank)', group['students'], group['graded'],
+                 self._format(group['mean']), self._format(group['std']), *group['distribution'])
+                for label, group in sorted(groups.items())]
+        return self._table(headers, rows)
+    
+    @staticmethod
+    def _table(headers, rows):
+        table = QTableWidget(len(rows), len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for row, values in enumerate(rows):
+            for col, value in enumerate(values):
+                table.setItem(row, col, QTableWidgetItem(str(value)))
+        return table
+
 class StudentDialog(QDialog):
     def __init__(self, parent=None, rollno=None):
         super().__init__(parent)
@@ -250,21 +1082,10 @@ class StudentDialog(QDialog):
         file_name, _ = QFileDialog.getOpenFileName(self, 'Select Photo', 
                                                    '', 'Image Files (*.png *.jpg *.jpeg)')
         if file_name:
-            # Create directory if it doesn't exist
-            os.makedirs('student_photos', exist_ok=True)
-            
-            # Save photo to project directory
-            filename = os.path.basename(file_name)
-            dest_path = os.path.join('student_photos', f'{filename}')
-            
-            # Resize and save image
+            # Store by content hash so identical uploads share one file
             try:
-                img = Image.open(file_name)
-                img.thumbnail((300, 300))
-                img.save(dest_path)
-                
-                self.selected_photo_path = dest_path
-                self.photo_label.setText(filename)
+                self.selected_photo_path = self.parent.db.photo_store.import_photo(file_name)
+                self.photo_label.setText(os.path.basename(file_name))
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Failed to process image: {e}")
     
@@ -278,28 +1099,23 @@ class StudentDialog(QDialog):
             self.gender_input.setText(student[3])
             self.category_input.setText(student[4])
             self.contact_input.setText(student[5])
-            self.Sem1_input.setText(student[6])
-            self.Sem2_input.setText(student[7])
-            self.Sem3_input.setText(student[8])
-            self.Sem4_input.setText(student[9])
-            self.Sem5_input.setText(student[10])
-            self.Sem6_input.setText(student[11])
-            self.Sem7_input.setText(student[12])
-            self.Sem8_input.setText(student[13])
+            self.Sem1_input.setText(format_sgpa(student[6]))
+            self.Sem2_input.setText(format_sgpa(student[7]))
+            self.Sem3_input.setText(format_sgpa(student[8]))
+            self.Sem4_input.setText(format_sgpa(student[9]))
+            self.Sem5_input.setText(format_sgpa(student[10]))
+            self.Sem6_input.setText(format_sgpa(student[11]))
+            self.Sem7_input.setText(format_sgpa(student[12]))
+            self.Sem8_input.setText(format_sgpa(student[13]))
             self.selected_photo_path = student[14]
             
             # Display photo filename if available
             if self.selected_photo_path:
                 self.photo_label.setText(os.path.basename(self.selected_photo_path))
     
-    def save_student(self):
-        """Save student data to database"""
-        # Validate inputs
-        if not self.validate_inputs():
-            return
-
-        # Collect input data
-        student_data = (
+    def collect_student_data(self):
+        """Collect the form fields into a student tuple"""
+        return (
             self.name_input.text(),
             self.parents_input.text(),
             self.rollno_input.text(),
@@ -316,6 +1132,15 @@ class StudentDialog(QDialog):
             self.Sem8_input.text(),
             self.selected_photo_path or ''
         )
+    
+    def save_student(self):
+        """Save student data to database"""
+        # Collect input data
+        student_data = self.collect_student_data()
+        
+        # Validate inputs
+        if not self.validate_inputs(student_data):
+            return
         
         # Save or update student
         if self.rollno:
@@ -333,18 +1158,12 @@ class StudentDialog(QDialog):
         else:
             QMessageBox.warning(self, 'Error', message)
     
-    def validate_inputs(self):
+    def validate_inputs(self, student_data):
         """Validate user inputs before saving"""
-        # Check required fields
-        required_fields = [
-            (self.name_input, 'Name'),
-            (self.rollno_input, 'Roll Number'),
-            (self.gender_input, 'Gender')
-        ]
-        
-        for field, name in required_fields:
-            if not field.text().strip():
-                QMessageBox.warning(self, 'Validation Error', f'{name} cannot be empty')
-                return False
-        
-        return True
\ No newline at end of file
+        # Same rules the bulk importer applies
+        error = StudentDatabase.validate_student(student_data)
+        if error:
+            QMessageBox.warning(self, 'Validation Error', error)
+            return False
+        
+        return True
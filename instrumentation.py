@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import inspect
+import functools
+import threading
+from queue import Queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, float('inf'))
+# Operations slower than this are written to the slow-query log
+SLOW_OPERATION_SECONDS = 0.1
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+slow_log = logging.getLogger('student_db.slow')
+_log_listener = None
+
+def configure_logging(log_file='logs/database.log', slow_log_file='logs/slow_queries.log'):
+    """Send log records through a queue to a background writer thread.
+
+    Callers only enqueue records; file I/O happens on the listener thread.
+    Slow operations also go to their own file. Safe to call more than once.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    for path in (log_file, slow_log_file):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(formatter)
+    file_handler.addFilter(lambda record: record.name != slow_log.name)
+    slow_handler = logging.FileHandler(slow_log_file)
+    slow_handler.setFormatter(formatter)
+    slow_handler.addFilter(logging.Filter(slow_log.name))
+
+    log_queue = Queue(-1)
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    _log_listener = QueueListener(log_queue, file_handler, slow_handler)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+class QueryTracer:
+    """sqlite3 trace callback that records the SQL run during each instrumented call"""
+    MAX_STATEMENTS = 20
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def __call__(self, statement):
+        # Statements run by triggers and FTS5 internals are reported as "-- ..." comments
+        if statement.startswith('--'):
+            return
+        # Runs on the thread executing the statement, so the stack is that thread's
+        for statements in getattr(self._local, 'stack', ()):
+            if len(statements) < self.MAX_STATEMENTS and (not statements or statements[-1] != statement):
+                statements.append(statement)
+
+    def begin(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        self._local.stack.append([])
+
+    def end(self):
+        return self._local.stack.pop()
+
+class Metrics:
+    """Thread-safe per-operation latency histograms, row counts and slow-operation log"""
+    def __init__(self, slow_threshold=SLOW_OPERATION_SECONDS):
+        self.slow_threshold = slow_threshold
+        self.tracer = QueryTracer()
+        self._lock = threading.Lock()
+        self._operations = {}
+        self._gauges = {}
+
+    def register_gauge(self, name, read):
+        """Report the value returned by read() with every snapshot"""
+        self._gauges[name] = read
+
+    def observe(self, operation, seconds, rows, statements=()):
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = {
+                    'count': 0, 'seconds': 0.0, 'rows': 0, 'slow': 0,
+                    'buckets': [0] * len(LATENCY_BUCKETS),
+                }
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['rows'] += rows
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats['buckets'][i] += 1
+                    break
+            slow = seconds >= self.slow_threshold
+            if slow:
+                stats['slow'] += 1
+        if slow:
+            slow_log.warning(f"{operation} took {seconds * 1000:.1f} ms ({rows} rows): "
+                             + ' | '.join(' '.join(statement.split()) for statement in statements))
+
+    def snapshot(self):
+        """Return a JSON-serializable copy of all metrics"""
+        with self._lock:
+            operations = {name: dict(stats, buckets=list(stats['buckets']))
+                          for name, stats in self._operations.items()}
+        gauges = {name: read() for name, read in self._gauges.items()}
+        return {'timestamp': time.time(), 'bucket_bounds': [str(bound) for bound in LATENCY_BUCKETS],
+                'operations': operations, 'gauges': gauges}
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = ['# HELP student_db_operation_seconds Latency of StudentDatabase operations',
+                 '# TYPE student_db_operation_seconds histogram']
+        for name, stats in sorted(snapshot['operations'].items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'student_db_operation_seconds_bucket{{operation="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'student_db_operation_seconds_sum{{operation="{name}"}} {stats["seconds"]}')
+            lines.append(f'student_db_operation_seconds_count{{operation="{name}"}} {stats["count"]}')
+        for metric, key, help_text in (('rows', 'rows', 'Rows returned or written'),
+                                       ('slow', 'slow', 'Operations slower than the slow-query threshold')):
+            lines.append(f'# HELP student_db_operation_{metric}_total {help_text}')
+            lines.append(f'# TYPE student_db_operation_{metric}_total counter')
+            for name, stats in sorted(snapshot['operations'].items()):
+                lines.append(f'student_db_operation_{metric}_total{{operation="{name}"}} {stats[key]}')
+        for name, value in sorted(snapshot['gauges'].items()):
+            lines.append(f'# TYPE student_db_{name} gauge')
+            lines.append(f'student_db_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+class MetricsDumper:
+    """Periodically writes a metrics snapshot to a .prom (Prometheus text) or .json file"""
+    def __init__(self, metrics, path, interval=60.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-dumper', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        """Write the current snapshot, replacing the file atomically"""
+        if self.path.endswith('.json'):
+            content = json.dumps(self.metrics.snapshot(), indent=2)
+        else:
+            content = self.metrics.to_prometheus()
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                f.write(content)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logging.error(f"Error writing metrics to {self.path}: {e}")
+
+    def stop(self):
+        """Stop the background thread and write a final snapshot"""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.dump()
+
+def count_rows(result, *args, **kwargs):
+    """Default row count: list length, 0 for a failed (None/False) result, else 1"""
+    if result is None or result is False:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+def instrumented(rows=count_rows):
+    """Record latency, row count and traced SQL of a StudentDatabase method in self.metrics.
+
+    rows(result, *args, **kwargs) returns the row count of one call. Generator
+    methods are timed only while producing items, counting one row per item.
+    """
+    def decorate(method):
+        operation = method.__name__
+
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def generator_wrapper(self, *args, **kwargs):
+                items = method(self, *args, **kwargs)
+                elapsed, produced = 0.0, 0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        produced += 1
+                        yield item
+                finally:
+                    items.close()
+                    self.metrics.observe(operation, elapsed, produced)
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            self.metrics.tracer.begin()
+            start = time.perf_counter()
+            result = None
+            try:
+                result = method(self, *args, **kwargs)
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                statements = self.metrics.tracer.end()
+                row_count = 0 if result is None else rows(result, *args, **kwargs)
+                self.metrics.observe(operation, elapsed, row_count, statements)
+        return wrapper
+    return decorate
+
+def import_profile(module, limit=15):
+    """Import module in a fresh interpreter with -X importtime and return its slowest imports.
+
+    Returns (cumulative microseconds, module name) pairs, slowest first, and
+    raises ImportError if the module can't be imported.
+    """
+    import subprocess
+    # Run from the app directory so its modules are found whatever the caller's cwd
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        error = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        raise ImportError(f"importing {module} failed: {error[-1] if error else result.returncode}")
+    timings = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split('|')
+        if not line.startswith('import time:') or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        timings.append((int(parts[1]), parts[2].strip()))
+    return sorted(timings, reverse=True)[:limit]
@@ -1,32 +1,186 @@
-import sys
+import time
+STARTED = time.perf_counter()
 import os
-from PyQt5.QtWidgets import QApplication
-from gui import StudentManagementApp
+import sys
+import argparse
+
+STARTUP_PROFILE = 'logs/startup_profile.txt'
+
+def report_startup(phases):
+    """Print and save how long each startup phase took, plus the slowest imports of the GUI"""
+    from instrumentation import import_profile
+    lines = ['Startup profile (ms since interpreter start of main.py)']
+    lines += [f'  {name:<24} {(at - STARTED) * 1000:8.1f}' for name, at in phases]
+    lines.append('Slowest imports of gui (cumulative ms, fresh interpreter)')
+    try:
+        lines += [f'  {module:<40} {micros / 1000:8.1f}' for micros, module in import_profile('gui')]
+    except ImportError as e:
+        lines.append(f'  unavailable: {e}')
+    report = '\n'.join(lines) + '\n'
+    print(report, end='')
+    with open(STARTUP_PROFILE, 'w') as f:
+        f.write(report)
+
+def serve(host, port, backup_dir):
+    """Serve students.db over HTTP until interrupted"""
+    from database import StudentDatabase
+    from instrumentation import MetricsDumper
+    from server import StudentServer, TOKEN_ENV, is_loopback
+    from backup import BackupManager, BackupScheduler
+    token = os.environ.get(TOKEN_ENV)
+    if not token and not is_loopback(host):
+        sys.exit(f'Serving on {host} exposes every student to the network: set {TOKEN_ENV} to a shared '
+                 f'secret first, and on each desktop too')
+    db = StudentDatabase()
+    metrics_dumper = MetricsDumper(db.metrics, 'logs/metrics.prom')
+    metrics_dumper.start()
+    backup_scheduler = BackupScheduler(BackupManager.for_database(db, backup_dir))
+    backup_scheduler.start()
+    print(f'Serving students on http://{host}:{port} (Ctrl+C to stop)')
+    StudentServer(db, host, port, token=token).run()
+    backup_scheduler.stop()
+    metrics_dumper.stop()
+    db.close()
+
+def run_backup_command(args):
+    """Take, list or restore backups of the selected local or sharded database"""
+    from backup import BackupManager
+    if args.shards:
+        from photo_store import PHOTO_DIR
+        manager = BackupManager(args.shards, PHOTO_DIR, args.backup_dir)
+    else:
+        manager = BackupManager('students.db', backup_dir=args.backup_dir)
+    snapshots = manager.snapshots()
+    if args.list_backups:
+        print('\n'.join(snapshots) or 'No backups')
+    elif args.backup:
+        def report(copied, total):
+            print(f'\rCopied {copied}/{total} pages', end='', file=sys.stderr, flush=True)
+        name = manager.backup(report)
+        print(file=sys.stderr)
+        if name is None:
+            sys.exit('Backup failed')
+        deleted = manager.prune()
+        print(f'Created backup {name}' + (f', pruned {len(deleted)} old backups' if deleted else ''))
+    else:
+        name = snapshots[-1] if args.restore == 'latest' and snapshots else args.restore
+        if name not in snapshots:
+            sys.exit(f'No backup named {args.restore} in {args.backup_dir}')
+        set_aside = manager.restore(name)
+        if set_aside is None:
+            sys.exit('Restore failed')
+        print(f'Restored backup {name}')
+        for path in set_aside:
+            print(f'Moved {path} aside: the shard was created after the backup')
+
+def write_marksheets(args):
+    """Render every student's marksheet from the chosen database, printing progress"""
+    from marksheets import generate_marksheets
+    db = open_database(args)
+    total = db.count_students()
+    
+    def report(rendered):
+        print(f'\rRendered {rendered}/{total} marksheets', end='', file=sys.stderr, flush=True)
+    started = time.perf_counter()
+    rendered, errors = generate_marksheets(db, args.marksheets, args.format, args.combined,
+                                           workers=args.workers, progress=report)
+    print(file=sys.stderr)
+    db.close()
+    for rollno, error in errors:
+        print(f'{rollno}: {error}', file=sys.stderr)
+    if rendered is None:
+        sys.exit(1)
+    print(f'Wrote {rendered} marksheets to {args.marksheets} in {time.perf_counter() - started:.1f}s')
+
+def open_database(args):
+    """Open the database backend selected on the command line"""
+    if args.server:
+        from remote import RemoteStudentDatabase
+        return RemoteStudentDatabase(args.server)
+    if args.shards:
+        from shards import ShardedStudentDatabase
+        return ShardedStudentDatabase(args.shards)
+    from database import StudentDatabase
+    return StudentDatabase()
 
 def main():
-    # Ensure project directories exist
-    os.makedirs('student_photos', exist_ok=True)
-    os.makedirs('logs', exist_ok=True)
+    parser = argparse.ArgumentParser(description='Student Management System')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help=f'time startup until the first rows are shown, write {STARTUP_PROFILE} and exit')
+    parser.add_argument('--serve', action='store_true',
+                        help='run the headless HTTP/JSON server instead of the GUI')
+    parser.add_argument('--host', default='127.0.0.1', help='address the server listens on')
+    parser.add_argument('--port', type=int, default=8765, help='port the server listens on')
+    parser.add_argument('--server', metavar='URL',
+                        help='use a student server (e.g. http://127.0.0.1:8765) instead of students.db')
+    parser.add_argument('--shards', metavar='DIR',
+                        help='use one database per roll number prefix in DIR instead of students.db')
+    parser.add_argument('--marksheets', metavar='PATH',
+                        help='render every marksheet into the folder PATH (or the file PATH with --combined) and exit')
+    parser.add_argument('--format', choices=('pdf', 'html'), default='pdf', help='marksheet format')
+    parser.add_argument('--combined', action='store_true', help='write all marksheets to one document')
+    parser.add_argument('--workers', type=int, help='marksheet rendering processes (default: one per CPU)')
+    parser.add_argument('--backup', action='store_true', help='take a backup now, prune old ones and exit')
+    parser.add_argument('--list-backups', action='store_true', help='list the backups and exit')
+    parser.add_argument('--restore', metavar='NAME',
+                        help='restore a backup (or "latest") while the app is closed, and exit')
+    parser.add_argument('--backup-dir', default='backups', help='directory holding the backups')
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.host, args.port, args.backup_dir)
+        return
+    if args.backup or args.list_backups or args.restore:
+        run_backup_command(args)
+        return
+    if args.marksheets:
+        write_marksheets(args)
+        return
+    
+    # Heavy modules are imported here so the phases below can be timed
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtCore import QTimer
+    from gui import StudentManagementApp
+    from instrumentation import MetricsDumper
+    phases = [('imports', time.perf_counter())]
     
-    # Create logs directory with proper permissions
-    try:
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-        # Ensure the log file is writable or can be created
-        log_file = 'logs/database.log'
-        if not os.path.exists(log_file):
-            with open(log_file, 'w') as f:
-                pass  # Just create the file
-        # Make sure it's writable
-        os.chmod(log_file, 0o666)  # Read/write for everyone
-    except Exception as e:
-        print(f"Warning: Could not set up log file: {e}")
-        
     # Initialize the application
     app = QApplication(sys.argv)
-    window = StudentManagementApp()
+    phases.append(('QApplication', time.perf_counter()))
+    db = open_database(args)
+    phases.append(('database opened', time.perf_counter()))
+    
+    # Periodically export operation metrics for monitoring
+    metrics_dumper = MetricsDumper(db.metrics, 'logs/metrics.prom')
+    metrics_dumper.start()
+    
+    # Scheduled backups run in the background; a remote database is backed up by its server
+    from backup import BackupManager, BackupScheduler
+    backup_manager = BackupManager.for_database(db, args.backup_dir)
+    backup_scheduler = BackupScheduler(backup_manager) if backup_manager else None
+    if backup_scheduler:
+        backup_scheduler.start()
+    
+    window = StudentManagementApp(db)
     window.show()
-    sys.exit(app.exec_())
+    phases.append(('window shown', time.perf_counter()))
+    
+    if args.profile_startup:
+        def first_rows_shown(*_):
+            phases.append(('first rows shown', time.perf_counter()))
+            # Closing the window (rather than just quitting) waits for background loads
+            window.close()
+        window.student_model.rowsInserted.connect(first_rows_shown)
+        # An empty database never inserts rows
+        QTimer.singleShot(10000, window.close)
+    
+    exit_code = app.exec_()
+    if backup_scheduler:
+        backup_scheduler.stop()
+    metrics_dumper.stop()
+    if args.profile_startup:
+        report_startup(phases)
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,370 @@
+import os
+import re
+import html
+import zlib
+import logging
+import multiprocessing
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from urllib.request import pathname2url
+from database import DETAIL_LABELS, STUDENT_COLUMNS, SEMESTER_COLUMNS, Student, format_sgpa
+
+FORMATS = ('pdf', 'html')
+# Students rendered per worker task, and tasks kept queued per worker
+CHUNK_SIZE = 50
+CHUNKS_PER_WORKER = 2
+# Display size of the photo; the matching pre-generated thumbnail is used
+PHOTO_DISPLAY_SIZE = 200
+
+# A4 in points, and the photo box in the top right corner
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 50
+PHOTO_BOX = 130
+
+PdfImage = namedtuple('PdfImage', 'key width height color_space filter data')
+PdfPage = namedtuple('PdfPage', 'content image')
+
+def marksheet_fields(student):
+    """(label, text) pairs of a marksheet: the detail fields, then the CGPA"""
+    fields = []
+    for column, label in zip(STUDENT_COLUMNS, DETAIL_LABELS):
+        value = getattr(student, column)
+        text = format_sgpa(value) if column in SEMESTER_COLUMNS else str(value or '')
+        fields.append((label, text))
+    cgpa = student.cgpa
+    fields.append(('CGPA', '' if cgpa is None else f'{cgpa:.2f}'))
+    return fields
+
+def file_name(rollno, fmt):
+    """Name of a student's own marksheet file; characters unsafe in file names become '_'"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', rollno) + '.' + fmt
+
+class PdfWriter:
+    """Writes a multi-page PDF straight to a file using the standard Helvetica fonts.
+
+    Objects are written as pages are added; only their offsets are kept, so a
+    combined document of any length is written in constant memory. Pages that
+    show the same photo share one image object.
+    """
+    CATALOG, PAGES, FONT, BOLD_FONT = 1, 2, 3, 4
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.offsets = {}
+        self.page_ids = []
+        self.image_ids = {}
+        self.next_id = self.BOLD_FONT + 1
+        for obj_id, font in ((self.FONT, b'Helvetica'), (self.BOLD_FONT, b'Helvetica-Bold')):
+            self._write_object(obj_id, b'<< /Type /Font /Subtype /Type1 /BaseFont /' + font +
+                               b' /Encoding /WinAnsiEncoding >>')
+
+    def _new_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _write_object(self, obj_id, body, stream=None):
+        self.offsets[obj_id] = self.file.tell()
+        self.file.write(b'%d 0 obj\n' % obj_id + body)
+        if stream is not None:
+            self.file.write(b'\nstream\n' + stream + b'\nendstream')
+        self.file.write(b'\nendobj\n')
+
+    def _image_id(self, image):
+        obj_id = self.image_ids.get(image.key)
+        if obj_id is None:
+            obj_id = self._new_id()
+            self._write_object(obj_id, b'<< /Type /XObject /Subtype /Image /Width %d /Height %d '
+                               b'/ColorSpace /%s /BitsPerComponent 8 /Filter /%s /Length %d >>' % (
+                                   image.width, image.height, image.color_space.encode(),
+                                   image.filter.encode(), len(image.data)), image.data)
+            self.image_ids[image.key] = obj_id
+        return obj_id
+
+    def add_page(self, page):
+        """Append a PdfPage (a content stream, and the image it draws as /Photo)"""
+        xobjects = b''
+        if page.image is not None:
+            xobjects = b' /XObject << /Photo %d 0 R >>' % self._image_id(page.image)
+        content = zlib.compress(page.content)
+        content_id = self._new_id()
+        self._write_object(content_id, b'<< /Filter /FlateDecode /Length %d >>' % len(content), content)
+        page_id = self._new_id()
+        self._write_object(page_id, b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] '
+                           b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >>%s >> /Contents %d 0 R >>' % (
+                               self.PAGES, PAGE_WIDTH, PAGE_HEIGHT, self.FONT, self.BOLD_FONT,
+                               xobjects, content_id))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        """Write the page tree and cross-reference table and close the file"""
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in self.page_ids)
+        self._write_object(self.PAGES, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(self.page_ids)))
+        self._write_object(self.CATALOG, b'<< /Type /Catalog /Pages %d 0 R >>' % self.PAGES)
+        xref = self.file.tell()
+        count = self.next_id
+        self.file.write(b'xref\n0 %d\n0000000000 65535 f \n' % count)
+        for obj_id in range(1, count):
+            self.file.write(b'%010d 00000 n \n' % self.offsets[obj_id])
+        self.file.write(b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            count, self.CATALOG, xref))
+        self.file.close()
+
+def _pdf_text(text):
+    """A PDF string literal; characters outside Windows-1252 become '?'"""
+    data = str(text).encode('cp1252', 'replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+def _load_pdf_image(path):
+    """Read a photo for embedding: JPEG files are embedded as they are, others recompressed"""
+    from PIL import Image
+    with Image.open(path) as img:
+        if img.format == 'JPEG' and img.mode in ('RGB', 'L'):
+            with open(path, 'rb') as f:
+                data = f.read()
+            color_space = 'DeviceRGB' if img.mode == 'RGB' else 'DeviceGray'
+            return PdfImage(path, img.width, img.height, color_space, 'DCTDecode', data)
+        if 'A' in img.getbands() or img.mode == 'P':
+            # Put transparent photos on a white page rather than black
+            img = img.convert('RGBA')
+            background = Image.new('RGB', img.size, 'white')
+            background.paste(img, mask=img.getchannel('A'))
+            img = background
+        else:
+            img = img.convert('RGB')
+        return PdfImage(path, img.width, img.height, 'DeviceRGB', 'FlateDecode', zlib.compress(img.tobytes()))
+
+def render_pdf_page(student, photo_path):
+    """Lay out one student's marksheet as a PdfPage"""
+    ops = []
+    def text(x, y, value, size=11, bold=False):
+        ops.append(b'BT /%s %d Tf %d %d Td %s Tj ET' % (b'F2' if bold else b'F1', size, x, y, _pdf_text(value)))
+
+    top = PAGE_HEIGHT - MARGIN
+    text(MARGIN, top - 20, 'Statement of Marks', 20, bold=True)
+    text(MARGIN, top - 40, f'Issued {date.today():%d %B %Y}', 10)
+
+    # Photo, scaled into its box keeping the aspect ratio
+    box_x, box_y = PAGE_WIDTH - MARGIN - PHOTO_BOX, top - PHOTO_BOX
+    ops.append(b'0.5 w %d %d %d %d re S' % (box_x, box_y, PHOTO_BOX, PHOTO_BOX))
+    image = None
+    if photo_path:
+        try:
+            image = _load_pdf_image(photo_path)
+        except (OSError, ValueError) as e:
+            logging.error(f"Error loading photo {photo_path} for {student.rollno}: {e}")
+    if image is not None:
+        scale = (PHOTO_BOX - 4) / max(image.width, image.height)
+        width, height = image.width * scale, image.height * scale
+        ops.append(b'q %.2f 0 0 %.2f %.2f %.2f cm /Photo Do Q' % (
+            width, height, box_x + (PHOTO_BOX - width) / 2, box_y + (PHOTO_BOX - height) / 2))
+    else:
+        text(box_x + 22, box_y + PHOTO_BOX // 2, 'No Photo Available', 9)
+
+    fields = marksheet_fields(student)
+    details, grades, (cgpa_label, cgpa) = fields[:6], fields[6:-1], fields[-1]
+    y = top - 80
+    for label, value in details:
+        text(MARGIN, y, f'{label}:', bold=True)
+        text(MARGIN + 120, y, value)
+        y -= 20
+
+    # Grade table: one ruled row per semester, then the CGPA
+    y = min(y, box_y) - 30
+    row_height, table_width = 22, 300
+    text(MARGIN + 6, y + 7, 'Semester', bold=True)
+    text(MARGIN + 206, y + 7, 'SGPA', bold=True)
+    for label, value in grades + [(cgpa_label, cgpa)]:
+        ops.append(b'%d %d m %d %d l S' % (MARGIN, y, MARGIN + table_width, y))
+        y -= row_height
+        bold = label == cgpa_label
+        text(MARGIN + 6, y + 7, label.replace(' SGPA', ''), bold=bold)
+        text(MARGIN + 206, y + 7, value or '-', bold=bold)
+    ops.append(b'%d %d m %d %d l S' % (MARGIN, y, MARGIN + table_width, y))
+    top_of_table = y + row_height * (len(grades) + 2)
+    ops.append(b'%d %d m %d %d l S' % (MARGIN + 200, top_of_table, MARGIN + 200, y))
+    ops.append(b'%d %d %d %d re S' % (MARGIN, y, table_width, top_of_table - y))
+    return PdfPage(b'\n'.join(ops), image)
+
+HTML_STYLE = '''body { font-family: Helvetica, Arial, sans-serif; }
+.marksheet { width: 170mm; margin: 0 auto 20mm; page-break-after: always; }
+.marksheet header { display: flex; justify-content: space-between; align-items: flex-start; }
+.marksheet .photo { width: 130px; height: 130px; border: 1px solid #888; display: flex;
+                    align-items: center; justify-content: center; font-size: 11px; }
+.marksheet .photo img { max-width: 126px; max-height: 126px; }
+.marksheet table { border-collapse: collapse; margin-top: 16px; }
+.marksheet th, .marksheet td { text-align: left; padding: 3px 10px; }
+.marksheet table.grades th, .marksheet table.grades td { border: 1px solid #888; min-width: 90px; }
+.marksheet .cgpa { font-weight: bold; }'''
+
+def html_document(title, body):
+    return (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>\n'
+            f'<style>\n{HTML_STYLE}\n</style></head>\n<body>\n{body}</body></html>\n')
+
+def render_html(student, photo_src):
+    """One student's marksheet as an HTML section; photo_src is the photo's URL relative to the page"""
+    fields = marksheet_fields(student)
+    details, grades, (cgpa_label, cgpa) = fields[:6], fields[6:-1], fields[-1]
+    photo = (f'<img src="{html.escape(photo_src)}" alt="Photo">' if photo_src
+             else 'No Photo Available')
+    detail_rows = ''.join(f'<tr><th>{html.escape(label)}:</th><td>{html.escape(value)}</td></tr>'
+                          for label, value in details)
+    grade_rows = ''.join(f'<tr><td>{html.escape(label.replace(" SGPA", ""))}</td><td>{value or "-"}</td></tr>'
+                         for label, value in grades)
+    return (f'<section class="marksheet">\n<header><div><h1>Statement of Marks</h1>'
+            f'<p>Issued {date.today():%d %B %Y}</p></div><div class="photo">{photo}</div></header>\n'
+            f'<table>{detail_rows}</table>\n'
+            f'<table class="grades"><tr><th>Semester</th><th>SGPA</th></tr>{grade_rows}'
+            f'<tr class="cgpa"><td>{cgpa_label}</td><td>{cgpa or "-"}</td></tr></table>\n</section>\n')
+
+def _photo_src(photo_path, page_dir):
+    """URL of a photo relative to the directory of the page that shows it"""
+    return pathname2url(os.path.relpath(os.path.abspath(photo_path), page_dir)) if photo_path else ''
+
+def render_chunk(fmt, students, output_dir, page_dir):
+    """Process pool task: render (row, photo path) pairs.
+
+    With output_dir each marksheet is written to its own file there and the
+    rendered list is empty; otherwise the rendered pages are returned in order.
+    Returns (rendered, errors) with errors as (rollno, message) pairs.
+    """
+    rendered, errors = [], []
+    for row, photo_path in students:
+        student = Student.from_row(row)
+        try:
+            if fmt == 'pdf':
+                page = render_pdf_page(student, photo_path)
+            else:
+                page = render_html(student, _photo_src(photo_path, page_dir))
+            if output_dir is None:
+                rendered.append(page)
+                continue
+            path = os.path.join(output_dir, file_name(student.rollno, fmt))
+            if fmt == 'pdf':
+                writer = PdfWriter(path)
+                writer.add_page(page)
+                writer.close()
+            else:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(html_document(f'Marksheet {student.rollno}', page))
+        except Exception as e:
+            # One bad record shouldn't cost the rest of the batch
+            errors.append((student.rollno, f"{type(e).__name__}: {e}"))
+    return rendered, errors
+
+def _chunks(db, query, chunk_size):
+    """Yield lists of (row, photo path) from the database, resolving each photo's thumbnail"""
+    rows = db.iter_students() if query is None else db.iter_query(query)
+    chunk = []
+    for row in rows:
+        photo_path = row[STUDENT_COLUMNS.index('photo_path')]
+        if photo_path:
+            photo_path = db.photo_store.best_path(photo_path, PHOTO_DISPLAY_SIZE)
+            if not os.path.exists(photo_path):
+                photo_path = ''
+        chunk.append((tuple(row), photo_path))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _discard_document(document, fmt, temp_path):
+    """Close and remove an unfinished combined document, leaving any previous output alone"""
+    if document is not None:
+        (document.file if fmt == 'pdf' else document).close()
+    if temp_path is not None:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+def generate_marksheets(db, output, fmt='pdf', combined=False, query=None, workers=None,
+                        progress=None, cancelled=None, chunk_size=CHUNK_SIZE):
+    """Render a marksheet for every student, or for those a StudentQuery selects.
+
+    Students are streamed from db in chunks that a pool of worker processes
+    renders, with only a few chunks in flight, so memory use does not grow with
+    the number of students. output is a directory receiving one file per
+    student, or with combined the single PDF/HTML document to write.
+    progress(rendered) is called after each chunk; rendering stops early once
+    cancelled() returns True. Returns (rendered, errors) with errors as
+    (rollno, message) pairs, or (None, errors) if the output can't be written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown marksheet format: {fmt}")
+    workers = workers or os.cpu_count() or 1
+    rendered, errors = 0, []
+    document, temp_path, stopped = None, None, False
+    try:
+        if combined:
+            output_dir = None
+            page_dir = os.path.dirname(os.path.abspath(output))
+            temp_path = output + '.tmp'
+            if fmt == 'pdf':
+                document = PdfWriter(temp_path)
+            else:
+                document = open(temp_path, 'w', encoding='utf-8')
+                document.write(html_document('Marksheets', '').split('</body>')[0])
+        else:
+            os.makedirs(output, exist_ok=True)
+            output_dir = page_dir = os.path.abspath(output)
+
+        # Spawned workers don't inherit the GUI's threads and open database handles
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            pending = deque()
+            chunks = _chunks(db, query, chunk_size)
+            while True:
+                if cancelled is not None and cancelled():
+                    stopped = True
+                    for _, future in pending:
+                        future.cancel()
+                    break
+                for chunk in chunks:
+                    pending.append((chunk, pool.submit(render_chunk, fmt, chunk, output_dir, page_dir)))
+                    if len(pending) >= workers * CHUNKS_PER_WORKER:
+                        break
+                if not pending:
+                    break
+                # Collect in submission order so a combined document keeps rollno order
+                chunk, future = pending.popleft()
+                try:
+                    pages, chunk_errors = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    # The task itself failed, e.g. its result couldn't be sent back
+                    pages = []
+                    chunk_errors = [(Student.from_row(row).rollno, f"{type(e).__name__}: {e}") for row, _ in chunk]
+                for page in pages:
+                    if fmt == 'pdf':
+                        document.add_page(page)
+                    else:
+                        document.write(page)
+                errors.extend(chunk_errors)
+                rendered += len(chunk) - len(chunk_errors)
+                if progress:
+                    progress(rendered)
+
+        if document is not None:
+            if fmt == 'html':
+                document.write('</body></html>\n')
+            document.close()
+            document = None
+            # A cancelled combined document is incomplete; keep what was there before
+            if stopped:
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, output)
+        logging.info(f"Rendered {rendered} {fmt} marksheets to {output}")
+        return rendered, errors
+    except OSError as e:
+        logging.error(f"Error writing marksheets to {output}: {e}")
+        _discard_document(document, fmt, temp_path)
+        return None, errors + [(None, str(e))]
+    except BrokenProcessPool as e:
+        logging.error(f"A marksheet worker process died while writing to {output}: {e}")
+        _discard_document(document, fmt, temp_path)
+        return None, errors + [(None, f"worker process died: {e}")]
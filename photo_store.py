@@ -0,0 +1,75 @@
+import os
+import hashlib
+import logging
+
+PHOTO_DIR = 'student_photos'
+# Longest side of the stored photo, matching what select_photo always saved
+PHOTO_SIZE = 300
+# Pre-generated thumbnails: small list icons and the detail view
+THUMBNAIL_SIZES = (64, 200)
+
+class PhotoStore:
+    """Content-addressed storage for student photos with pre-generated thumbnails.
+
+    Photos are stored as <sha256 of the source file><ext>, so uploading the same
+    image twice reuses one file and different images never overwrite each other.
+    """
+    def __init__(self, root=PHOTO_DIR):
+        self.root = root
+
+    @staticmethod
+    def _hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def thumbnail_path(self, photo_path, size):
+        """Path of the pre-generated thumbnail for a stored photo"""
+        return os.path.join(self.root, 'thumbs', str(size), os.path.basename(photo_path))
+
+    def import_photo(self, source_path):
+        """Store an image under its content hash and generate its thumbnails, returning the stored path"""
+        ext = os.path.splitext(source_path)[1].lower() or '.png'
+        dest_path = os.path.join(self.root, self._hash_file(source_path) + ext)
+        if os.path.exists(dest_path):
+            return dest_path  # already stored
+
+        # Pillow is only needed when a new photo is imported
+        from PIL import Image
+        with Image.open(source_path) as img:
+            img.thumbnail((PHOTO_SIZE, PHOTO_SIZE))
+            # Thumbnails first: an existing photo file implies its thumbnails exist
+            for size in THUMBNAIL_SIZES:
+                thumb_path = self.thumbnail_path(dest_path, size)
+                os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+                thumb = img.copy()
+                thumb.thumbnail((size, size))
+                thumb.save(thumb_path, format=img.format)
+            os.makedirs(self.root, exist_ok=True)
+            temp_path = dest_path + '.tmp'
+            img.save(temp_path, format=img.format)
+        os.replace(temp_path, dest_path)
+        logging.info(f"Stored photo {source_path} as {dest_path}")
+        return dest_path
+
+    def best_path(self, photo_path, size):
+        """Return the smallest stored file that covers the requested display size"""
+        for thumb_size in sorted(THUMBNAIL_SIZES):
+            if thumb_size >= size:
+                thumb_path = self.thumbnail_path(photo_path, thumb_size)
+                if os.path.exists(thumb_path):
+                    return thumb_path
+        # Photos saved before the store existed have no thumbnails
+        return photo_path
+
+    def remove(self, photo_path):
+        """Delete a stored photo and its thumbnails"""
+        for path in [photo_path] + [self.thumbnail_path(photo_path, size) for size in THUMBNAIL_SIZES]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.error(f"Error removing photo {path}: {e}")
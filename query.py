@@ -0,0 +1,153 @@
+import copy
+from database import ALL_COLUMNS, SEMESTER_COLUMNS, CGPA_SQL
+
+# Computed column that can be filtered and sorted on like a stored one
+CGPA_COLUMN = 'cgpa'
+QUERY_COLUMNS = ALL_COLUMNS + (CGPA_COLUMN,)
+NUMERIC_COLUMNS = SEMESTER_COLUMNS + (CGPA_COLUMN,)
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'in')
+# Columns the schema declares NOT NULL (rollno is the primary key)
+NOT_NULL_COLUMNS = ('name', 'rollno')
+
+def column_sql(column):
+    """SQL for a query column; CGPA uses the indexed expression"""
+    return CGPA_SQL if column == CGPA_COLUMN else column
+
+class StudentQuery:
+    """Filters, an optional search term, an ordering and a page of a student listing.
+
+    Built by chaining and compiled to parameterized SQL, for example
+        StudentQuery().where('category', '=', 'OBC').where('gender', '=', 'F') \\
+                      .where('cgpa', '>=', 8.0).order_by('name').page(100)
+    Filters are ANDed; a column compared with NULL never matches, as in SQL.
+    Rows come in rollno order unless ordered otherwise, with rollno breaking ties.
+    """
+    def __init__(self):
+        self.filters = []  # (column, operator, value)
+        self.term = None
+        self.order = None
+        self.descending = False
+        self.row_limit = None
+        self.row_offset = 0
+        self.after_key = None  # (sort value, rollno) of the last row already seen
+
+    def where(self, column, operator, value):
+        """Add a filter; operator is one of OPERATORS ('in' takes a list of values)"""
+        if column not in QUERY_COLUMNS:
+            raise ValueError(f"Unknown student column: {column}")
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown operator: {operator}")
+        if operator == 'in':
+            value = list(value)
+        self.filters.append((column, operator, value))
+        return self
+
+    def matching(self, term):
+        """Only include students matching a free-text search term"""
+        self.term = term.strip() or None if term else None
+        return self
+
+    def order_by(self, column, descending=False):
+        if column not in QUERY_COLUMNS:
+            raise ValueError(f"Unknown student column: {column}")
+        self.order = column
+        self.descending = descending
+        return self
+
+    def page(self, limit, offset=0):
+        """Return a copy of this query limited to one page of rows"""
+        query = self._copy()
+        query.row_limit = limit
+        query.row_offset = offset
+        return query
+
+    def after(self, value, rollno):
+        """Return a copy of this query continuing after the row with this sort value and rollno.
+
+        Unlike an offset this is a range condition, so deep pages are as cheap as the first.
+        """
+        query = self._copy()
+        query.after_key = (value, rollno)
+        return query
+
+    def _copy(self):
+        query = copy.copy(self)
+        query.filters = list(self.filters)
+        return query
+
+    def is_plain(self):
+        """True when the query has no filters and no explicit ordering"""
+        return not self.filters and self.order is None
+
+    def to_dict(self):
+        return {'filters': [list(f) for f in self.filters], 'term': self.term, 'order': self.order,
+                'descending': self.descending, 'limit': self.row_limit, 'offset': self.row_offset,
+                'after': None if self.after_key is None else list(self.after_key)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild (and validate) a query sent as JSON"""
+        query = cls()
+        for column, operator, value in data.get('filters', ()):
+            query.where(column, operator, value)
+        query.matching(data.get('term'))
+        if data.get('order') is not None:
+            query.order_by(data['order'], bool(data.get('descending')))
+        query.row_limit = data.get('limit')
+        query.row_offset = data.get('offset') or 0
+        if data.get('after') is not None:
+            query.after_key = tuple(data['after'])
+        return query
+
+    def compile(self, columns, search=None):
+        """Return (sql, params) selecting the sort value followed by columns.
+
+        search is the (condition, params) a database uses for self.term.
+        The leading sort value lets sorted results of several databases be merged.
+        """
+        conditions, params = [], []
+        for column, operator, value in self.filters:
+            if operator == 'in':
+                conditions.append(f"{column_sql(column)} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                conditions.append(f'{column_sql(column)} {operator} ?')
+                params.append(value)
+        if search is not None:
+            conditions.append(search[0])
+            params.extend(search[1])
+
+        order = column_sql(self.order or 'rollno')
+        direction = ' DESC' if self.descending else ''
+        if self.after_key is not None:
+            condition, after_params = self._after_condition(order)
+            conditions.append(condition)
+            params.extend(after_params)
+        sql = f"SELECT {order}, {', '.join(columns)} FROM students"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f' ORDER BY {order}{direction}'
+        if self.order not in (None, 'rollno'):
+            sql += ', rollno'
+        if self.row_limit is not None or self.row_offset:
+            sql += ' LIMIT ? OFFSET ?'
+            params.extend((-1 if self.row_limit is None else self.row_limit, self.row_offset))
+        return sql, params
+
+    def _after_condition(self, order):
+        """Keyset condition for the rows after after_key in this query's order"""
+        value, rollno = self.after_key
+        if self.order in (None, 'rollno'):
+            return ('rollno < ?' if self.descending else 'rollno > ?'), [rollno]
+        # NULL sorts first ascending and last descending; ties are in rollno order
+        if value is None:
+            if self.descending:
+                return f'({order} IS NULL AND rollno > ?)', [rollno]
+            return f'({order} IS NOT NULL OR rollno > ?)', [rollno]
+        # The leading <= or >= lets SQLite use an index range on the sort column
+        if not self.descending:
+            return f'({order} >= ? AND ({order} > ? OR rollno > ?))', [value, value, rollno]
+        condition = f'({order} <= ? AND ({order} < ? OR rollno > ?))'
+        if self.order in NOT_NULL_COLUMNS:
+            return condition, [value, value, rollno]
+        return f'({condition} OR {order} IS NULL)', [value, value, rollno]
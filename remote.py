@@ -0,0 +1,360 @@
+import os
+import json
+import logging
+import threading
+import http.client
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlencode, quote
+from database import StudentDatabase, CHANGE_BATCH_LIMIT
+from instrumentation import Metrics, configure_logging, instrumented
+
+# Photos downloaded from the server, keyed by their content-addressed name
+REMOTE_PHOTO_CACHE = os.path.join('student_photos', 'remote_cache')
+# Environment variable holding the server's shared token (sent as Authorization: Bearer <token>)
+TOKEN_ENV = 'STUDENT_SERVER_TOKEN'
+
+class RemoteError(OSError):
+    """The server answered a request with an error status"""
+    def __init__(self, status, message):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+
+class RemotePhotoStore:
+    """PhotoStore interface that uploads to and downloads from the student server"""
+    def __init__(self, client, cache_dir=REMOTE_PHOTO_CACHE):
+        self.client = client
+        self.cache_dir = cache_dir
+
+    def import_photo(self, source_path):
+        """Upload an image, returning the photo_path the server stored it under"""
+        ext = os.path.splitext(source_path)[1].lower() or '.png'
+        with open(source_path, 'rb') as f:
+            data = f.read()
+        return self.client.request('POST', '/photos', {'ext': ext}, body=data)['photo_path']
+
+    def best_path(self, photo_path, size):
+        """Download (once) the server's best file for the display size, returning a local path"""
+        name = os.path.basename(photo_path)
+        # Stored names are content hashes, so a cached file never goes stale
+        local_path = os.path.join(self.cache_dir, str(size), name)
+        if os.path.exists(local_path):
+            return local_path
+        try:
+            data = self.client.request('GET', f'/photos/{quote(name, safe="")}', {'size': size})
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            temp_path = local_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, local_path)
+            return local_path
+        except OSError as e:
+            logging.error(f"Error downloading photo {photo_path}: {e}")
+            return ''
+
+    def remove(self, photo_path):
+        """Photos are removed by the server once no student references them"""
+
+class RemoteChangeWatcher:
+    """ChangeWatcher interface that polls the server's change journal"""
+    def __init__(self, db):
+        self.db = db
+        self.last_seq = db.latest_change()
+        self.failing = False
+
+    def poll(self):
+        """Return new (seq, rollno, old_rollno) changes, or None if too many to replay"""
+        try:
+            result = self.db.request('GET', '/changes', {'since': self.last_seq, 'limit': CHANGE_BATCH_LIMIT})
+        except OSError as e:
+            # Polled twice a second, so only report the start of an outage
+            if not self.failing:
+                logging.error(f"Error polling for changes: {e}")
+            self.failing = True
+            return []
+        self.failing = False
+        self.last_seq = result['last']
+        changes = result['changes']
+        return None if changes is None else [tuple(change) for change in changes]
+
+    def close(self):
+        pass
+
+class RemoteStudentDatabase:
+    """StudentDatabase interface backed by a student server (main.py --serve).
+
+    Methods return the same values as their StudentDatabase counterparts and
+    log and return the same failure values when the server is unreachable.
+    transaction() is not available: group writes with the bulk methods.
+    token is the server's shared token, sent with every request (by
+    default from the STUDENT_SERVER_TOKEN environment variable).
+    """
+    def __init__(self, url, timeout=30, token=None):
+        configure_logging()
+        self.metrics = Metrics()
+        self.url = url
+        self.token = token or os.environ.get(TOKEN_ENV)
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        # One keep-alive HTTP connection per thread, like the local per-thread SQLite connections
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self.photo_store = RemotePhotoStore(self)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            with self._lock:
+                self._connections.append(conn)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method, path, query=None, payload=None, body=None):
+        """Send one request and return the decoded JSON (or raw bytes) response.
+
+        Raises RemoteError for error statuses and OSError when the server
+        cannot be reached.
+        """
+        if query:
+            path += '?' + urlencode(query)
+        headers = {}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                # A dropped keep-alive connection (e.g. server restart) is retried once
+                dropped = isinstance(e, (http.client.HTTPException, ConnectionError))
+                if attempt or not dropped:
+                    raise ConnectionError(f'Lost connection to {self.url}: {e}') if dropped else e
+        content_type = response.getheader('Content-Type', '')
+        result = json.loads(data) if content_type.startswith('application/json') else data
+        if response.status != 200:
+            raise RemoteError(response.status, result.get('error') if isinstance(result, dict) else result)
+        return result
+
+    def close(self):
+        """Close all HTTP connections"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    validate_student = staticmethod(StudentDatabase.validate_student)
+    # Paging and export only depend on get_students_page, so they are shared with the local database
+    iter_student_pages = StudentDatabase.iter_student_pages
+    iter_students = StudentDatabase.iter_students
+    export_students = StudentDatabase.export_students
+    query_students = StudentDatabase.query_students
+    iter_query = StudentDatabase.iter_query
+
+    @contextmanager
+    def interruptible(self, cancelled):
+        """A running request can't be aborted; callers discard superseded results"""
+        yield
+
+    @instrumented()
+    def add_student(self, student_data):
+        """Add new student to database"""
+        try:
+            return self.request('POST', '/students', payload={'student': list(student_data)})['rollno']
+        except OSError as e:
+            logging.error(f"Error adding student: {e}")
+            return None
+
+    @instrumented()
+    def update_student(self, rollno, updated_data):
+        """Update existing student record"""
+        try:
+            return self.request('PUT', f'/students/{quote(rollno, safe="")}',
+                                payload={'student': list(updated_data)})['ok']
+        except OSError as e:
+            logging.error(f"Error updating student: {e}")
+            return False
+
+    @instrumented()
+    def delete_student(self, rollno):
+        """Delete student record"""
+        try:
+            return self.request('DELETE', f'/students/{quote(rollno, safe="")}')['ok']
+        except OSError as e:
+            logging.error(f"Error deleting student: {e}")
+            return False
+
+    def _bulk(self, path, payload):
+        try:
+            result = self.request('POST', path, payload=payload)
+            return result['committed'], [tuple(failure) for failure in result['failures']]
+        except OSError as e:
+            logging.error(f"Error in bulk request {path}: {e}")
+            return False, [(None, str(e))]
+
+    @instrumented()
+    def add_students(self, students):
+        """Add many students in one atomic commit, returning (committed, failures)"""
+        return self._bulk('/students/bulk-add', {'students': [list(s) for s in students]})
+
+    @instrumented()
+    def update_students(self, updates):
+        """Apply (rollno, updated_data) pairs in one atomic commit, returning (committed, failures)"""
+        return self._bulk('/students/bulk-update',
+                          {'updates': [[rollno, list(data)] for rollno, data in updates]})
+
+    @instrumented()
+    def delete_students(self, rollnos):
+        """Delete many students in one atomic commit, returning (committed, failures)"""
+        return self._bulk('/students/bulk-delete', {'rollnos': list(rollnos)})
+
+    @instrumented(rows=lambda result, *args, **kwargs: result[0])
+    def import_students(self, path, progress=None):
+        """Upload a CSV or XLSX file for the server to import, returning (imported count, errors)"""
+        file_format = 'xlsx' if path.lower().endswith('.xlsx') else 'csv'
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            result = self.request('POST', '/students/import', {'format': file_format}, body=data)
+        except OSError as e:
+            logging.error(f"Error importing students from {path}: {e}")
+            return 0, [(0, str(e))]
+        errors = [tuple(error) for error in result['errors']]
+        if progress:
+            progress(result['imported'] + len(errors))
+        return result['imported'], errors
+
+    @instrumented()
+    def search_student(self, search_term):
+        """Search students by various attributes"""
+        if not search_term.strip():
+            return self.get_all_students()
+        try:
+            return list(self.iter_students_by_rollnos(self.search_rollnos(search_term)))
+        except OSError as e:
+            logging.error(f"Error searching students: {e}")
+            return []
+
+    @instrumented()
+    def search_rollnos(self, search_term, conn=None):
+        """Return matching roll numbers. Raises OSError if the server can't answer."""
+        return self.request('GET', '/students/search', {'q': search_term})['rollnos']
+
+    @instrumented()
+    def match_rollnos(self, search_term, rollnos):
+        """Return the set of the given roll numbers whose students match a search term"""
+        try:
+            return set(self.request('POST', '/students/match',
+                                    payload={'q': search_term, 'rollnos': list(rollnos)})['rollnos'])
+        except OSError as e:
+            logging.error(f"Error matching students against '{search_term}': {e}")
+            return set()
+
+    @instrumented(rows=lambda result, *args, **kwargs: len(result))
+    def query_sorted(self, query, columns=None, conn=None):
+        """Return (sort value, *columns) rows selected by a StudentQuery. Raises OSError."""
+        payload = {'query': query.to_dict(), 'columns': None if columns is None else list(columns)}
+        return [tuple(row) for row in self.request('POST', '/students/query', payload=payload)['rows']]
+
+    def column_values(self, column):
+        """Distinct non-empty values of a column, sorted (for filter choices)"""
+        try:
+            return self.request('GET', '/students/values', {'column': column})['values']
+        except OSError as e:
+            logging.error(f"Error reading {column} values: {e}")
+            return []
+
+    def latest_change(self, conn=None):
+        """Sequence number of the newest journaled change (0 if unknown)"""
+        try:
+            return self.request('GET', '/changes')['last']
+        except OSError as e:
+            logging.error(f"Error reading the latest change: {e}")
+            return 0
+
+    def changes_since(self, after_seq, limit=CHANGE_BATCH_LIMIT, conn=None):
+        """Return (changes, last_seq) for the journal entries after after_seq; changes is None if too many"""
+        try:
+            result = self.request('GET', '/changes', {'since': after_seq, 'limit': limit})
+        except OSError as e:
+            logging.error(f"Error reading changes: {e}")
+            return [], after_seq
+        changes = result['changes']
+        return (None if changes is None else [tuple(change) for change in changes]), result['last']
+
+    def change_watcher(self):
+        """Return a watcher that polls the server for changes"""
+        return RemoteChangeWatcher(self)
+
+    @instrumented()
+    def iter_students_by_rollnos(self, rollnos, chunk_size=500, columns=None):
+        """Yield records (projected to columns) for the given roll numbers, preserving their order"""
+        try:
+            for start in range(0, len(rollnos), chunk_size):
+                payload = {'rollnos': rollnos[start:start + chunk_size], 'columns': columns}
+                for row in self.request('POST', '/students/lookup', payload=payload)['rows']:
+                    yield tuple(row)
+        except OSError as e:
+            logging.error(f"Error retrieving students by rollno: {e}")
+
+    @instrumented()
+    def get_all_students(self):
+        """Retrieve all student records"""
+        return list(self.iter_students())
+
+    @instrumented(rows=lambda result, *args, **kwargs: len(result[0]))
+    def get_students_page(self, after_rollno=None, limit=100, columns=None):
+        """Return one page of students ordered by rollno as (rows, last_rollno)"""
+        query = {'limit': limit}
+        if after_rollno is not None:
+            query['after'] = after_rollno
+        if columns is not None:
+            query['columns'] = ','.join(columns)
+        try:
+            result = self.request('GET', '/students', query)
+        except OSError as e:
+            logging.error(f"Error retrieving students after rollno {after_rollno}: {e}")
+            return [], None
+        return [tuple(row) for row in result['rows']], result['last']
+
+    @instrumented()
+    def count_students(self):
+        """Return the number of student records"""
+        try:
+            return self.request('GET', '/students/count')['count']
+        except OSError as e:
+            logging.error(f"Error counting students: {e}")
+            return 0
+
+    def get_cgpa_groups(self):
+        """Return (category, gender, CGPAs) for every category/gender pair present"""
+        try:
+            return [tuple(group) for group in self.request('GET', '/grades')['groups']]
+        except OSError as e:
+            logging.error(f"Error reading CGPAs: {e}")
+            return []
+
+    @instrumented()
+    def get_student_by_rollno(self, rollno):
+        """Retrieve a specific student by rollno"""
+        try:
+            student = self.request('GET', f'/students/{quote(rollno, safe="")}')['student']
+        except OSError as e:
+            logging.error(f"Error retrieving student with rollno {rollno}: {e}")
+            return None
+        return None if student is None else tuple(student)
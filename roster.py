@@ -0,0 +1,233 @@
+import logging
+import operator
+import numpy as np
+from database import ALL_COLUMNS, SEMESTER_COLUMNS
+
+# Free-text columns, stored as fixed-width UTF-8 byte strings (NULL becomes '')
+TEXT_COLUMNS = ('name', 'parents', 'rollno', 'contact', 'photo_path', 'created_at')
+# Low-cardinality columns, interned as integer codes into a label list
+CODED_COLUMNS = ('gender', 'category')
+# Sortable column that is not stored: the mean of the graded semesters
+CGPA_COLUMN = 'cgpa'
+
+LOAD_PAGE_SIZE = 5000
+
+# StudentQuery operators other than 'in'
+COMPARISONS = {'=': operator.eq, '!=': operator.ne, '<': operator.lt,
+               '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+ROW_INDEX = {column: i for i, column in enumerate(ALL_COLUMNS)}
+GRADE_SLICE = slice(ROW_INDEX[SEMESTER_COLUMNS[0]], ROW_INDEX[SEMESTER_COLUMNS[-1]] + 1)
+
+def _encode(values):
+    return np.array([(value or '').encode('utf-8') for value in values], dtype=np.bytes_)
+
+def _insert_text(column, positions, values):
+    """np.insert that widens the fixed-width column instead of truncating new values"""
+    if values.itemsize > column.itemsize:
+        column = column.astype(values.dtype)
+    return np.insert(column, positions, values)
+
+class Roster:
+    """Columnar in-memory snapshot of every student, kept in rollno order.
+
+    Text lives in fixed-width byte arrays, genders and categories as integer
+    codes and grades as a float matrix (NaN when not graded), so sorting,
+    filtering and summaries run on whole arrays without touching the database.
+    Row positions ("indices") are only valid until the next apply().
+    """
+    def __init__(self):
+        self.text = {column: np.empty(0, dtype='S1') for column in TEXT_COLUMNS}
+        self.codes = {column: np.empty(0, dtype=np.int16) for column in CODED_COLUMNS}
+        self.labels = {column: [] for column in CODED_COLUMNS}
+        self._label_codes = {column: {} for column in CODED_COLUMNS}
+        self.grades = np.empty((0, len(SEMESTER_COLUMNS)))
+        self._cgpa = None
+
+    @classmethod
+    def load(cls, db, page_size=LOAD_PAGE_SIZE):
+        """Read every student from a database (or any backend with iter_student_pages)"""
+        roster = cls()
+        pages = [roster._columns(rows) for rows in db.iter_student_pages(ALL_COLUMNS, page_size)]
+        if pages:
+            roster.text = {column: np.concatenate([page[column] for page in pages]) for column in TEXT_COLUMNS}
+            roster.codes = {column: np.concatenate([page[column] for page in pages]) for column in CODED_COLUMNS}
+            roster.grades = np.concatenate([page['grades'] for page in pages])
+        logging.info(f"Loaded roster of {len(roster)} students ({roster.nbytes() / 1e6:.1f} MB)")
+        return roster
+
+    def _columns(self, rows):
+        """Convert rows (in ALL_COLUMNS order) to one array per stored column"""
+        columns = {column: _encode([row[ROW_INDEX[column]] for row in rows]) for column in TEXT_COLUMNS}
+        for column in CODED_COLUMNS:
+            codes = self._label_codes[column]
+            columns[column] = np.array([codes.setdefault(row[ROW_INDEX[column]], len(codes)) for row in rows],
+                                       dtype=np.int16)
+            self.labels[column] = list(codes)
+        # Ungraded semesters (NULL) become NaN
+        columns['grades'] = np.array([row[GRADE_SLICE] for row in rows], dtype=float).reshape(
+            len(rows), len(SEMESTER_COLUMNS))
+        return columns
+
+    def __len__(self):
+        return len(self.text['rollno'])
+
+    def nbytes(self):
+        """Memory held by the column arrays"""
+        return (sum(column.nbytes for column in self.text.values()) +
+                sum(column.nbytes for column in self.codes.values()) + self.grades.nbytes)
+
+    @property
+    def cgpa(self):
+        """Mean of the graded semesters per student, NaN before the first grade"""
+        if self._cgpa is None:
+            graded = ~np.isnan(self.grades)
+            grades = np.where(graded, self.grades, 0.0)
+            # Summed left to right like CGPA_SQL, so results match the database exactly
+            totals = np.zeros(len(grades))
+            for semester in range(grades.shape[1]):
+                totals += grades[:, semester]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self._cgpa = totals / graded.sum(axis=1)
+        return self._cgpa
+
+    def find(self, rollnos):
+        """Indices of the given roll numbers, in their order; unknown ones are skipped"""
+        stored = self.text['rollno']
+        if not len(rollnos) or not len(stored):
+            return np.empty(0, dtype=np.intp)
+        wanted = _encode(rollnos)
+        positions = np.minimum(np.searchsorted(stored, wanted), len(stored) - 1)
+        return positions[stored[positions] == wanted]
+
+    def sort_keys(self, column):
+        """Array that orders students by a column (any of ALL_COLUMNS, or 'cgpa')"""
+        if column in self.text:
+            return self.text[column]
+        if column in self.codes:
+            # Codes are in first-seen order; sort by the label instead
+            labels = self.labels[column]
+            label_rank = np.empty(len(labels), dtype=np.int32)
+            label_rank[sorted(range(len(labels)), key=lambda code: labels[code] or '')] = np.arange(len(labels))
+            return label_rank[self.codes[column]]
+        if column == CGPA_COLUMN:
+            return self.cgpa
+        if column in SEMESTER_COLUMNS:
+            return self.grades[:, SEMESTER_COLUMNS.index(column)]
+        raise KeyError(column)
+
+    def sort_order(self, column, descending=False, indices=None):
+        """Return indices (all students, or the given ones) sorted by a column.
+
+        Ties keep the order of indices (rollno order by default). As in SQL,
+        ungraded students and empty text sort first ascending and last descending.
+        """
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=np.intp)
+        keys = self.sort_keys(column)[indices]
+        if keys.dtype.kind == 'f':
+            keys = np.where(np.isnan(keys), -np.inf, keys)
+        if descending:
+            if keys.dtype.kind in 'fi':
+                order = np.argsort(-keys, kind='stable')
+            else:
+                # Byte strings can't be negated: reverse an ascending sort of the reversed indices
+                order = len(keys) - 1 - np.argsort(keys[::-1], kind='stable')[::-1]
+        else:
+            order = np.argsort(keys, kind='stable')
+        return indices[order]
+
+    def select(self, query, indices=None):
+        """Evaluate a StudentQuery's filters, order and page in memory, returning indices.
+
+        The query's search term is not evaluated; pass the indices of its matches
+        instead. Results are those of the SQL the query compiles to, except that
+        NULL text compares as ''.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, operator_name, value in query.filters:
+            mask &= self._matches(column, operator_name, value)
+        if indices is None:
+            indices = np.flatnonzero(mask)
+        else:
+            indices = np.asarray(indices, dtype=np.intp)
+            indices = np.sort(indices[mask[indices]])
+        ordered = self.sort_order(query.order or 'rollno', query.descending, indices)
+        end = None if query.row_limit is None else query.row_offset + query.row_limit
+        return ordered[query.row_offset:end]
+
+    def _matches(self, column, operator_name, value):
+        """Boolean mask of the students for which 'column operator value' holds"""
+        if column in self.codes:
+            # Evaluate once per label, then look the answer up by code
+            if operator_name == 'in':
+                label_matches = [label in value for label in self.labels[column]]
+            else:
+                compare = COMPARISONS[operator_name]
+                label_matches = [label is not None and compare(label, value) for label in self.labels[column]]
+            return np.array(label_matches, dtype=bool)[self.codes[column]]
+        if column in self.text:
+            values = self.text[column]
+            if operator_name == 'in':
+                return np.isin(values, _encode(str(item) for item in value))
+            return COMPARISONS[operator_name](values, str(value).encode('utf-8'))
+        values = self.sort_keys(column)
+        if operator_name == 'in':
+            return np.isin(values, np.array(value, dtype=float))
+        with np.errstate(invalid='ignore'):
+            matches = COMPARISONS[operator_name](values, float(value))
+        # Like SQL, NULL (NaN) is never != anything either
+        return matches & ~np.isnan(values) if operator_name == '!=' else matches
+
+    def summary(self, indices=None):
+        """Student count, CGPA mean and per-gender/per-category counts of the given students"""
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=np.intp)
+        cgpa = self.cgpa[indices]
+        graded = cgpa[~np.isnan(cgpa)]
+        summary = {
+            'students': len(indices),
+            'graded': len(graded),
+            'mean_cgpa': float(graded.mean()) if len(graded) else None,
+        }
+        for column in CODED_COLUMNS:
+            counts = np.bincount(self.codes[column][indices], minlength=len(self.labels[column]))
+            summary[f'by_{column}'] = {label: int(count) for label, count in zip(self.labels[column], counts)
+                                       if count}
+        return summary
+
+    def _value(self, column, index):
+        if column in self.text:
+            return self.text[column][index].decode('utf-8')
+        if column in self.codes:
+            return self.labels[column][self.codes[column][index]]
+        grade = self.grades[index, SEMESTER_COLUMNS.index(column)]
+        return None if np.isnan(grade) else float(grade)
+
+    def row(self, index, columns=ALL_COLUMNS):
+        """One student as a tuple of the given columns"""
+        return tuple(self._value(column, index) for column in columns)
+
+    def iter_rows(self, indices, columns=ALL_COLUMNS):
+        """Yield the given students as row tuples, decoding each only when it is reached"""
+        for index in indices:
+            yield self.row(index, columns)
+
+    def apply(self, rollnos, rows):
+        """Replace the students with the given roll numbers by rows (in ALL_COLUMNS order).
+
+        Roll numbers without a row are removed, so pass every rollno touched by a
+        change (deleted, renamed or updated) with the current rows of those that remain.
+        """
+        self._cgpa = None
+        removed = self.find(list(rollnos))
+        if len(removed):
+            self.text = {column: np.delete(values, removed) for column, values in self.text.items()}
+            self.codes = {column: np.delete(values, removed) for column, values in self.codes.items()}
+            self.grades = np.delete(self.grades, removed, axis=0)
+        rows = sorted(rows, key=lambda row: row[ROW_INDEX['rollno']].encode('utf-8'))
+        if not rows:
+            return
+        added = self._columns(rows)
+        positions = np.searchsorted(self.text['rollno'], added['rollno'])
+        self.text = {column: _insert_text(values, positions, added[column]) for column, values in self.text.items()}
+        self.codes = {column: np.insert(values, positions, added[column]) for column, values in self.codes.items()}
+        self.grades = np.insert(self.grades, positions, added['grades'], axis=0)
@@ -0,0 +1,513 @@
+import os
+import hmac
+import json
+import queue
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import threading
+import functools
+import ipaddress
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl, unquote
+from database import StudentDatabase, STUDENT_COLUMNS, CHANGE_BATCH_LIMIT
+from query import StudentQuery
+from remote import TOKEN_ENV
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Reads run concurrently, each pool thread on its own SQLite connection
+READER_THREADS = 8
+# Queued single-record writes are committed together, up to this many at once
+WRITE_BATCH_SIZE = 64
+# Largest accepted request body (bulk imports and photos), and request or header line
+MAX_BODY_BYTES = 64 * 1024 * 1024
+MAX_LINE_BYTES = 64 * 1024
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+class HTTPError(Exception):
+    """Aborts a request with the given status code"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+Request = namedtuple('Request', 'method path query headers body')
+# A non-JSON response body, such as a photo or the metrics text
+RawResponse = namedtuple('RawResponse', 'body content_type')
+WriteJob = namedtuple('WriteJob', 'function args future grouped')
+_STOP = object()
+
+def is_loopback(host):
+    """True if host only accepts connections from this machine"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+class WriteQueue:
+    """Runs every write on one thread, so writers never contend for the SQLite lock.
+
+    Grouped jobs (single-record add/update/delete) that are queued together
+    run inside one transaction, turning many small commits into one. Their
+    results are only handed back once that commit has succeeded.
+    """
+    def __init__(self, db, batch_size=WRITE_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, function, *args, grouped=True):
+        """Queue function(*args) for the writer thread, returning a concurrent Future"""
+        future = Future()
+        self._queue.put(WriteJob(function, args, future, grouped))
+        return future
+
+    def stop(self):
+        """Finish the queued writes, then stop the writer thread"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        pending = None
+        while True:
+            job = pending if pending is not None else self._queue.get()
+            pending = None
+            if job is _STOP:
+                return
+            batch = [job]
+            while job.grouped and len(batch) < self.batch_size:
+                try:
+                    pending = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is _STOP or not pending.grouped:
+                    break
+                batch.append(pending)
+                pending = None
+            self._execute(batch)
+
+    def _execute(self, batch):
+        if len(batch) == 1:
+            job = batch[0]
+            try:
+                job.future.set_result(job.function(*job.args))
+            except Exception as e:
+                job.future.set_exception(e)
+            return
+
+        outcomes = []
+        try:
+            with self.db.transaction():
+                for job in batch:
+                    try:
+                        outcomes.append((job, job.function(*job.args), None))
+                    except Exception as e:
+                        outcomes.append((job, None, e))
+        except sqlite3.Error as e:
+            logging.error(f"Error committing {len(batch)} queued writes: {e}")
+            for job in batch:
+                job.future.set_exception(e)
+            return
+        for job, result, error in outcomes:
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+
+class StudentServer:
+    """Serves a StudentDatabase over a small HTTP/JSON API.
+
+    Requests are parsed on one asyncio event loop; reads are handed to a pool
+    of reader threads and writes to the single WriteQueue thread. Connections
+    are kept alive between requests. Used by RemoteStudentDatabase.
+
+    The API has full write access, so with a token every request must carry
+    it in an Authorization: Bearer header. Listening on anything but a
+    loopback address requires one.
+    """
+    def __init__(self, db, host=DEFAULT_HOST, port=DEFAULT_PORT, readers=READER_THREADS, token=None):
+        if not token and not is_loopback(host):
+            raise ValueError(f'Serving on {host} requires a token (set {TOKEN_ENV})')
+        self.db = db
+        self.host = host
+        self.port = port
+        self.token = token
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix='db-reader')
+        self.writer = WriteQueue(db)
+        self.routes = [
+            ('GET', '/students', self.get_page),
+            ('POST', '/students', self.add_student),
+            ('GET', '/students/count', self.count_students),
+            ('GET', '/students/search', self.search_students),
+            ('POST', '/students/lookup', self.lookup_students),
+            ('POST', '/students/match', self.match_students),
+            ('POST', '/students/query', self.query_students),
+            ('GET', '/students/values', self.column_values),
+            ('POST', '/students/bulk-add', self.add_students),
+            ('POST', '/students/bulk-update', self.update_students),
+            ('POST', '/students/bulk-delete', self.delete_students),
+            ('POST', '/students/import', self.import_students),
+            ('GET', '/students/{}', self.get_student),
+            ('PUT', '/students/{}', self.update_student),
+            ('DELETE', '/students/{}', self.delete_student),
+            ('GET', '/grades', self.get_grades),
+            ('GET', '/changes', self.get_changes),
+            ('POST', '/photos', self.import_photo),
+            ('GET', '/photos/{}', self.get_photo),
+            ('GET', '/metrics', self.get_metrics),
+        ]
+
+    async def read(self, function, *args):
+        """Run a read on the reader pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readers, functools.partial(function, *args))
+
+    async def write(self, function, *args, grouped=True):
+        """Run a write on the writer thread"""
+        return await asyncio.wrap_future(self.writer.submit(function, *args, grouped=grouped))
+
+    async def serve_forever(self):
+        self.writer.start()
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=MAX_LINE_BYTES)
+        logging.info(f"Serving students on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.writer.stop()
+            self.readers.shutdown()
+
+    def run(self):
+        """Serve until interrupted"""
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
+    # HTTP plumbing
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as e:
+                    await self.send(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                status, payload = await self.dispatch(request)
+                keep_alive = request.headers.get('connection', '').lower() != 'close'
+                await self.send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client went away
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def read_line(reader):
+        try:
+            return await reader.readline()
+        except ValueError:
+            # The stream's buffer limit was hit before the end of the line
+            raise HTTPError(413, f'Request line or header exceeds {MAX_LINE_BYTES} bytes')
+
+    async def read_request(self, reader):
+        """Parse one request from the stream, or return None at end of stream.
+
+        Requests without the token are rejected before their body is read.
+        """
+        request_line = await self.read_line(reader)
+        if not request_line.strip():
+            return None
+        try:
+            method, target, _ = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(400, 'Malformed request line')
+        headers = {}
+        while True:
+            line = await self.read_line(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if self.token and not hmac.compare_digest(headers.get('authorization', '').encode('latin-1'),
+                                                  f'Bearer {self.token}'.encode('utf-8')):
+            raise HTTPError(401, 'Missing or wrong token')
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, 'Invalid Content-Length')
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f'Request body exceeds {MAX_BODY_BYTES} bytes')
+        body = await reader.readexactly(length) if length else b''
+        url = urlsplit(target)
+        return Request(method.upper(), url.path, dict(parse_qsl(url.query)), headers, body)
+
+    async def dispatch(self, request):
+        """Route a request to its handler, returning (status, payload)"""
+        parts = [unquote(part) for part in request.path.strip('/').split('/')]
+        allowed = False
+        for method, pattern, handler in self.routes:
+            pattern_parts = pattern.strip('/').split('/')
+            if len(pattern_parts) != len(parts):
+                continue
+            args = []
+            for expected, actual in zip(pattern_parts, parts):
+                if expected == '{}':
+                    args.append(actual)
+                elif expected != actual:
+                    break
+            else:
+                if method != request.method:
+                    allowed = True
+                    continue
+                try:
+                    return 200, await handler(request, *args)
+                except HTTPError as e:
+                    return e.status, {'error': str(e)}
+                except Exception as e:
+                    logging.error(f"Error handling {request.method} {request.path}: {e}")
+                    return 500, {'error': str(e)}
+        if allowed:
+            return 405, {'error': f'{request.method} not allowed on {request.path}'}
+        return 404, {'error': f'No route for {request.path}'}
+
+    @staticmethod
+    async def send(writer, status, payload, keep_alive):
+        if isinstance(payload, RawResponse):
+            body, content_type = payload.body, payload.content_type
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    @staticmethod
+    def json_body(request):
+        try:
+            body = json.loads(request.body or b'{}')
+        except ValueError:
+            raise HTTPError(400, 'Request body is not valid JSON')
+        if not isinstance(body, dict):
+            raise HTTPError(400, 'Request body must be a JSON object')
+        return body
+
+    @staticmethod
+    def list_field(body, key, is_item, description):
+        """body[key] (default []), checked to be a list of items for which is_item holds"""
+        values = body.get(key, [])
+        if not isinstance(values, list) or not all(is_item(value) for value in values):
+            raise HTTPError(400, f'{key} must be a list of {description}')
+        return values
+
+    @staticmethod
+    def student_tuple(values):
+        """Validate a student sent as a JSON list, like the add/edit dialog does"""
+        if not isinstance(values, list) or len(values) != len(STUDENT_COLUMNS):
+            raise HTTPError(400, f'A student is a list of {len(STUDENT_COLUMNS)} values')
+        student_data = tuple(values)
+        error = StudentDatabase.validate_student(student_data)
+        if error:
+            raise HTTPError(400, error)
+        return student_data
+
+    def columns_field(self, body):
+        """body['columns']: None for every column, or a list of column names"""
+        columns = body.get('columns')
+        return None if columns is None else self.list_field(body, 'columns', self.is_text, 'column names')
+
+    @staticmethod
+    def is_student(values):
+        return isinstance(values, list) and len(values) == len(STUDENT_COLUMNS)
+
+    @staticmethod
+    def is_text(value):
+        return isinstance(value, str)
+
+    @staticmethod
+    def columns(value):
+        return tuple(value.split(',')) if value else None
+
+    # Reads
+
+    async def get_page(self, request):
+        try:
+            limit = int(request.query.get('limit', 100))
+        except ValueError:
+            raise HTTPError(400, 'limit must be an integer')
+        try:
+            rows, last_rollno = await self.read(self.db.get_students_page, request.query.get('after'),
+                                                limit, self.columns(request.query.get('columns')))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return {'rows': rows, 'last': last_rollno}
+
+    async def count_students(self, request):
+        return {'count': await self.read(self.db.count_students)}
+
+    async def search_students(self, request):
+        term = request.query.get('q', '')
+        if not term.strip():
+            raise HTTPError(400, 'Missing search term q')
+        return {'rollnos': await self.read(self.db.search_rollnos, term)}
+
+    async def lookup_students(self, request):
+        body = self.json_body(request)
+        rollnos = self.list_field(body, 'rollnos', self.is_text, 'roll numbers')
+        columns = self.columns_field(body)
+        try:
+            rows = await self.read(lambda: list(self.db.iter_students_by_rollnos(rollnos, columns=columns)))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return {'rows': rows}
+
+    async def match_students(self, request):
+        body = self.json_body(request)
+        term = body.get('q', '')
+        if not isinstance(term, str) or not term.strip():
+            raise HTTPError(400, 'Missing search term q')
+        rollnos = self.list_field(body, 'rollnos', self.is_text, 'roll numbers')
+        return {'rollnos': sorted(await self.read(self.db.match_rollnos, term, rollnos))}
+
+    async def query_students(self, request):
+        """(sort value, *columns) rows for a StudentQuery sent as {"query": ..., "columns": [...]}"""
+        body = self.json_body(request)
+        query, columns = body.get('query', {}), self.columns_field(body)
+        if not isinstance(query, dict):
+            raise HTTPError(400, 'query must be an object')
+        try:
+            query = StudentQuery.from_dict(query)
+            rows = await self.read(self.db.query_sorted, query, columns)
+        except (ValueError, TypeError) as e:
+            raise HTTPError(400, str(e))
+        return {'rows': rows}
+
+    async def column_values(self, request):
+        try:
+            return {'values': await self.read(self.db.column_values, request.query.get('column', ''))}
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    async def get_changes(self, request):
+        """Journaled changes after ?since=seq, or just the latest seq without it"""
+        if 'since' not in request.query:
+            return {'changes': [], 'last': await self.read(self.db.latest_change)}
+        try:
+            since = int(request.query['since'])
+            limit = int(request.query.get('limit', CHANGE_BATCH_LIMIT))
+        except ValueError:
+            raise HTTPError(400, 'since and limit must be integers')
+        changes, last_seq = await self.read(self.db.changes_since, since, limit)
+        return {'changes': changes, 'last': last_seq}
+
+    async def get_student(self, request, rollno):
+        return {'student': await self.read(self.db.get_student_by_rollno, rollno)}
+
+    async def get_grades(self, request):
+        return {'groups': await self.read(self.db.get_cgpa_groups)}
+
+    async def get_photo(self, request, name):
+        # Only files directly inside the photo store may be served
+        photo_path = os.path.join(self.db.photo_store.root, os.path.basename(name))
+        try:
+            size = int(request.query.get('size', 0))
+        except ValueError:
+            raise HTTPError(400, 'size must be an integer')
+        path = self.db.photo_store.best_path(photo_path, size) if size else photo_path
+
+        def read_file():
+            with open(path, 'rb') as f:
+                return f.read()
+        try:
+            data = await self.read(read_file)
+        except FileNotFoundError:
+            raise HTTPError(404, f'No photo {name}')
+        return RawResponse(data, 'application/octet-stream')
+
+    async def get_metrics(self, request):
+        return RawResponse(self.db.metrics.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+
+    # Writes
+
+    async def add_student(self, request):
+        student_data = self.student_tuple(self.json_body(request).get('student'))
+        return {'rollno': await self.write(self.db.add_student, student_data)}
+
+    async def update_student(self, request, rollno):
+        student_data = self.student_tuple(self.json_body(request).get('student'))
+        return {'ok': await self.write(self.db.update_student, rollno, student_data)}
+
+    async def delete_student(self, request, rollno):
+        return {'ok': await self.write(self.db.delete_student, rollno)}
+
+    async def add_students(self, request):
+        students = [tuple(values) for values in self.list_field(
+            self.json_body(request), 'students', self.is_student, f'students ({len(STUDENT_COLUMNS)} values each)')]
+        committed, failures = await self.write(self.db.add_students, students)
+        return {'committed': committed, 'failures': failures}
+
+    async def update_students(self, request):
+        def is_update(item):
+            return isinstance(item, list) and len(item) == 2 and self.is_text(item[0]) and self.is_student(item[1])
+        updates = [(rollno, tuple(values)) for rollno, values in self.list_field(
+            self.json_body(request), 'updates', is_update, '[rollno, student] pairs')]
+        committed, failures = await self.write(self.db.update_students, updates)
+        return {'committed': committed, 'failures': failures}
+
+    async def delete_students(self, request):
+        rollnos = self.list_field(self.json_body(request), 'rollnos', self.is_text, 'roll numbers')
+        committed, failures = await self.write(self.db.delete_students, rollnos)
+        return {'committed': committed, 'failures': failures}
+
+    async def import_students(self, request):
+        """Import an uploaded CSV or XLSX file (?format=csv|xlsx) in batched transactions"""
+        file_format = request.query.get('format', 'csv').lower()
+        if file_format not in ('csv', 'xlsx'):
+            raise HTTPError(400, 'format must be csv or xlsx')
+
+        def run_import():
+            # import_students manages its own transactions, so it never shares a group
+            fd, path = tempfile.mkstemp(suffix='.' + file_format)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(request.body)
+                return self.db.import_students(path)
+            finally:
+                os.remove(path)
+        imported, errors = await self.write(run_import, grouped=False)
+        return {'imported': imported, 'errors': errors}
+
+    async def import_photo(self, request):
+        """Store an uploaded image (?ext=.jpg) and return its photo_path"""
+        ext = os.path.basename(request.query.get('ext', '.png'))
+        if not ext.startswith('.'):
+            ext = '.' + ext
+
+        def store():
+            fd, path = tempfile.mkstemp(suffix=ext)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(request.body)
+                return self.db.photo_store.import_photo(path)
+            finally:
+                os.remove(path)
+        try:
+            return {'photo_path': await self.read(store)}
+        except (OSError, ValueError) as e:
+            raise HTTPError(400, f'Could not store photo: {e}')
@@ -0,0 +1,379 @@
+import os
+import logging
+import sqlite3
+import threading
+from itertools import chain
+from operator import itemgetter
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from database import StudentDatabase, IMPORT_BATCH_SIZE, normalize_student
+from photo_store import PhotoStore, PHOTO_DIR
+from instrumentation import Metrics, configure_logging, instrumented
+
+SHARD_DIR = 'shards'
+# Roll numbers start with department and admission year, e.g. CE2023 in CE20230000004
+SHARD_PREFIX_LENGTH = 6
+# Roll numbers without a usable prefix go to this shard
+FALLBACK_SHARD = 'OTHER'
+
+class ShardedPhotoStore(PhotoStore):
+    """One photo store shared by all shards; a photo is only removed once no shard uses it"""
+    def __init__(self, sharded, root=PHOTO_DIR):
+        super().__init__(root)
+        self.sharded = sharded
+
+    def remove(self, photo_path):
+        try:
+            if any(shard.photo_in_use(photo_path) for shard in self.sharded.shard_list()):
+                return
+        except sqlite3.Error as e:
+            logging.error(f"Error checking photo references for {photo_path}: {e}")
+            return
+        super().remove(photo_path)
+
+class ShardedChangeWatcher:
+    """ChangeWatcher over every shard, including shards created after it started"""
+    def __init__(self, sharded):
+        self.sharded = sharded
+        self.watchers = {key: shard.change_watcher() for key, shard in sharded.shards.items()}
+
+    def poll(self):
+        """Return new (seq, rollno, old_rollno) changes, or None if too many to replay"""
+        for key, shard in list(self.sharded.shards.items()):
+            if key not in self.watchers:
+                # Everything in a new shard is new to this watcher
+                watcher = self.watchers[key] = shard.change_watcher()
+                watcher.data_version, watcher.last_seq = None, 0
+        changes = []
+        for watcher in self.watchers.values():
+            shard_changes = watcher.poll()
+            if shard_changes is None:
+                changes = None
+            elif changes is not None:
+                changes.extend(shard_changes)
+        return changes
+
+    def close(self):
+        for watcher in self.watchers.values():
+            watcher.close()
+
+class ShardedStudentDatabase:
+    """StudentDatabase interface over a directory of shard databases.
+
+    Each <prefix>.db file in the directory holds the students whose roll number
+    starts with that prefix (its first SHARD_PREFIX_LENGTH characters, upper
+    case). Lookups and writes go to one shard, created on first use; searches,
+    pages and aggregates run on every shard in parallel and are merged, so they
+    take about as long as the slowest shard. Every shard has its own worker
+    thread, which keeps one warm connection to it; SQLite releases the GIL while
+    it runs a query. Bulk writes are atomic per shard only, and transaction()
+    is not available.
+    """
+    def __init__(self, directory=SHARD_DIR, prefix_length=SHARD_PREFIX_LENGTH):
+        configure_logging()
+        self.metrics = Metrics()
+        self.directory = directory
+        self.prefix_length = prefix_length
+        self.photo_store = ShardedPhotoStore(self)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.shards = {}
+        self.workers = {}  # shard -> its single worker thread
+        os.makedirs(directory, exist_ok=True)
+        keys = sorted(os.path.splitext(name)[0] for name in os.listdir(directory) if name.endswith('.db'))
+        # Opening a shard may migrate or index it, so open them in parallel too
+        opening = [self._open_shard(key) for key in keys]
+        self.shards = {key: future.result() for key, future in zip(keys, opening)}
+        self.metrics.register_gauge('shards', lambda: len(self.shards))
+
+    def _open_shard(self, key):
+        """Start the worker thread of a shard and open the shard on it, returning a Future"""
+        worker = ThreadPoolExecutor(1, thread_name_prefix=f'shard-{key}')
+        path = os.path.join(self.directory, key + '.db')
+
+        def open_shard():
+            shard = StudentDatabase(path, photo_store=self.photo_store)
+            self.workers[shard] = worker
+            return shard
+        return worker.submit(open_shard)
+
+    def shard_key(self, rollno):
+        """Return the key of the shard a roll number belongs to"""
+        prefix = str(rollno)[:self.prefix_length].upper()
+        if len(prefix) == self.prefix_length and prefix.isalnum() and prefix.isascii():
+            return prefix
+        return FALLBACK_SHARD
+
+    def shard_for(self, rollno, create=False):
+        """Return the shard holding a roll number; None if it doesn't exist and create is False"""
+        key = self.shard_key(rollno)
+        shard = self.shards.get(key)
+        if shard is None:
+            with self._lock:
+                shard = self.shards.get(key)
+                path = os.path.join(self.directory, key + '.db')
+                # Another process may have created the shard file since we started
+                if shard is None and (create or os.path.exists(path)):
+                    shard = self._open_shard(key).result()
+                    self.shards = dict(sorted({**self.shards, key: shard}.items()))
+        return shard
+
+    def shard_list(self):
+        return list(self.shards.values())
+
+    def _fan_out(self, function, shards=None):
+        """Run function(shard) on every shard's worker in parallel, returning the results in shard order"""
+        futures = [self.workers[shard].submit(function, shard)
+                   for shard in (self.shard_list() if shards is None else shards)]
+        return [future.result() for future in futures]
+
+    def _group(self, items, rollno_of, create=False):
+        """Split items by shard, as {shard: [items]}; items with no shard are grouped under None"""
+        groups = defaultdict(list)
+        for item in items:
+            groups[self.shard_for(rollno_of(item), create)].append(item)
+        return groups
+
+    def close(self):
+        """Close every shard and stop the query threads"""
+        for shard in self.shard_list():
+            shard.close()
+            self.workers[shard].shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    validate_student = staticmethod(StudentDatabase.validate_student)
+    # Paging and export only depend on get_students_page, so they are shared with the local database
+    iter_student_pages = StudentDatabase.iter_student_pages
+    iter_students = StudentDatabase.iter_students
+    export_students = StudentDatabase.export_students
+    query_students = StudentDatabase.query_students
+    iter_query = StudentDatabase.iter_query
+
+    def change_watcher(self):
+        """Return a watcher that reports changes made to any shard"""
+        return ShardedChangeWatcher(self)
+
+    @contextmanager
+    def interruptible(self, cancelled):
+        """Abort the shard queries of searches run inside the block once cancelled() returns True"""
+        self._local.cancelled = cancelled
+        try:
+            yield
+        finally:
+            self._local.cancelled = None
+
+    def _search_all(self, search_term, columns):
+        """Search every shard in parallel, merging the (rank, *columns) rows best first"""
+        cancelled = getattr(self._local, 'cancelled', None)
+
+        def search(shard):
+            if cancelled is None:
+                return shard.search_ranked(search_term, columns)
+            with shard.interruptible(cancelled):
+                return shard.search_ranked(search_term, columns)
+        # Each shard's rows are already sorted, which sorted() merges in C
+        return sorted(chain.from_iterable(self._fan_out(search)), key=itemgetter(0))
+
+    @instrumented()
+    def search_rollnos(self, search_term, conn=None):
+        """Return matching roll numbers from every shard, best match first. Raises sqlite3.Error."""
+        return [row[1] for row in self._search_all(search_term, 'students.rollno')]
+
+    @instrumented()
+    def search_student(self, search_term):
+        """Search students by various attributes"""
+        if not search_term.strip():
+            return self.get_all_students()
+        try:
+            return [row[1:] for row in self._search_all(search_term, 'students.*')]
+        except sqlite3.Error as e:
+            logging.error(f"Error searching students: {e}")
+            return []
+
+    @instrumented(rows=lambda result, *args, **kwargs: len(result))
+    def query_sorted(self, query, columns=None, conn=None):
+        """Run a StudentQuery on every shard in parallel, merging the (sort value, *columns) rows.
+
+        Each shard returns its first offset + limit rows, from which the page is cut.
+        Raises sqlite3.Error.
+        """
+        wanted = StudentDatabase._projection(columns) + ('rollno',)
+        shard_query = query.page(None if query.row_limit is None else query.row_offset + query.row_limit)
+        rows = sorted(chain.from_iterable(self._fan_out(lambda shard: shard.query_sorted(shard_query, wanted))),
+                      key=itemgetter(-1))
+        # Stable sort on top of rollno order, so ties stay in rollno order (also when reversed)
+        rows.sort(key=lambda row: (row[0] is not None, row[0]), reverse=query.descending)
+        end = None if query.row_limit is None else query.row_offset + query.row_limit
+        return [row[:-1] for row in rows[query.row_offset:end]]
+
+    def column_values(self, column):
+        """Distinct non-empty values of a column in any shard, sorted (for filter choices)"""
+        return sorted(set().union(*self._fan_out(lambda shard: shard.column_values(column))))
+
+    @instrumented()
+    def match_rollnos(self, search_term, rollnos):
+        """Return the set of the given roll numbers whose students match a search term"""
+        groups = self._group(rollnos, lambda rollno: rollno)
+        groups.pop(None, None)
+        matched = self._fan_out(lambda shard: shard.match_rollnos(search_term, groups[shard]), list(groups))
+        return set().union(*matched)
+
+    @instrumented()
+    def iter_students_by_rollnos(self, rollnos, chunk_size=500, columns=None):
+        """Yield records (projected to columns) for the given roll numbers, preserving their order"""
+        wanted = StudentDatabase._projection(columns) + ('rollno',)
+        for start in range(0, len(rollnos), chunk_size):
+            chunk = rollnos[start:start + chunk_size]
+            groups = self._group(chunk, lambda rollno: rollno)
+            groups.pop(None, None)
+            found = self._fan_out(lambda shard: list(shard.iter_students_by_rollnos(groups[shard], chunk_size, wanted)),
+                                  list(groups))
+            by_rollno = {row[-1]: row[:-1] for row in chain.from_iterable(found)}
+            for rollno in chunk:
+                if rollno in by_rollno:
+                    yield by_rollno[rollno]
+
+    @instrumented()
+    def get_all_students(self):
+        """Retrieve all student records"""
+        return list(self.iter_students())
+
+    @instrumented(rows=lambda result, *args, **kwargs: len(result[0]))
+    def get_students_page(self, after_rollno=None, limit=100, columns=None):
+        """Return one page of students from every shard, merged in rollno order, as (rows, last_rollno)"""
+        wanted = StudentDatabase._projection(columns) + ('rollno',)
+        pages = self._fan_out(lambda shard: shard.get_students_page(after_rollno, limit, wanted)[0])
+        rows = sorted(chain.from_iterable(pages), key=itemgetter(-1))[:limit]
+        last_rollno = rows[-1][-1] if len(rows) == limit else None
+        return [row[:-1] for row in rows], last_rollno
+
+    @instrumented()
+    def count_students(self):
+        """Return the number of student records in every shard"""
+        return sum(self._fan_out(lambda shard: shard.count_students()))
+
+    def get_cgpa_groups(self):
+        """Return (category, gender, CGPAs) for every category/gender pair, read from every shard in parallel"""
+        merged = {}
+        for groups in self._fan_out(lambda shard: shard.get_cgpa_groups()):
+            for category, gender, cgpas in groups:
+                merged.setdefault((category, gender), []).extend(cgpas)
+        return [(category, gender, cgpas) for (category, gender), cgpas in sorted(merged.items())]
+
+    @instrumented()
+    def get_student_by_rollno(self, rollno):
+        """Retrieve a specific student by rollno from its shard"""
+        shard = self.shard_for(rollno)
+        return None if shard is None else shard.get_student_by_rollno(rollno)
+
+    @instrumented()
+    def add_student(self, student_data):
+        """Add new student to its shard"""
+        return self.shard_for(student_data[2], create=True).add_student(student_data)
+
+    @instrumented()
+    def update_student(self, rollno, updated_data):
+        """Update existing student record, moving it if its new rollno belongs to another shard"""
+        shard = self.shard_for(rollno)
+        if shard is None:
+            return True  # no such student, like an UPDATE that matches no rows
+        target = self.shard_for(updated_data[2], create=True)
+        if target is shard:
+            return shard.update_student(rollno, updated_data)
+        if shard.get_student_by_rollno(rollno) is None:
+            return True
+        # Add first so a failure leaves the original record in place
+        new_rollno = target.add_student(updated_data)
+        if new_rollno is None:
+            return False
+        if not shard.delete_student(rollno):
+            # Take the copy back out, so the student isn't left in both shards
+            if not target.delete_student(new_rollno):
+                logging.error(f"Student {rollno} is in both shard {self.shard_key(rollno)} "
+                              f"and shard {self.shard_key(new_rollno)}")
+            return False
+        logging.info(f"Moved student {rollno} to shard {self.shard_key(new_rollno)}")
+        return True
+
+    @instrumented()
+    def delete_student(self, rollno):
+        """Delete student record"""
+        shard = self.shard_for(rollno)
+        return True if shard is None else shard.delete_student(rollno)
+
+    def _run_per_shard(self, groups, operation):
+        """Run a bulk operation on each shard's group in parallel, combining (committed, failures)"""
+        results = self._fan_out(lambda shard: operation(shard, groups[shard]), list(groups))
+        failures = [failure for _, shard_failures in results for failure in shard_failures]
+        return all(committed for committed, _ in results), failures
+
+    @instrumented()
+    def add_students(self, students):
+        """Add many students, in one atomic commit per shard, returning (committed, failures)"""
+        groups = self._group(students, lambda student_data: student_data[2], create=True)
+        return self._run_per_shard(groups, lambda shard, group: shard.add_students(group))
+
+    @instrumented()
+    def update_students(self, updates):
+        """Apply (rollno, updated_data) pairs, in one atomic commit per shard, returning (committed, failures)"""
+        updates = list(updates)
+        moves = [(rollno, 'Bulk updates cannot move a student to another shard') for rollno, updated_data in updates
+                 if self.shard_key(rollno) != self.shard_key(updated_data[2])]
+        if moves:
+            return False, moves
+        groups = self._group(updates, lambda item: item[0])
+        missing = groups.pop(None, [])
+        if missing:
+            return False, [(rollno, f'Student with rollno {rollno} not found') for rollno, _ in missing]
+        return self._run_per_shard(groups, lambda shard, group: shard.update_students(group))
+
+    @instrumented()
+    def delete_students(self, rollnos):
+        """Delete many students, in one atomic commit per shard, returning (committed, failures)"""
+        groups = self._group(rollnos, lambda rollno: rollno)
+        missing = groups.pop(None, [])
+        if missing:
+            return False, [(rollno, f'Student with rollno {rollno} not found') for rollno in missing]
+        return self._run_per_shard(groups, lambda shard, group: shard.delete_students(group))
+
+    @instrumented(rows=lambda result, *args, **kwargs: result[0])
+    def import_students(self, path, progress=None):
+        """Bulk import students from a CSV or XLSX file into their shards.
+
+        Works like StudentDatabase.import_students, batching rows per shard.
+        Returns (imported count, errors).
+        """
+        imported, processed = 0, 0
+        errors, batches = [], defaultdict(list)
+        try:
+            for line_no, student_data in StudentDatabase._iter_import_records(path):
+                processed += 1
+                error = self.validate_student(student_data)
+                if error:
+                    errors.append((line_no, error))
+                    continue
+                shard = self.shard_for(student_data[2], create=True)
+                batch = batches[shard]
+                batch.append((line_no, normalize_student(student_data)))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    imported += shard._insert_batch(batch, errors)
+                    batches[shard] = []
+                    if progress:
+                        progress(processed)
+            for shard, batch in batches.items():
+                if batch:
+                    imported += shard._insert_batch(batch, errors)
+            if progress:
+                progress(processed)
+        except (OSError, ValueError, ImportError, sqlite3.Error) as e:
+            logging.error(f"Error importing students from {path}: {e}")
+            errors.append((0, str(e)))
+        errors.sort()
+        logging.info(f"Imported {imported} students from {path} into {len(batches)} shards ({len(errors)} errors)")
+        return imported, errors
@@ -0,0 +1,10 @@
+import pytest
+from database import StudentDatabase
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # StudentDatabase writes its logs under the working directory
+    monkeypatch.chdir(tmp_path)
+    database = StudentDatabase(str(tmp_path / 'students.db'))
+    yield database
+    database.close()
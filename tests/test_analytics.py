@@ -0,0 +1,48 @@
+import pytest
+from analytics import GradeAnalytics
+
+def student(rollno, grades, gender='F', category='General'):
+    grades = list(grades) + [None] * (8 - len(grades))
+    return ('Asha Rao', 'R. Rao', rollno, gender, category, '9876543210', *grades, '')
+
+STUDENTS = [
+    student('CE001', [8.0, 9.0]),                      # 8.5
+    student('CE002', [9.5], gender='M'),               # 9.5
+    student('CE003', [8.5], category='OBC'),           # 8.5, tied with CE001
+    student('CE004', []),                              # not graded
+    student('CE005', [4.0, 6.0, 5.0], gender='M', category='OBC'),  # 5.0
+]
+
+@pytest.fixture
+def analytics(db):
+    assert db.add_students(STUDENTS) == (True, [])
+    analytics = GradeAnalytics(db)
+    assert analytics.load() == 5
+    return analytics
+
+def test_group_statistics(analytics):
+    stats = analytics.compute()
+    overall = stats['overall']
+    assert (overall['students'], overall['graded']) == (5, 4)
+    assert overall['mean'] == pytest.approx((8.5 + 9.5 + 8.5 + 5.0) / 4)
+    assert overall['distribution'] == [0, 0, 0, 0, 0, 1, 0, 0, 2, 1]
+    assert stats['by_category']['OBC']['mean'] == pytest.approx(6.75)
+    assert stats['by_category']['General']['students'] == 3
+    assert stats['by_gender']['M']['std'] == pytest.approx(2.25)
+    assert stats['by_gender']['F']['graded'] == 2
+
+def test_top_students_share_ranks_on_ties(analytics):
+    analytics.compute()
+    assert analytics.top_students() == [
+        (1, 'CE002', 9.5, 75.0),
+        (2, 'CE001', 8.5, 25.0),
+        (2, 'CE003', 8.5, 25.0),
+        (4, 'CE005', 5.0, 0.0),
+    ]
+    assert [rollno for _, rollno, _, _ in analytics.top_students(limit=2)] == ['CE002', 'CE001']
+
+def test_empty_database(db):
+    analytics = GradeAnalytics(db)
+    assert analytics.load() == 0
+    assert analytics.compute()['overall']['students'] == 0
+    assert analytics.top_students() == []
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import threading
+import backup
+from backup import BackupManager
+from database import StudentDatabase
+from shards import ShardedStudentDatabase
+
+def student(rollno):
+    return ('Asha Rao', 'R. Rao', rollno, 'F', 'General', '9876543210',
+            8.5, 9.0, None, None, None, None, None, None, '')
+
+def check(path):
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+        return conn.execute('SELECT COUNT(*) FROM students').fetchone()[0]
+    finally:
+        conn.close()
+
+def test_backup_taken_during_writes_restores_a_consistent_database(db, tmp_path, monkeypatch):
+    # Copy one page per step, so the writer commits many times during the backup
+    monkeypatch.setattr(backup, 'BACKUP_STEP_PAGES', 1)
+    monkeypatch.setattr(backup, 'BACKUP_STEP_PAUSE', 0.001)
+    db.add_students([student(f'CE{n:05}') for n in range(500)])
+    stop, batches = threading.Event(), []
+
+    def write():
+        with StudentDatabase(db.db_name) as writer:
+            while not stop.is_set():
+                start = 1000 + 10 * len(batches)
+                # Batches of ten commit atomically, so a consistent copy holds whole batches
+                writer.add_students([student(f'CE{n:05}') for n in range(start, start + 10)])
+                batches.append(start)
+    thread = threading.Thread(target=write)
+    thread.start()
+    manager = BackupManager(db.db_name, str(tmp_path / 'student_photos'), str(tmp_path / 'backups'))
+    try:
+        name = manager.backup()
+    finally:
+        stop.set()
+        thread.join()
+    assert name is not None and batches
+    db.close()
+
+    assert manager.restore(name) == []
+    restored = check(db.db_name)
+    assert restored == check(os.path.join(tmp_path, 'backups', name, 'students.db'))
+    assert restored >= 500 and restored % 10 == 0
+    assert restored < 500 + 10 * len(batches)
+
+def test_restore_sets_aside_shards_created_after_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    directory = str(tmp_path / 'shards')
+    manager = BackupManager(directory, str(tmp_path / 'student_photos'), str(tmp_path / 'backups'))
+    with ShardedStudentDatabase(directory) as sharded:
+        sharded.add_students([student('CE2023001'), student('ME2023001')])
+        name = manager.backup()
+        sharded.add_students([student('CE2023002'), student('EE2023001')])
+
+    set_aside = manager.restore(name)
+    assert [os.path.basename(path) for path in set_aside] == ['EE2023.db']
+    assert check(set_aside[0]) == 1
+    assert sorted(name for name in os.listdir(directory) if name.endswith('.db')) == ['CE2023.db', 'ME2023.db']
+    with ShardedStudentDatabase(directory) as sharded:
+        assert [row[2] for row in sharded.get_all_students()] == ['CE2023001', 'ME2023001']
@@ -0,0 +1,98 @@
+import sqlite3
+from database import StudentDatabase
+
+def student(rollno, name='Asha Rao'):
+    return (name, 'R. Rao', rollno, 'F', 'General', '9876543210',
+            8.5, 9.0, None, None, None, None, None, None, '')
+
+def test_failed_add_does_not_keep_the_write_lock(db):
+    assert db.add_student(student('CE001')) == 'CE001'
+    assert db.add_student(student('CE001', 'Duplicate')) is None
+    assert not db.conn.in_transaction
+
+    # Another connection can write straight away
+    other = sqlite3.connect(db.db_name, timeout=0.5)
+    other.execute("UPDATE students SET contact = '1' WHERE rollno = 'CE001'")
+    other.commit()
+    other.close()
+
+    # And this thread can start a transaction
+    with db.transaction():
+        assert db.add_student(student('CE002')) == 'CE002'
+    assert db.add_students([student('CE003')]) == (True, [])
+    assert db.count_students() == 3
+
+def test_failed_add_inside_transaction_only_undoes_itself(db):
+    with db.transaction():
+        assert db.add_student(student('CE001')) == 'CE001'
+        assert db.add_student(student('CE001', 'Duplicate')) is None
+        assert db.add_student(student('CE002')) == 'CE002'
+    assert not db.conn.in_transaction
+    assert [row[2] for row in db.get_all_students()] == ['CE001', 'CE002']
+    assert db.get_student_by_rollno('CE001')[0] == 'Asha Rao'
+
+def test_failed_update_does_not_keep_the_write_lock(db):
+    db.add_student(student('CE001'))
+    db.add_student(student('CE002'))
+    # Renaming onto an existing rollno violates the primary key
+    assert db.update_student('CE002', student('CE001')) is False
+    assert not db.conn.in_transaction
+    with db.transaction():
+        assert db.delete_student('CE002')
+    assert db.count_students() == 1
+
+def test_change_watcher_drops_records_changed_elsewhere(db):
+    db.add_student(student('CE001'))
+    watcher = db.change_watcher()
+    assert db.get_student_by_rollno('CE001')[5] == '9876543210'  # now cached
+
+    other = sqlite3.connect(db.db_name)
+    other.execute("UPDATE students SET contact = '1234' WHERE rollno = 'CE001'")
+    other.commit()
+    other.close()
+
+    assert [change[1] for change in watcher.poll()] == ['CE001']
+    assert db.get_student_by_rollno('CE001')[5] == '1234'
+    watcher.close()
+
+def test_non_numeric_grade_is_rejected_not_blanked(db):
+    bad = student('CE001')[:6] + ('abc',) + student('CE001')[7:]
+    assert db.add_student(bad) is None
+    assert db.count_students() == 0
+
+    db.add_student(student('CE001'))
+    assert db.update_student('CE001', bad) is False
+    assert db.get_student_by_rollno('CE001')[6] == 8.5
+    # Blank still means not graded yet
+    assert db.update_student('CE001', student('CE001')[:6] + (' ',) + student('CE001')[7:])
+    assert db.get_student_by_rollno('CE001')[6] is None
+
+def test_migration_keeps_grades_it_cannot_convert(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'students.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE students (name TEXT NOT NULL, rollno TEXT PRIMARY KEY, gender TEXT, "
+                 "category TEXT, parents TEXT, contact TEXT, Sem1 TEXT, Sem2 TEXT, Sem3 TEXT, Sem4 TEXT, "
+                 "Sem5 TEXT, Sem6 TEXT, Sem7 TEXT, Sem8 TEXT, photo_path TEXT, created_at DATETIME)")
+    conn.execute("INSERT INTO students (name, rollno, gender, Sem1, Sem2, Sem3) "
+                 "VALUES ('Asha Rao', 'CE001', 'F', '8.5', 'abc', 'AB')")
+    conn.commit()
+    conn.close()
+
+    with StudentDatabase(path) as db:
+        assert db.get_student_by_rollno('CE001')[6:9] == (8.5, None, None)
+        kept = db.conn.execute('SELECT rollno, semester, value FROM unconverted_grades ORDER BY semester')
+        assert kept.fetchall() == [('CE001', 'Sem2', 'abc'), ('CE001', 'Sem3', 'AB')]
+
+def test_bulk_update_rejects_invalid_records(db):
+    db.add_students([student('CE001'), student('CE002'), student('CE003')])
+    out_of_range = student('CE002')[:6] + ('11',) + student('CE002')[7:]
+    nameless = student('CE003', name='')
+    committed, failures = db.update_students([('CE001', student('CE001', 'Asha R. Rao')),
+                                              ('CE002', out_of_range), ('CE003', nameless)])
+    assert committed is False
+    assert failures == [('CE002', 'Sem1 SGPA must be a number between 0 and 10'),
+                        ('CE003', 'Name cannot be empty')]
+    # Nothing was written, and no grade was lost
+    assert db.get_student_by_rollno('CE001')[0] == 'Asha Rao'
+    assert db.get_student_by_rollno('CE002')[6] == 8.5
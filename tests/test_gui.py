@@ -0,0 +1,57 @@
+import pytest
+
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+from gui import StudentManagementApp, StudentTableModel
+
+def student(rollno, name='Asha Rao'):
+    return (name, 'R. Rao', rollno, 'F', 'General', '9876543210',
+            8.5, 9.0, None, None, None, None, None, None, '')
+
+@pytest.fixture
+def window(db, monkeypatch):
+    monkeypatch.setenv('QT_QPA_PLATFORM', 'offscreen')
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = StudentManagementApp(db)
+    while window.page_tasks or window.search_tasks:
+        app.processEvents()
+    yield window
+    window.close()
+
+def show(window, term, rollnos):
+    """Load every row of a view into the table, as scrolling to the end would"""
+    model = window.student_model
+    window.view_term, window.view_rollnos = term, rollnos
+    model.set_source(window.db.iter_students_by_rollnos(rollnos, columns=StudentTableModel.COLUMNS))
+    while model.canFetchMore():
+        model.fetchMore()
+    window.change_watcher.poll()
+
+def loaded_names(window):
+    model = window.student_model
+    return [(rollno, model._students[model.row_of(rollno)][0]) for rollno in model.loaded_rollnos()]
+
+def test_batch_of_changes_is_applied_to_every_student_view(db, window):
+    db.add_students([student(f'CE{n:03}') for n in range(0, 40, 2)])
+    show(window, None, [f'CE{n:03}' for n in range(0, 40, 2)])
+    with db.transaction():
+        db.add_students([student('CE001'), student('CE013'), student('CE041')])
+        db.delete_students(['CE000', 'CE010', 'CE038'])
+        db.update_student('CE020', student('CE020', 'Divya Rao'))
+    window.apply_changes(window.change_watcher.poll())
+
+    expected = sorted(row[2] for row in db.get_all_students())
+    assert window.student_model.loaded_rollnos() == expected
+    assert dict(loaded_names(window))['CE020'] == 'Divya Rao'
+
+def test_batch_of_changes_is_applied_to_search_view(db, window):
+    db.add_students([student('CE001'), student('CE002'), student('CE003', 'Meera Nair')])
+    show(window, 'ash', ['CE001', 'CE002'])
+    with db.transaction():
+        db.add_students([student('CE004'), student('CE005')])
+        db.update_student('CE001', student('CE001', 'Divya Rao'))
+        db.update_student('CE002', student('CE002', 'Ashok Kumar'))
+    window.apply_changes(window.change_watcher.poll())
+
+    assert window.view_rollnos == ['CE005', 'CE004', 'CE002']
+    assert loaded_names(window) == [('CE005', 'Asha Rao'), ('CE004', 'Asha Rao'), ('CE002', 'Ashok Kumar')]
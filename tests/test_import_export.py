@@ -0,0 +1,60 @@
+import csv
+import pytest
+from database import STUDENT_COLUMNS
+
+def student(rollno, name='Asha Rao', sem1=8.5):
+    return (name, 'R. Rao', rollno, 'F', 'General', '9876543210',
+            sem1, 9.0, None, None, None, None, None, None, '')
+
+def write_csv(path, rows, header=STUDENT_COLUMNS):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+@pytest.mark.parametrize('extension', ['csv', 'xlsx'])
+def test_export_then_import_round_trips(db, tmp_path, extension):
+    students = [student('CE001'), student('CE002', 'Ashok, "Kumar"', sem1=None), student('CE003', sem1=7.25)]
+    assert db.add_students(students) == (True, [])
+    path = str(tmp_path / f'students.{extension}')
+    assert db.export_students(path) == 3
+
+    db.delete_students(['CE001', 'CE002', 'CE003'])
+    assert db.import_students(path) == (3, [])
+    assert [row[:15] for row in db.get_all_students()] == students
+
+def test_import_reports_each_bad_line(db, tmp_path):
+    db.add_student(student('CE001'))
+    path = write_csv(tmp_path / 'students.csv', [
+        student('CE002'),
+        student('CE003', name=''),        # line 3: required field
+        (),                               # line 4: blank, skipped
+        student('CE004', sem1='abc'),     # line 5: not a grade
+        student('CE001'),                 # line 6: already in the database
+        student('CE005', sem1='11'),      # line 7: out of range
+        student('CE006', sem1=' 9.5 '),
+    ])
+    imported, errors = db.import_students(path)
+    assert imported == 2
+    assert [line for line, _ in errors] == [3, 5, 6, 7]
+    assert 'Name cannot be empty' in errors[0][1]
+    assert 'Sem1' in errors[1][1]
+    assert 'UNIQUE' in errors[2][1]
+    assert sorted(row[2] for row in db.get_all_students()) == ['CE001', 'CE002', 'CE006']
+    assert db.get_student_by_rollno('CE006')[6] == 9.5
+
+def test_import_without_required_columns_is_rejected(db, tmp_path):
+    path = write_csv(tmp_path / 'students.csv', [('Asha Rao', 'F')], header=('name', 'gender'))
+    imported, errors = db.import_students(path)
+    assert imported == 0
+    assert errors == [(0, 'Missing required columns: Roll Number')]
+
+def test_import_inside_a_transaction_is_committed_by_the_caller(db, tmp_path):
+    path = write_csv(tmp_path / 'students.csv', [student('CE002'), student('CE001'), student('CE003')])
+    db.add_student(student('CE001'))
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            assert db.import_students(path)[0] == 2
+            raise RuntimeError('abandon the import')
+    assert [row[2] for row in db.get_all_students()] == ['CE001']
@@ -0,0 +1,60 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import marksheets
+
+def student(rollno, sem1=8.5):
+    return ('Asha Rao', 'R. Rao', rollno, 'F', 'General', '9876543210',
+            sem1, 9.0, None, None, None, None, None, None, '')
+
+def test_bad_record_is_reported_and_the_rest_rendered(tmp_path):
+    # A grade stored as a blob can't be formatted or summed: TypeError, not OSError/ValueError
+    chunk = [(student('CE001'), ''), (student('CE002', sem1=b'9'), ''), (student('CE003'), '')]
+    rendered, errors = marksheets.render_chunk('html', chunk, str(tmp_path), str(tmp_path))
+    assert [rollno for rollno, _ in errors] == ['CE002']
+    assert errors[0][1].startswith('TypeError')
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['CE001.html', 'CE003.html']
+
+class BrokenPool:
+    """Stands in for a process pool whose worker died"""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool('worker killed'))
+        return future
+
+def test_dead_worker_fails_the_run_and_keeps_the_old_document(db, tmp_path, monkeypatch):
+    db.add_student(student('CE001'))
+    output = tmp_path / 'all.html'
+    output.write_text('previous')
+    monkeypatch.setattr(marksheets, 'ProcessPoolExecutor', BrokenPool)
+    rendered, errors = marksheets.generate_marksheets(db, str(output), 'html', combined=True, workers=1)
+    assert rendered is None
+    assert errors[-1][0] is None and 'worker killed' in errors[-1][1]
+    assert output.read_text() == 'previous'
+    assert not (tmp_path / 'all.html.tmp').exists()
+
+class InlinePool(BrokenPool):
+    """Stands in for a process pool, rendering each chunk in this process"""
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+def test_unwritable_output_fails_the_run_and_removes_the_partial_document(db, tmp_path, monkeypatch):
+    db.add_student(student('CE001'))
+    # A directory can't be replaced by the finished document
+    output = tmp_path / 'all.html'
+    output.mkdir()
+    monkeypatch.setattr(marksheets, 'ProcessPoolExecutor', InlinePool)
+    rendered, errors = marksheets.generate_marksheets(db, str(output), 'html', combined=True, workers=1)
+    assert rendered is None and errors[-1][0] is None
+    assert output.is_dir()
+    assert not (tmp_path / 'all.html.tmp').exists()
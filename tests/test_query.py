@@ -0,0 +1,58 @@
+import pytest
+from query import StudentQuery, column_sql
+
+def student(rollno, name, category='General', sem1=8.5, sem2=9.0):
+    return (name, 'R. Rao', rollno, 'F', category, '9876543210',
+            sem1, sem2, None, None, None, None, None, None, '')
+
+@pytest.fixture
+def students(db):
+    """Students with repeated names and CGPAs, and some without grades"""
+    names = ['Asha Rao', 'Divya Rao', 'Meera Nair', 'Ashok Kumar']
+    grades = [(8.5, 9.0), (None, None), (7.0, 7.5), (9.0, 8.5), (None, 6.0)]
+    db.add_students([student(f'CE{n:03}', names[n % 4], ('General', 'OBC')[n % 3 == 0], *grades[n % 5])
+                     for n in range(37)])
+    return db
+
+def test_compile_builds_parameterized_sql():
+    query = (StudentQuery().where('category', '=', 'OBC').where('gender', 'in', ('F', 'M'))
+             .where('cgpa', '>=', 8.0).order_by('name', descending=True).page(20, 40))
+    sql, params = query.compile(('rollno', 'name'))
+    assert sql == ("SELECT name, rollno, name FROM students WHERE category = ? AND gender IN (?, ?) AND "
+                   f"{column_sql('cgpa')} >= ? ORDER BY name DESC, rollno LIMIT ? OFFSET ?")
+    assert params == ['OBC', 'F', 'M', 8.0, 20, 40]
+    assert StudentQuery.from_dict(query.to_dict()).compile(('rollno', 'name')) == (sql, params)
+
+def test_unknown_columns_and_operators_are_rejected():
+    with pytest.raises(ValueError):
+        StudentQuery().where('rollno; DROP TABLE students', '=', 1)
+    with pytest.raises(ValueError):
+        StudentQuery().where('name', 'LIKE', 'A%')
+    with pytest.raises(ValueError):
+        StudentQuery().order_by('age')
+
+def test_ordering_puts_null_first_ascending_and_breaks_ties_by_rollno(students):
+    rows = students.query_students(StudentQuery().where('category', '=', 'OBC').order_by('Sem1'),
+                                   columns=('rollno', 'Sem1'))
+    assert rows[0] == ('CE006', None)
+    assert [sem1 for _, sem1 in rows] == sorted((sem1 for _, sem1 in rows), key=lambda v: (v is not None, v))
+    for (rollno, sem1), (next_rollno, next_sem1) in zip(rows, rows[1:]):
+        assert sem1 != next_sem1 or rollno < next_rollno
+
+@pytest.mark.parametrize('order, descending', [
+    (None, False), ('rollno', True), ('name', False), ('name', True),
+    ('cgpa', False), ('cgpa', True), ('Sem1', True),
+])
+def test_keyset_pages_match_a_plain_query(students, order, descending):
+    query = StudentQuery().where('category', '!=', 'Nobody')
+    if order is not None:
+        query.order_by(order, descending)
+    sort = column_sql(order or 'rollno') + (' DESC' if descending else '')
+    expected = [row[0] for row in students.conn.execute(
+        f"SELECT rollno FROM students ORDER BY {sort}, rollno").fetchall()]
+
+    assert [row[0] for row in students.iter_query(query, columns=('rollno',), page_size=4)] == expected
+    # Resuming after a row continues where it left off
+    first = students.query_sorted(query.page(10), ('rollno',))
+    resumed = students.iter_query(query, columns=('rollno',), page_size=3, after=tuple(first[-1]))
+    assert [row[1] for row in first] + [row[0] for row in resumed] == expected
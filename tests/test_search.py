@@ -0,0 +1,70 @@
+import sqlite3
+from database import SCHEMA_VERSION, StudentDatabase
+
+def student(rollno, name, gender='F', category='General'):
+    return (name, 'R. Rao', rollno, gender, category, '9876543210',
+            8.5, 9.0, None, None, None, None, None, None, '')
+
+# The students table as the first release created it, with grades stored as TEXT
+BASELINE_SCHEMA = '''
+    CREATE TABLE students (
+        name TEXT NOT NULL, parents TEXT, rollno TEXT PRIMARY KEY, gender TEXT,
+        category TEXT, contact TEXT, Sem1 TEXT, Sem2 TEXT, Sem3 TEXT, Sem4 TEXT,
+        Sem5 TEXT, Sem6 TEXT, Sem7 TEXT, Sem8 TEXT, photo_path TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+def rollnos(rows):
+    return sorted(row[2] for row in rows)
+
+def test_search_matches_word_prefixes(db):
+    assert db.fts_enabled
+    db.add_student(student('CE001', 'Asha Rao'))
+    db.add_student(student('CE002', 'Ashok Kumar', gender='M'))
+    db.add_student(student('ME001', 'Meera Nair', category='OBC'))
+
+    assert rollnos(db.search_student('ash')) == ['CE001', 'CE002']
+    assert rollnos(db.search_student('Asha')) == ['CE001']
+    assert rollnos(db.search_student('ash ku')) == ['CE002']  # every word must match
+    assert rollnos(db.search_student('obc')) == ['ME001']
+    assert sorted(db.search_rollnos('CE')) == ['CE001', 'CE002']
+    assert db.search_student('zz') == []
+    # Quotes and FTS operators are searched for as text
+    assert db.search_student('"ash" OR') == []
+
+def test_search_index_follows_updates_and_deletes(db):
+    db.add_student(student('CE001', 'Asha Rao'))
+    db.add_student(student('CE002', 'Ashok Kumar'))
+    db.update_student('CE001', student('CE001', 'Divya Rao'))
+    db.delete_student('CE002')
+
+    assert db.search_student('ash') == []
+    assert rollnos(db.search_student('div')) == ['CE001']
+    with db.transaction():
+        db.add_student(student('CE003', 'Ashwin Das'))
+    assert rollnos(db.search_student('ash')) == ['CE003']
+
+def test_baseline_database_is_indexed_and_migrated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'students.db')
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_SCHEMA)
+    conn.executemany('INSERT INTO students (name, rollno, gender, category, Sem1, Sem2) VALUES (?, ?, ?, ?, ?, ?)',
+                     [('Asha Rao', 'CE001', 'F', 'General', '8.5', ''),
+                      ('Ashok Kumar', 'CE002', 'M', 'OBC', ' 7 ', None)])
+    conn.commit()
+    conn.close()
+
+    with StudentDatabase(path) as db:
+        # Rows that predate the search index are found
+        assert rollnos(db.search_student('ash')) == ['CE001', 'CE002']
+        assert db.get_student_by_rollno('CE001')[6:8] == (8.5, None)
+        assert db.get_student_by_rollno('CE002')[6] == 7.0
+        assert db.conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        db.add_student(student('CE003', 'Ashwin Das'))
+        assert rollnos(db.search_student('ashw')) == ['CE003']
+
+    # Opening an upgraded database again leaves it alone
+    with StudentDatabase(path) as db:
+        assert rollnos(db.search_student('ash')) == ['CE001', 'CE002', 'CE003']
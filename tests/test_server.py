@@ -0,0 +1,127 @@
+import json
+import socket
+import asyncio
+import threading
+import http.client
+import pytest
+from remote import RemoteStudentDatabase, RemoteError
+from server import StudentServer
+
+TOKEN = 'shared-secret'
+
+def student(rollno, name='Asha Rao'):
+    return (name, 'R. Rao', rollno, 'F', 'General', '9876543210',
+            8.5, 9.0, None, None, None, None, None, None, '')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def server(db):
+    """A StudentServer for db running on a background thread"""
+    student_server = StudentServer(db, port=free_port(), readers=2, token=TOKEN)
+    started, state = threading.Event(), {}
+
+    async def serve():
+        state['loop'] = asyncio.get_running_loop()
+        state['task'] = asyncio.ensure_future(student_server.serve_forever())
+        started.set()
+        try:
+            await state['task']
+        except asyncio.CancelledError:
+            pass
+    thread = threading.Thread(target=asyncio.run, args=(serve(),))
+    thread.start()
+    started.wait()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', student_server.port), timeout=1).close()
+            break
+        except ConnectionRefusedError:
+            threading.Event().wait(0.02)
+    yield student_server
+    state['loop'].call_soon_threadsafe(state['task'].cancel)
+    thread.join()
+
+@pytest.fixture
+def client(server):
+    with RemoteStudentDatabase(f'http://127.0.0.1:{server.port}', token=TOKEN) as remote:
+        yield remote
+
+def post(server, path, body, token=TOKEN):
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=5)
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    conn.request('POST', path, body=body, headers=headers)
+    response = conn.getresponse()
+    result = response.status, json.loads(response.read())
+    conn.close()
+    return result
+
+def test_requests_need_the_token(server, client):
+    assert client.add_student(student('CE001')) == 'CE001'
+    with RemoteStudentDatabase(f'http://127.0.0.1:{server.port}', token='wrong') as intruder:
+        with pytest.raises(RemoteError) as error:
+            intruder.request('GET', '/students/count')
+        assert error.value.status == 401
+    status, _ = post(server, '/students/bulk-delete', b'{"rollnos": ["CE001"]}', token=None)
+    assert status == 401
+    assert client.count_students() == 1
+
+def test_serving_beyond_loopback_requires_a_token(db):
+    assert StudentServer(db, host='127.0.0.1').token is None
+    with pytest.raises(ValueError):
+        StudentServer(db, host='0.0.0.0')
+    assert StudentServer(db, host='0.0.0.0', token=TOKEN).token == TOKEN
+
+@pytest.mark.parametrize('path, body', [
+    ('/students/bulk-add', b'{"students": 5}'),
+    ('/students/bulk-add', b'{"students": [["too", "short"]]}'),
+    ('/students/bulk-update', b'{"updates": [["CE001"]]}'),
+    ('/students/bulk-delete', b'{"rollnos": [1, 2]}'),
+    ('/students/lookup', b'{"rollnos": "CE001"}'),
+    ('/students/match', b'{"q": 5}'),
+    ('/students/query', b'{"query": [], "columns": ["rollno"]}'),
+    ('/students', b'[1, 2]'),
+])
+def test_malformed_bodies_are_bad_requests(server, path, body):
+    status, result = post(server, path, body)
+    assert status == 400, result
+
+def test_overlong_request_line_is_answered(server):
+    with socket.create_connection(('127.0.0.1', server.port), timeout=5) as s:
+        s.sendall(b'GET /students/' + b'x' * 70000 + b' HTTP/1.1\r\n\r\n')
+        response = b''
+        while chunk := s.recv(65536):
+            response += chunk
+    assert response.startswith(b'HTTP/1.1 413')
+    # The server carries on
+    status, result = post(server, '/students/bulk-add', json.dumps({'students': [list(student('CE001'))]}).encode())
+    assert (status, result) == (200, {'committed': True, 'failures': []})
+
+def test_photos_are_downloaded_from_the_server(db, client, tmp_path):
+    from PIL import Image
+    source = tmp_path / 'face.png'
+    Image.new('RGB', (40, 30), 'red').save(source)
+    photo_path = client.photo_store.import_photo(str(source))
+    # The client doesn't have the server's file, but gets a local copy of it
+    local_path = client.photo_store.best_path(photo_path, 200)
+    assert local_path and local_path != photo_path
+    with Image.open(local_path) as image:
+        assert image.size == (40, 30)
+
+def test_photo_task_loads_server_photos(client, tmp_path):
+    from PIL import Image
+    from gui import PhotoLoadTask
+    source = tmp_path / 'face.png'
+    Image.new('RGB', (40, 30), 'red').save(source)
+    photo_path = client.photo_store.import_photo(str(source))
+    loaded = []
+    for path in (photo_path, 'student_photos/missing.png'):
+        task = PhotoLoadTask(client.photo_store, path, 200, path)
+        task.signals.loaded.connect(lambda key, image, found: loaded.append((image.width(), found)))
+        task.run()
+    assert loaded == [(40, True), (0, False)]
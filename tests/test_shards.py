@@ -0,0 +1,55 @@
+import os
+import pytest
+from shards import ShardedStudentDatabase, FALLBACK_SHARD
+
+def student(rollno, name='Asha Rao'):
+    return (name, 'R. Rao', rollno, 'F', 'General', '9876543210',
+            8.5, 9.0, None, None, None, None, None, None, '')
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    database = ShardedStudentDatabase(str(tmp_path / 'shards'))
+    yield database
+    database.close()
+
+def shard_rollnos(sharded, key):
+    return [row[2] for row in sharded.shards[key].get_all_students()]
+
+def test_students_are_routed_to_their_prefix_shard(sharded, tmp_path):
+    assert sharded.add_students([student('CE2023001'), student('me2023001'), student('CE2024001'),
+                                 student('X1')]) == (True, [])
+    assert sorted(sharded.shards) == ['CE2023', 'CE2024', 'ME2023', FALLBACK_SHARD]
+    assert sorted(name for name in os.listdir(tmp_path / 'shards') if name.endswith('.db')) == \
+        [f'{key}.db' for key in sorted(sharded.shards)]
+    assert shard_rollnos(sharded, 'ME2023') == ['me2023001']
+    assert sharded.get_student_by_rollno('X1')[2] == 'X1'
+    assert sharded.get_student_by_rollno('EE2023001') is None
+    assert 'EE2023' not in sharded.shards  # lookups don't create shards
+
+def test_pages_are_merged_in_rollno_order(sharded):
+    rollnos = [f'{prefix}{n:03}' for prefix in ('CE2023', 'ME2023', 'AE2023') for n in range(7)]
+    sharded.add_students([student(rollno) for rollno in rollnos])
+    pages, after = [], None
+    while True:
+        rows, after = sharded.get_students_page(after, limit=5, columns=('rollno',))
+        pages.append([row[0] for row in rows])
+        if after is None:
+            break
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 1]
+    assert sum(pages, []) == sorted(rollnos)
+    assert sharded.count_students() == 21
+
+def test_update_moves_a_student_between_shards(sharded):
+    sharded.add_student(student('CE2023001'))
+    assert sharded.update_student('CE2023001', student('ME2023001', 'Divya Rao'))
+    assert shard_rollnos(sharded, 'CE2023') == []
+    assert sharded.get_student_by_rollno('ME2023001')[0] == 'Divya Rao'
+
+def test_failed_move_keeps_the_student_in_one_shard(sharded, monkeypatch):
+    sharded.add_student(student('CE2023001'))
+    source = sharded.shards['CE2023']
+    monkeypatch.setattr(source, 'delete_student', lambda rollno: False)
+    assert not sharded.update_student('CE2023001', student('ME2023001', 'Divya Rao'))
+    assert shard_rollnos(sharded, 'CE2023') == ['CE2023001']
+    assert shard_rollnos(sharded, 'ME2023') == []